@@ -0,0 +1,162 @@
+"""
+Async counterparts of the stats view and of reading creation, for ASGI servers.
+
+These views are coroutines, served by uvicorn (or gunicorn with uvicorn
+workers), that await the async ORM (`aget`, `aexists`, `aaggregate`,
+`acreate`); Django 4.2 still runs each of those queries in a thread. They are
+an alternative deployment of the same endpoints, not a measured throughput
+improvement: see `benchmarks.load_mixed` to compare both.
+
+DRF views are synchronous, so `AsyncAPIView` keeps only what these endpoints
+need from `APIView`: JWT authentication with an async user lookup, DRF
+exceptions turned into the same JSON error bodies, and JSON rendering with the
+API's default renderer. Request bodies and query parameters are validated with
+the same serializers as the synchronous views; responses are identical, except
+that async stats are not served from the response cache.
+"""
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.settings import api_settings as drf_settings
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .authentication import CachedJWTAuthentication, check_user
+from .ingest import ReadingRowSerializer
+from .models import Anemometer, WindSpeedReading
+from .rollups import aaggregate_readings
+from .serializers import WindSpeedReadingSerializer, WindSpeedStatsSerializer
+from .spatial import anemometer_index
+from .views import WindSpeedStatsView
+
+logger = logging.getLogger("api")
+
+
+class AsyncJWTAuthentication(CachedJWTAuthentication):
+    """`CachedJWTAuthentication` loading the user with the async ORM on cache misses."""
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user = self.get_cached_user(validated_token)
+        if user is not None:
+            return user
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise exceptions.AuthenticationFailed("User not found", code="user_not_found")
+
+        check_user(user, validated_token)
+        self.cache_user(validated_token, user)
+        return user
+
+
+class AsyncAPIView(View):
+    """Authenticated JSON view whose handlers are coroutines."""
+    authentication = AsyncJWTAuthentication()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Token authentication only, like the DRF views.
+        view.csrf_exempt = True
+        return view
+
+    def render(self, data, status_code=status.HTTP_200_OK, headers=None):
+        renderer = drf_settings.DEFAULT_RENDERER_CLASSES[0]()
+        response = HttpResponse(renderer.render(data), status=status_code, content_type='application/json')
+        for name, value in (headers or {}).items():
+            response[name] = value
+        return response
+
+    def handle_exception(self, exc):
+        headers = {}
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            headers['WWW-Authenticate'] = self.authentication.authenticate_header(self.request)
+            exc.status_code = status.HTTP_401_UNAUTHORIZED
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        return self.render(data, exc.status_code, headers)
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            credentials = await self.authentication.aauthenticate(request)
+            if credentials is None:
+                raise exceptions.NotAuthenticated()
+            request.user, request.auth = credentials
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        raise exceptions.MethodNotAllowed(request.method)
+
+
+class AsyncWindSpeedStatsView(AsyncAPIView):
+    """Async `GET /api/async/stats/`, same parameters and output as `WindSpeedStatsView`."""
+
+    async def get(self, request):
+        logger.info("Processing async wind speed stats request.")
+        serializer = WindSpeedStatsSerializer(data=request.GET)
+        serializer.is_valid(raise_exception=True)
+        latitude = serializer.validated_data['latitude']
+        longitude = serializer.validated_data['longitude']
+        radius = serializer.validated_data['radius']
+
+        if settings.SPATIAL_INDEX_ENABLED:
+            # The index is in memory once built; a rebuild reads the anemometers synchronously.
+            inside, outside = await sync_to_async(anemometer_index.partition)(latitude, longitude, radius)
+            scope = Q(anemometer_id__in=inside) if outside is None else ~Q(anemometer_id__in=outside)
+        else:
+            scope = await sync_to_async(WindSpeedStatsView._bounding_box_scope)(latitude, longitude, radius)
+        stats = await aaggregate_readings(scope, serializer.validated_data.get('start'), serializer.validated_data.get('end'))
+
+        response_data = {
+            'min': stats.minimum if stats.minimum is not None else 0,
+            'max': stats.maximum if stats.maximum is not None else 0,
+            'mean': stats.mean,
+        }
+        logger.debug("Wind speed stats calculated: %s", response_data)
+        return self.render(response_data)
+
+
+class AsyncWindSpeedReadingCreateView(AsyncAPIView):
+    """Async `POST /api/async/readings/`, same body and output as `POST /api/readings/`."""
+
+    async def post(self, request):
+        logger.info("Creating a new wind speed reading.")
+        try:
+            data = json.loads(request.body or b'null')
+        except ValueError as exc:
+            raise exceptions.ParseError(f'JSON parse error - {exc}')
+        if not isinstance(data, dict):
+            raise exceptions.ValidationError({
+                'non_field_errors': ['Invalid data. Expected a dictionary, but got {}.'.format(type(data).__name__)],
+            })
+
+        fields = dict(ReadingRowSerializer().run_validation(data))
+        anemometer_id = fields.pop('anemometer')
+        if not await Anemometer.objects.filter(pk=anemometer_id).aexists():
+            raise exceptions.ValidationError({'anemometer': [f'Invalid pk "{anemometer_id}" - object does not exist.']})
+
+        # Saving runs the post_save receivers (rollups, caches) in the ORM's thread.
+        reading = await WindSpeedReading.objects.acreate(anemometer_id=anemometer_id, **fields)
+        return self.render(WindSpeedReadingSerializer(reading).data, status.HTTP_201_CREATED)
@@ -0,0 +1,119 @@
+"""
+JWT authentication without a user query on every request.
+
+simplejwt's `JWTAuthentication` loads the token's user from the database on
+each request: one query per reading posted. `CachedJWTAuthentication` resolves
+the user according to `JWT_USER_LOOKUP`:
+
+- 'database' (the default): simplejwt's behaviour, one query per request.
+- 'cached': users are kept in a bounded in-process LRU for `JWT_USER_CACHE_TTL`
+  seconds. Saving or deleting a user evicts it from the cache of the process
+  that made the change; other workers, and changes made with
+  `QuerySet.update()`, are only seen when the entry expires.
+- 'claims': no lookup at all. `request.user` is a `TokenUser` built from the
+  token claims, for clients such as gateways whose tokens are trusted until
+  they expire (a deactivated user keeps access until then).
+
+Each request gets its own copy of a cached user, so per-request state (such as
+permission caches) never leaks between requests.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework import exceptions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+LOOKUP_DATABASE = 'database'
+LOOKUP_CACHED = 'cached'
+LOOKUP_CLAIMS = 'claims'
+
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU whose entries expire after a number of seconds.
+
+    The size and the lifetime are read from the settings named `size_setting`
+    and `ttl_setting` on each write.
+    """
+
+    def __init__(self, size_setting, ttl_setting):
+        self.size_setting, self.ttl_setting = size_setting, ttl_setting
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expiry, value)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + getattr(settings, self.ttl_setting), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > getattr(settings, self.size_setting):
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+user_cache = TTLCache('JWT_USER_CACHE_SIZE', 'JWT_USER_CACHE_TTL')
+
+
+def check_user(user, validated_token):
+    """The checks simplejwt applies to a freshly loaded user: active, and password unchanged."""
+    if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+        raise exceptions.AuthenticationFailed("User is inactive", code="user_inactive")
+    if getattr(api_settings, 'CHECK_REVOKE_TOKEN', False):
+        if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise exceptions.AuthenticationFailed("The user's password has been changed.", code="password_changed")
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user = self.get_cached_user(validated_token)
+        if user is None:
+            user = super().get_user(validated_token)
+            self.cache_user(validated_token, user)
+        return user
+
+    def get_cached_user(self, validated_token):
+        """The user of `validated_token` without a query, or None when it has to be loaded."""
+        lookup = settings.JWT_USER_LOOKUP
+        if lookup == LOOKUP_DATABASE:
+            return None
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+        if lookup == LOOKUP_CLAIMS:
+            return api_settings.TOKEN_USER_CLASS(validated_token)
+        user = user_cache.get(user_id)
+        if user is None:
+            return None
+        check_user(user, validated_token)
+        return copy.copy(user)
+
+    def cache_user(self, validated_token, user):
+        if settings.JWT_USER_LOOKUP == LOOKUP_CACHED:
+            user_cache.set(validated_token[api_settings.USER_ID_CLAIM], copy.copy(user))
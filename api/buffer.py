@@ -0,0 +1,220 @@
+"""
+Write-behind buffer coalescing single readings into bulk inserts.
+
+Every `POST /api/readings/` commits its own transaction, so single-reading
+ingestion is capped by the database's fsync rate. With
+`READINGS_BUFFER_ENABLED`, validated readings are appended to a per-process
+`ReadingBuffer` instead and written with `insert_readings` (`bulk_create` plus
+rollups, one transaction per chunk) every `READINGS_BUFFER_FLUSH_INTERVAL_MS`
+milliseconds, or as soon as `READINGS_BUFFER_MAX_ROWS` are pending.
+
+`READINGS_BUFFER_DURABILITY` picks when a request is acknowledged:
+
+- `flush` (default): the request waits for the flush holding its reading and
+  answers `201` with the stored reading; a reading that cannot be stored fails
+  its request.
+- `enqueue`: the request answers `202` once the reading is queued. Queued
+  readings are lost if the process dies before flushing; readings that cannot
+  be stored are logged and counted. Past `READINGS_BUFFER_MAX_PENDING`
+  readings queued or being flushed, requests wait for the flush like in
+  `flush` mode.
+
+A batch is written in one transaction. If that fails, its readings are retried
+one by one, so a bad row (say, of an anemometer deleted since it was
+validated) only fails its own request.
+
+On PostgreSQL, the statements of a flush are cut by a `statement_timeout` of
+`READINGS_BUFFER_STATEMENT_TIMEOUT_MS`. A request waits for its flush at most
+the flush interval plus twice that (the flush ahead of it, then its own), and
+then fails with `503`; its reading may still be stored later.
+
+Remaining readings are flushed when the worker exits (`atexit`, which gunicorn
+runs on graceful shutdown).
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django import db
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .ingest import insert_readings
+
+logger = logging.getLogger("api")
+
+DURABILITY_FLUSH = 'flush'
+DURABILITY_ENQUEUE = 'enqueue'
+
+
+class FlushTimeout(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The reading was not stored in time, it may still be: retry later."
+    default_code = 'flush_timeout'
+
+
+def wait_timeout():
+    """Seconds a request waits for the flush of its reading."""
+    return (settings.READINGS_BUFFER_FLUSH_INTERVAL_MS + 2 * settings.READINGS_BUFFER_STATEMENT_TIMEOUT_MS) / 1000
+
+
+def _limit_statements():
+    # Call inside the flush's transaction, which the setting does not outlive.
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL statement_timeout = %s", [settings.READINGS_BUFFER_STATEMENT_TIMEOUT_MS])
+
+
+class _Batch:
+    """Readings flushed together, and the outcome their requests wait for."""
+
+    def __init__(self):
+        self.readings = []
+        self.done = threading.Event()
+        # Index in `readings` -> exception, for the readings that were not stored.
+        self.errors = {}
+
+
+class ReadingBuffer:
+    """Thread-safe queue of unsaved readings flushed in bulk by a background thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._batch = _Batch()
+        # Readings submitted and not flushed yet, including batches being flushed.
+        self._queued = 0
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self._flushes = 0
+        self._flushed_rows = 0
+        self._failed_rows = 0
+        self._timeouts = 0
+        self._last_flush_seconds = 0.0
+        self._max_flush_seconds = 0.0
+        self._total_flush_seconds = 0.0
+
+    def _ensure_thread(self):
+        # Started lazily in each worker: a thread started before gunicorn forks does not survive the fork.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._batch = _Batch()
+            self._queued = 0
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='reading-buffer', daemon=True)
+            self._thread.start()
+
+    def submit(self, reading):
+        """
+        Queue an unsaved `WindSpeedReading`. Returns True once it is stored (its pk
+        set), False if it is only queued, depending on `READINGS_BUFFER_DURABILITY`.
+        """
+        with self._lock:
+            self._ensure_thread()
+            batch = self._batch
+            index = len(batch.readings)
+            batch.readings.append(reading)
+            self._queued += 1
+            queued = self._queued
+            full = index + 1 >= settings.READINGS_BUFFER_MAX_ROWS
+            if full:
+                self._batch = _Batch()
+        wait = settings.READINGS_BUFFER_DURABILITY != DURABILITY_ENQUEUE or queued >= settings.READINGS_BUFFER_MAX_PENDING
+        if full:
+            # The request completing a batch writes it, without waiting for the timer.
+            self._flush(batch)
+        elif not wait:
+            return False
+        if not batch.done.wait(wait_timeout()):
+            with self._lock:
+                self._timeouts += 1
+            raise FlushTimeout()
+        if index in batch.errors:
+            raise batch.errors[index]
+        return True
+
+    def flush(self):
+        """Write the pending readings now. Returns how many were written."""
+        with self._lock:
+            batch, self._batch = self._batch, _Batch()
+        self._flush(batch)
+        return len(batch.readings) - len(batch.errors)
+
+    def _flush(self, batch):
+        if batch.readings:
+            # One flush at a time keeps rollup updates from deadlocking each other.
+            with self._flush_lock:
+                start = time.perf_counter()
+                self._write(batch)
+                self._flushed_rows += len(batch.readings) - len(batch.errors)
+                self._failed_rows += len(batch.errors)
+                elapsed = time.perf_counter() - start
+                self._flushes += 1
+                self._last_flush_seconds = elapsed
+                self._max_flush_seconds = max(self._max_flush_seconds, elapsed)
+                self._total_flush_seconds += elapsed
+            with self._lock:
+                self._queued -= len(batch.readings)
+        batch.done.set()
+
+    def _write(self, batch):
+        try:
+            with transaction.atomic():
+                _limit_statements()
+                insert_readings(batch.readings)
+            return
+        except Exception as exc:
+            if len(batch.readings) == 1:
+                batch.errors[0] = exc
+                logger.exception("Failed to store a buffered reading.")
+                return
+            logger.warning("Failed to flush %d buffered readings, retrying them one by one.", len(batch.readings))
+        for index, reading in enumerate(batch.readings):
+            # Set by the rolled back `bulk_create` on databases returning ids.
+            reading.pk = None
+            try:
+                with transaction.atomic():
+                    _limit_statements()
+                    insert_readings([reading])
+            except Exception as exc:
+                batch.errors[index] = exc
+                logger.exception("Failed to store a buffered reading of anemometer %s.", reading.anemometer_id)
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(settings.READINGS_BUFFER_FLUSH_INTERVAL_MS / 1000)
+            self._wakeup.clear()
+            if self._batch.readings:
+                self.flush()
+                db.close_old_connections()
+
+    def stop(self):
+        """Stop the background thread and flush what is left."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join()
+        self.flush()
+
+    def metrics(self):
+        """Queue depth and flush statistics of this process."""
+        return {
+            'queue_depth': self._queued,
+            'flushes': self._flushes,
+            'flushed_rows': self._flushed_rows,
+            'failed_rows': self._failed_rows,
+            'timeouts': self._timeouts,
+            'last_flush_seconds': self._last_flush_seconds,
+            'max_flush_seconds': self._max_flush_seconds,
+            'mean_flush_seconds': self._total_flush_seconds / self._flushes if self._flushes else 0.0,
+        }
+
+
+reading_buffer = ReadingBuffer()
+atexit.register(reading_buffer.stop)
@@ -0,0 +1,150 @@
+"""
+Response cache of the polled read endpoints (anemometers, stats).
+
+Responses are cached under their host, path and normalized query parameters,
+together with a generation number shared through the cache backend. A change
+to anemometers bumps the generation, which orphans every cached response at
+once (they then expire after `RESPONSE_CACHE_TIMEOUT`).
+
+Readings arrive continuously, so bumping on each of them would leave the cache
+nothing to serve. Reading changes only mark the generation stale; the first
+request `RESPONSE_CACHE_READINGS_DELAY` seconds after the oldest unreflected
+change bumps it. Responses therefore lag reading changes by at most that delay.
+
+The ETag is derived from the cache key, i.e. from the request and the
+generation: a client revalidating with `If-None-Match` gets a 304 without the
+response being computed, even on a cold cache. With one cache per process
+(locmem) each worker has its own generation and would keep answering 304 after
+another worker's write, so the cache is only enabled by default when
+`CACHE_URL` points to a shared backend (Redis, Memcached), and `manage.py
+check` warns when it is enabled over a per-process one.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from .db_router import reading_from_replica
+
+GENERATION_KEY = 'api:responses:generation'
+CHANGED_AT_KEY = 'api:responses:changed-at'
+READINGS_CHANGED_KEY = 'api:responses:readings-changed-at'
+
+
+def is_shared(alias):
+    """Whether the cache `alias` is seen by every worker, unlike local memory."""
+    return settings.CACHES[alias]['BACKEND'] not in settings.PROCESS_LOCAL_CACHE_BACKENDS
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _state():
+    """Current (generation, changed_at) pair, initialized on a cold cache."""
+    cache = _cache()
+    state = cache.get_many([GENERATION_KEY, CHANGED_AT_KEY, READINGS_CHANGED_KEY])
+    readings_changed_at = state.pop(READINGS_CHANGED_KEY, None)
+    if readings_changed_at is not None and time.time() - readings_changed_at >= settings.RESPONSE_CACHE_READINGS_DELAY:
+        # Changes marked after this delete mark the new generation stale again.
+        cache.delete(READINGS_CHANGED_KEY)
+        _bump()
+        state = cache.get_many([GENERATION_KEY, CHANGED_AT_KEY])
+    if len(state) < 2:
+        # Start from the clock rather than 0, so a flushed cache never hands out the
+        # ETag of a generation that was used before with other data.
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        cache.add(CHANGED_AT_KEY, time.time(), timeout=None)
+        state = cache.get_many([GENERATION_KEY, CHANGED_AT_KEY])
+    return state.get(GENERATION_KEY, 0), state.get(CHANGED_AT_KEY, time.time())
+
+
+def _bump():
+    cache = _cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+    cache.set(CHANGED_AT_KEY, time.time(), timeout=None)
+
+
+def invalidate():
+    """
+    Invalidate every cached response.
+
+    Called when anemometers or readings change. The generation is bumped right
+    away and again once the transaction commits, so a response computed from
+    the pre-commit data by a concurrent request cannot stay cached.
+    """
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def _mark_readings_changed():
+    # Keeps the time of the oldest change not reflected in the generation yet.
+    _cache().add(READINGS_CHANGED_KEY, time.time(), timeout=None)
+
+
+def readings_changed():
+    """
+    Invalidate the cached responses within `RESPONSE_CACHE_READINGS_DELAY` seconds.
+
+    Called when readings change. Marked right away and again once the transaction
+    commits, like `invalidate`.
+    """
+    _mark_readings_changed()
+    transaction.on_commit(_mark_readings_changed)
+
+
+def response_key(request, generation):
+    params = sorted((name, sorted(values)) for name, values in request.query_params.lists())
+    digest = hashlib.sha1(repr((request.get_host(), request.path, params)).encode()).hexdigest()
+    return f'api:responses:{generation}:{digest}'
+
+
+def cached_response(handler):
+    """
+    Cache the 200 responses of a GET handler and answer conditional requests.
+
+    Wraps the handler method rather than `dispatch`, so authentication,
+    permissions and throttling still run on every request.
+    """
+    @wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return handler(view, request, *args, **kwargs)
+
+        generation, changed_at = _state()
+        key = response_key(request, generation)
+        etag = f'W/"{key.rsplit(":", 1)[1][:32]}-{generation}"'
+        last_modified = int(changed_at)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            data = _cache().get(key)
+            if data is None:
+                response = handler(view, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                if reading_from_replica():
+                    # The replica may lag behind the write that started this generation:
+                    # neither cache the body nor tag it with the generation's ETag.
+                    return response
+                _cache().set(key, response.data, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+            else:
+                response = Response(data)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # Responses are per authenticated client: browsers must revalidate, proxies must not store.
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    return wrapper
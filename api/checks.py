@@ -0,0 +1,52 @@
+"""
+Checks of the settings that only work with several workers when the cache
+they rely on is shared, and of the database layout the settings ask for.
+System checks are registered on import, and `check_replica_pin_cache` is run
+at startup, from `ApiConfig.ready`.
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+from .cache import is_shared
+
+
+@register()
+def check_response_cache(app_configs, **kwargs):
+    if settings.RESPONSE_CACHE_ENABLED and not is_shared(settings.RESPONSE_CACHE_ALIAS):
+        return [Warning(
+            "RESPONSE_CACHE_ENABLED is on over a per-process cache: workers other than the one "
+            "handling a write keep serving, and answering 304 for, the previous responses.",
+            hint="Set CACHE_URL to a shared backend (Redis, Memcached), or run a single worker.",
+            id='api.W001',
+        )]
+    return []
+
+
+@register(Tags.database)
+def check_readings_partitioned(app_configs, databases=None, **kwargs):
+    """Run by `migrate` and `check --database`: migrations do not partition the readings table."""
+    if not settings.READINGS_PARTITIONED or not databases:
+        return []
+    from . import partitions
+
+    return [
+        Warning(
+            f"READINGS_PARTITIONED is on but the readings table of database '{alias}' is not partitioned.",
+            hint=f"Run `manage.py partition_readings convert --database {alias}`.",
+            id='api.W002',
+        )
+        for alias in databases
+        if connections[alias].vendor == 'postgresql' and not partitions.is_partitioned(connections[alias])
+    ]
+
+
+def check_replica_pin_cache():
+    """Refuse read replicas without a shared cache to keep the read-your-writes pins in."""
+    if settings.DATABASE_REPLICAS and not is_shared('default'):
+        raise ImproperlyConfigured(
+            "DATABASE_REPLICAS needs a shared default cache (CACHE_URL=redis://...): with a "
+            "per-process cache, a client's reads after a write go to a lagging replica "
+            "whenever another worker serves them."
+        )
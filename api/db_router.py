@@ -0,0 +1,127 @@
+"""
+Read replica routing for the analytical endpoints.
+
+Safe (GET/HEAD/OPTIONS) requests to views using `ReplicaReadMixin` (the
+anemometer and reading viewsets, the stats view) read from one of the
+`DATABASE_REPLICAS` aliases, chosen once per request so that every query of a
+response sees the same replica: in turn (`DATABASE_REPLICA_SELECTION=round_robin`)
+or at random in proportion to their weights (`weighted`). Writes, and reads
+outside those requests, go to `default`.
+
+After a successful write, the client's reads stay on the primary for
+`READ_YOUR_WRITES_SECONDS`, so replica lag never hides its own changes. The pin
+is kept in the default cache, which must be shared by the workers: startup
+fails when replicas are configured over a per-process cache. Responses read
+from a replica may predate the latest write, so the response cache never
+stores them.
+"""
+import itertools
+import random
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+ROUND_ROBIN = 'round_robin'
+WEIGHTED = 'weighted'
+
+_read_alias = ContextVar('read_alias', default=None)
+_turns = itertools.count()
+_turns_lock = threading.Lock()
+
+
+def choose_replica():
+    """Alias of the replica serving the next request, or None without replicas."""
+    replicas = settings.DATABASE_REPLICAS
+    if not replicas:
+        return None
+    aliases = list(replicas)
+    if settings.DATABASE_REPLICA_SELECTION == WEIGHTED:
+        return random.choices(aliases, weights=[replicas[alias] for alias in aliases])[0]
+    with _turns_lock:
+        turn = next(_turns)
+    return aliases[turn % len(aliases)]
+
+
+def reading_from_replica():
+    """Whether the reads of the current request go to a replica."""
+    return _read_alias.get() is not None
+
+
+@contextmanager
+def reading_from(alias):
+    """Route the reads made inside the block to `alias` (None: the default routing)."""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def _pin_key(user):
+    return f'replica-pin:{user.pk}'
+
+
+def pin_to_primary(user):
+    """Send `user`'s reads to the primary for `READ_YOUR_WRITES_SECONDS`."""
+    cache.set(_pin_key(user), True, settings.READ_YOUR_WRITES_SECONDS)
+
+
+def is_pinned(user):
+    return cache.get(_pin_key(user), False)
+
+
+class ReplicaRouter:
+    """Reads go to the replica chosen for the current request, if any; writes to `default`."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are migrated through replication from the primary.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Serve the safe requests of a DRF view from a replica, unless the user wrote
+    recently. Querysets evaluated after the view returns (streamed responses)
+    must be bound to the replica with `.using(queryset.db)` inside the view.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        # After authentication: the user is needed to look up the read-your-writes pin.
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and settings.DATABASE_REPLICAS and not is_pinned(request.user):
+            self._replica_reads = reading_from(choose_replica())
+            self._replica_reads.__enter__()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        replica_reads = getattr(self, '_replica_reads', None)
+        if replica_reads is not None:
+            self._replica_reads = None
+            replica_reads.__exit__(None, None, None)
+        if (
+            request.method not in SAFE_METHODS
+            and settings.DATABASE_REPLICAS
+            and response.status_code < 400
+            and request.user.is_authenticated
+        ):
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
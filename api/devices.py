@@ -0,0 +1,113 @@
+"""
+API keys of anemometer gateways.
+
+A gateway sends `Authorization: Device <key>` instead of obtaining and
+refreshing JWTs: no PBKDF2 password check, no token round trips. The key is
+hashed with HMAC-SHA256 and looked up by hash, once per `DEVICE_KEY_CACHE_TTL`
+seconds thanks to an in-process cache (evicted when the credential is saved or
+deleted in this process, so revoking takes up to the TTL in other workers).
+
+Keys are scoped: `DeviceScope` only lets them through the actions a view lists
+in `device_actions` (creating readings), and `scoped_reading` only for the
+key's own anemometer, which is then known to exist and is not looked up again.
+If it was deleted since the key was cached, the insert fails its foreign key
+and `stale_credential` evicts the key.
+"""
+from collections.abc import Mapping
+
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied, ValidationError
+from rest_framework.permissions import BasePermission
+
+from .authentication import TTLCache
+from .models import DeviceCredential
+
+credential_cache = TTLCache('DEVICE_KEY_CACHE_SIZE', 'DEVICE_KEY_CACHE_TTL')
+
+
+class DeviceUser:
+    """`request.user` of requests authenticated with a device key."""
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+    is_staff = False
+    is_superuser = False
+    username = ''
+
+    def __init__(self, credential):
+        self.credential = credential
+        # Distinct from user ids, e.g. in the read-your-writes pins of api.db_router.
+        self.pk = self.id = f'device:{credential.pk}'
+
+    def __str__(self):
+        return f'Device {self.credential}'
+
+
+class DeviceKeyAuthentication(BaseAuthentication):
+    keyword = 'Device'
+
+    def authenticate(self, request):
+        header = get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(header) != 2:
+            raise AuthenticationFailed("Invalid device key header.")
+        try:
+            key = header[1].decode('ascii')
+        except UnicodeDecodeError:
+            raise AuthenticationFailed("Invalid device key.")
+
+        key_hash = DeviceCredential.hash_key(key)
+        credential = credential_cache.get(key_hash)
+        if credential is None:
+            credential = DeviceCredential.objects.filter(key_hash=key_hash, is_active=True).first()
+            if credential is None:
+                raise AuthenticationFailed("Invalid device key.")
+            credential_cache.set(key_hash, credential)
+        return DeviceUser(credential), credential
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+class DeviceScope(BasePermission):
+    """Device keys may only use the actions listed in the view's `device_actions`."""
+    message = "Device keys can only post readings."
+
+    def has_permission(self, request, view):
+        if not isinstance(request.auth, DeviceCredential):
+            return True
+        return getattr(view, 'action', None) in getattr(view, 'device_actions', ())
+
+
+def scoped_reading(credential, data):
+    """
+    Reading `data` posted with `credential`, its anemometer defaulting to the key's.
+
+    Raises PermissionDenied for another anemometer.
+    """
+    if not isinstance(data, Mapping):
+        raise ValidationError({'non_field_errors': ["Expected a reading object."]})
+    anemometer = data.get('anemometer', credential.anemometer_id)
+    if str(anemometer) != str(credential.anemometer_id):
+        raise PermissionDenied(f"This device key can only post readings for anemometer {credential.anemometer_id}.")
+    return {**{key: data[key] for key in data}, 'anemometer': credential.anemometer_id}
+
+
+def scoped_row(credential, row):
+    """`scoped_reading` for a row of a bulk request: another anemometer only rejects that row."""
+    if not isinstance(row, Mapping):
+        return row
+    try:
+        return scoped_reading(credential, row)
+    except PermissionDenied as exc:
+        raise ValidationError({'anemometer': [exc.detail]})
+
+
+def stale_credential(credential):
+    """
+    Evict `credential`, whose anemometer turned out to be deleted (and with it the
+    credential), from the cache; returns the AuthenticationFailed to raise.
+    """
+    credential_cache.invalidate(credential.key_hash)
+    return AuthenticationFailed("Invalid device key.")
@@ -1,6 +1,22 @@
+import re
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta, timezone as dt_timezone
+
 import factory
+import numpy as np
 from django.contrib.auth.models import User
-from .models import Anemometer, WindSpeedReading
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from . import cache
+from .ingest import copy_rows
+from .models import Anemometer, IndexVersion, ReadingRollup, WindSpeedReading
+from .rollups import merge_buckets
+from .search import name_index
+from .spatial import anemometer_index
+from .tags import sync_tags
+from .utils import as_utc
 
 class UserFactory(factory.django.DjangoModelFactory):
     class Meta:
@@ -26,3 +42,171 @@ class WindSpeedReadingFactory(factory.django.DjangoModelFactory):
     anemometer = factory.SubFactory(AnemometerFactory)
     speed_knots = factory.Faker('random_float', left_digits=2, right_digits=1, positive=True)
     recorded_at = factory.Faker('date_time_this_year')
+
+
+# Bulk seeding for performance testing. The factories above build one object at a
+# time through Faker; these generate whole arrays with numpy and insert raw rows.
+
+SEED_BOUNDS = (43.0, 48.0, -6.0, -1.0)  # min/max latitude, min/max longitude
+
+
+def create_anemometers(count, seed=None, prefix='Seeded', bounds=SEED_BOUNDS, tags=('seeded',), batch_size=5000):
+    """
+    Insert `count` anemometers spread uniformly over `bounds` and return them.
+
+    Names are `{prefix} {n}`, numbered after the largest `n` already in use, so
+    seeding again after deletions does not collide with the remaining names.
+    """
+    rng = np.random.default_rng(seed)
+    min_lat, max_lat, min_lon, max_lon = bounds
+    latitudes = rng.uniform(min_lat, max_lat, count).round(6).tolist()
+    longitudes = rng.uniform(min_lon, max_lon, count).round(6).tolist()
+    first = _next_seed_number(prefix)
+    anemometers = Anemometer.objects.bulk_create(
+        [
+            Anemometer(name=f'{prefix} {first + i}', latitude=latitude, longitude=longitude, tags=list(tags))
+            for i, (latitude, longitude) in enumerate(zip(latitudes, longitudes))
+        ],
+        batch_size=batch_size,
+    )
+    # bulk_create skips the post_save signals: sync the tag table and make every
+    # worker rebuild its in-process indexes.
+    sync_tags(anemometers)
+    IndexVersion.bump(anemometer_index.version_name)
+    IndexVersion.bump(name_index.version_name)
+    cache.invalidate()
+    return anemometers
+
+
+def _next_seed_number(prefix):
+    # Among decimal suffixes, the longest then greatest name has the largest number.
+    last = Anemometer.objects.filter(name__regex=rf'^{re.escape(prefix)} [0-9]+$').order_by(
+        Length('name').desc(), '-name',
+    ).values_list('name', flat=True).first()
+    return int(last.rsplit(' ', 1)[1]) + 1 if last else 0
+
+
+def generate_readings(anemometer_ids, per_anemometer, start, interval=timedelta(minutes=10), seed=None, chunk_size=100000):
+    """
+    Yield (anemometer_ids, speeds, recorded_at) numpy arrays of at most `chunk_size` readings.
+
+    Each anemometer gets `per_anemometer` readings every `interval` from `start`,
+    offset by a random number of whole seconds. Speeds follow a diurnal cycle
+    around a per-station mean (peaking mid-afternoon), a slower multi-day weather
+    swing, noise, and occasional gusts. The same seed gives the same readings
+    whatever the chunk size.
+    """
+    ids = np.asarray(anemometer_ids, dtype=np.int64)
+    step = int(interval.total_seconds())
+    params, noise, gusts, gust_sizes = (np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(4))
+    count = len(ids)
+    mean = params.gamma(4.0, 3.0, count)  # knots, about 12 on average
+    amplitude = params.uniform(0.1, 0.4, count)
+    peak_hour = params.normal(15.0, 1.5, count)
+    weather_period = params.uniform(2.0, 7.0, count) * 86400
+    weather_phase = params.uniform(0.0, 2 * np.pi, count)
+    offset = params.integers(0, max(step, 1), count)
+
+    origin = np.datetime64(as_utc(start).replace(tzinfo=None), 's')
+    origin_seconds = origin.astype(np.int64)
+    total = count * per_anemometer
+    for low in range(0, total, chunk_size):
+        # Time-major order: the time-based indexes of the table are appended to.
+        index = np.arange(low, min(low + chunk_size, total))
+        station = index % count
+        seconds = (index // count) * step + offset[station]
+        hour = ((origin_seconds + seconds) % 86400) / 3600
+        speeds = mean[station] * (
+            (1 + amplitude[station] * np.cos(2 * np.pi * (hour - peak_hour[station]) / 24))
+            * (1 + 0.3 * np.sin(2 * np.pi * seconds / weather_period[station] + weather_phase[station]))
+            * (1 + noise.normal(0.0, 0.12, len(index)))
+        )
+        gusting = gusts.random(len(index)) < 0.02
+        speeds = np.where(gusting, speeds * gust_sizes.uniform(1.3, 1.9, len(index)), speeds)
+        yield ids[station], np.clip(speeds, 0.0, None).round(1), origin + seconds
+
+
+def _chunk_buckets(ids, speeds, moments):
+    """Hourly and daily rollup buckets of a chunk of readings."""
+    order = np.lexsort((moments, ids))
+    ids, speeds, seconds = ids[order], speeds[order], moments[order].astype(np.int64)
+    buckets = {}
+    for granularity, width in ((ReadingRollup.HOUR, 3600), (ReadingRollup.DAY, 86400)):
+        starts = seconds - seconds % width
+        edges = np.flatnonzero((ids[1:] != ids[:-1]) | (starts[1:] != starts[:-1])) + 1
+        first = np.concatenate(([0], edges))
+        counts = np.diff(np.append(first, len(ids)))
+        for anemometer_id, start, count, total, low, high in zip(
+            ids[first].tolist(), starts[first].tolist(), counts.tolist(),
+            np.add.reduceat(speeds, first).tolist(),
+            np.minimum.reduceat(speeds, first).tolist(),
+            np.maximum.reduceat(speeds, first).tolist(),
+        ):
+            buckets[(anemometer_id, granularity, datetime.fromtimestamp(start, dt_timezone.utc))] = (count, total, low, high)
+    return buckets
+
+
+@contextmanager
+def _deferred_indexes(connection, table):
+    """Drop the non-unique indexes of `table` and recreate them from their DDL on exit."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL", [table])
+        elif connection.vendor == 'postgresql':
+            cursor.execute("SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s", [table])
+        else:
+            yield
+            return
+        indexes = [(name, sql) for name, sql in cursor.fetchall() if not sql.upper().startswith('CREATE UNIQUE')]
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
+
+
+def seed_readings(anemometer_ids, per_anemometer, start=None, interval=timedelta(minutes=10), seed=None,
+                  chunk_size=100000, defer_indexes=False, using=DEFAULT_DB_ALIAS):
+    """
+    Insert `generate_readings` output in chunks and return the number of readings.
+
+    Rows skip the ORM: `COPY FROM STDIN` on PostgreSQL, `executemany` elsewhere.
+    Each chunk is aggregated into its rollup buckets with numpy and merged in the
+    same transaction. `start` defaults to the series ending now.
+
+    With `defer_indexes`, the secondary indexes of the readings table are dropped
+    for the load and rebuilt at the end, which is several times faster for large
+    seeds but rebuilds them over the whole table: use it on an idle database.
+    """
+    if start is None:
+        start = timezone.now().replace(microsecond=0) - interval * per_anemometer
+    connection = connections[using]
+    meta = WindSpeedReading._meta
+    table = connection.ops.quote_name(meta.db_table)
+    columns = [connection.ops.quote_name(meta.get_field(name).column) for name in ('anemometer', 'speed_knots', 'recorded_at')]
+    insert_sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES (%s, %s, %s)"
+
+    inserted = 0
+    with _deferred_indexes(connection, meta.db_table) if defer_indexes else nullcontext():
+        for ids, speeds, moments in generate_readings(anemometer_ids, per_anemometer, start, interval, seed, chunk_size):
+            if connection.vendor == 'postgresql':
+                values = np.datetime_as_string(moments, unit='s', timezone='UTC').tolist()
+            else:
+                # The format Django writes naive UTC datetimes in, so text comparisons stay valid:
+                # 'YYYY-MM-DD HH:MM:SS', the 'T' replaced in place through a per-character view.
+                text = np.datetime_as_string(moments, unit='s')
+                text.view('<U1').reshape(len(text), -1)[:, 10] = ' '
+                values = text.tolist()
+            rows = list(zip(ids.tolist(), speeds.tolist(), values))
+            with transaction.atomic(using=using), connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    copy_rows(cursor, table, columns, rows)
+                else:
+                    cursor.executemany(insert_sql, rows)
+                merge_buckets(_chunk_buckets(ids, speeds, moments))
+            inserted += len(rows)
+    cache.readings_changed()
+    return inserted
@@ -1,11 +1,16 @@
 import django_filters
 from .models import Anemometer
-from django.db.models import Q, QuerySet
-from django_filters.filters import CharFilter
+from .tags import MATCH_ANY, MATCH_CHOICES, filter_by_tags
+from django.db.models import QuerySet
+from django_filters.filters import CharFilter, ChoiceFilter
 
 
 class AnemometerFilter(django_filters.FilterSet):
     tags = CharFilter(method='filter_tags', help_text="Filter by tags (comma-separated).")
+    tags_match = ChoiceFilter(
+        choices=MATCH_CHOICES, method='filter_tags_match',
+        help_text="Whether anemometers must have any (default) or all of the tags.",
+    )
 
     class Meta:
         model = Anemometer
@@ -15,9 +20,11 @@ class AnemometerFilter(django_filters.FilterSet):
         Filters the queryset based on a comma-separated list of tags.
         """
         tag_list = [tag.strip() for tag in value.split(",") if tag.strip()]
-        if tag_list:
-            query = Q()
-            for tag in tag_list:
-                query |= Q(tags__icontains=tag)
-            return queryset.filter(query)
+        match = self.form.cleaned_data.get('tags_match') or MATCH_ANY
+        return filter_by_tags(queryset, tag_list, match)
+
+    def filter_tags_match(self, queryset: QuerySet, name: str, value: str) -> QuerySet:
+        """
+        Match mode of the `tags` filter, applied there.
+        """
         return queryset
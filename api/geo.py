@@ -0,0 +1,163 @@
+"""
+Vectorized great-circle helpers used by the radius queries.
+
+Anemometer coordinates are held in contiguous float64 arrays so a batch of
+stations is measured in a handful of NumPy operations instead of one geopy
+call per row. Distances are computed with the haversine formula on the mean
+Earth radius; stations whose spherical distance lands close to the query
+radius are refined with Vincenty's inverse formula on the WGS-84 ellipsoid,
+which agrees with geopy's `geodesic` to well below a millimetre.
+"""
+import math
+
+import numpy as np
+from geopy.distance import geodesic
+
+METERS_PER_NAUTICAL_MILE = 1852.0
+EARTH_MEAN_RADIUS_NM = 6371008.8 / METERS_PER_NAUTICAL_MILE
+
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+# The local radius of curvature of the WGS-84 ellipsoid stays within 0.56% of the
+# mean radius, so haversine distances outside this relative band cannot change side
+# of the radius once measured on the ellipsoid.
+HAVERSINE_RELATIVE_ERROR = 0.006
+
+# Degrees of latitude covered by one nautical mile (one arc-minute on the sphere).
+DEGREES_PER_NAUTICAL_MILE = 1 / 60
+# Widen the bounding box slightly so ellipsoidal (WGS-84) distances never fall
+# outside of it: a geodesic arc-minute varies between 1842.9m and 1861.6m.
+BOUNDING_BOX_PADDING = 1.01
+
+
+def bounding_box(latitude, longitude, radius):
+    """
+    Return a conservative (min_lat, max_lat, lon_ranges) box around a point.
+
+    `radius` is expressed in nautical miles. `lon_ranges` is a list of
+    (min_lon, max_lon) tuples: it holds two ranges when the box crosses the
+    antimeridian and a single full range when it reaches a pole.
+    """
+    delta_lat = radius * DEGREES_PER_NAUTICAL_MILE * BOUNDING_BOX_PADDING
+    min_lat = latitude - delta_lat
+    max_lat = latitude + delta_lat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), [(-180.0, 180.0)]
+
+    widest_lat = max(abs(min_lat), abs(max_lat))
+    delta_lon = delta_lat / math.cos(math.radians(widest_lat))
+    if delta_lon >= 180:
+        return min_lat, max_lat, [(-180.0, 180.0)]
+
+    min_lon = longitude - delta_lon
+    max_lon = longitude + delta_lon
+    if min_lon < -180:
+        return min_lat, max_lat, [(min_lon + 360, 180.0), (-180.0, max_lon)]
+    if max_lon > 180:
+        return min_lat, max_lat, [(min_lon, 180.0), (-180.0, max_lon - 360)]
+    return min_lat, max_lat, [(min_lon, max_lon)]
+
+
+def haversine_nm(latitude, longitude, latitudes, longitudes):
+    """Spherical distances, in nautical miles, from one point to arrays of points."""
+    lat1 = math.radians(latitude)
+    lat2 = np.radians(latitudes)
+    dlat = lat2 - lat1
+    dlon = np.radians(longitudes) - math.radians(longitude)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_MEAN_RADIUS_NM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def vincenty_nm(latitude, longitude, latitudes, longitudes, max_iterations=200, tolerance=1e-12):
+    """
+    Ellipsoidal distances, in nautical miles, using Vincenty's inverse formula.
+
+    The iteration does not converge for nearly antipodal points; those entries
+    are measured with geopy's `geodesic` instead.
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+
+    L = np.radians(longitudes - longitude)
+    U1 = math.atan((1 - WGS84_F) * math.tan(math.radians(latitude)))
+    U2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(latitudes)))
+    sin_u1, cos_u1 = math.sin(U1), math.cos(U1)
+    sin_u2, cos_u2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(max_iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines have cos2_alpha == 0, where cos(2 sigma_m) is taken as 0.
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha)
+            C = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+            previous = lam
+            lam = L + (1 - C) * WGS84_F * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+            )
+            converged = np.abs(lam - previous) <= tolerance
+            if converged.all():
+                break
+
+        u2 = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (
+            cos_2sigma_m + B / 4 * (
+                cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+                - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+            )
+        )
+        distances = WGS84_B * A * (sigma - delta_sigma) / METERS_PER_NAUTICAL_MILE
+
+    for i in np.flatnonzero(~converged | ~np.isfinite(distances)):
+        distances[i] = geodesic((latitude, longitude), (latitudes[i], longitudes[i])).nautical
+    return distances
+
+
+class StationArray:
+    """
+    Anemometer ids and coordinates stored as contiguous float64/int64 arrays.
+    """
+
+    __slots__ = ('ids', 'latitudes', 'longitudes')
+
+    def __init__(self, ids, latitudes, longitudes):
+        self.ids = np.ascontiguousarray(ids, dtype=np.int64)
+        self.latitudes = np.ascontiguousarray(latitudes, dtype=np.float64)
+        self.longitudes = np.ascontiguousarray(longitudes, dtype=np.float64)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from an iterable of (id, latitude, longitude) tuples, e.g. a `values_list`."""
+        table = np.array(list(rows), dtype=np.float64).reshape(-1, 3)
+        return cls(table[:, 0], table[:, 1], table[:, 2])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def within_radius(self, latitude, longitude, radius, refine=True):
+        """
+        Boolean mask of the stations within `radius` nautical miles of a point.
+
+        With `refine`, stations whose haversine distance is within
+        `HAVERSINE_RELATIVE_ERROR` of the radius are re-measured on the WGS-84
+        ellipsoid, so the mask matches geopy's `geodesic` semantics. Without it
+        the spherical distance alone decides (up to ~0.56% error at the edge).
+        """
+        distances = haversine_nm(latitude, longitude, self.latitudes, self.longitudes)
+        mask = distances <= radius
+        if refine and len(self):
+            band = np.flatnonzero(np.abs(distances - radius) <= radius * HAVERSINE_RELATIVE_ERROR + 1e-9)
+            if band.size:
+                exact = vincenty_nm(latitude, longitude, self.latitudes[band], self.longitudes[band])
+                mask[band] = exact <= radius
+        return mask
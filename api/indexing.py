@@ -0,0 +1,79 @@
+"""
+Per-process indexes kept in sync with a table across worker processes.
+
+Each worker keeps its own copy of an index: it is built lazily on first use,
+updated incrementally by the model signals once their transaction commits, and
+rebuilt whenever the shared `IndexVersion` counter shows that another worker
+changed the table. `VersionedIndex` implements that protocol; subclasses
+provide `build` and call `_apply` with the change to make to their copy.
+"""
+import threading
+
+from django.db import transaction
+
+from .models import IndexVersion
+
+
+class VersionedIndex:
+    """Process-wide copy of an index, rebuilt when `IndexVersion[version_name]` moves."""
+
+    version_name = None
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._index = None
+        self._version = None
+        # Versions bumped by this process whose transaction has not committed yet.
+        # Those of rolled back transactions stay, which only costs rebuilds until
+        # the version moves on.
+        self._uncommitted = set()
+
+    def build(self):
+        """A new copy of the index, from the database."""
+        raise NotImplementedError
+
+    def enabled(self):
+        """Whether anything reads the index; when not, changes do not bump the version."""
+        return True
+
+    def invalidate(self):
+        """Drop the local copy; the next query rebuilds it from the database."""
+        with self._lock:
+            self._index = None
+            self._version = None
+
+    def _fresh(self):
+        """The up-to-date copy. Call with `_lock` held for as long as the copy is used."""
+        version = IndexVersion.current(self.version_name)
+        with self._lock:
+            if self._index is None or self._version != version:
+                index = self.build()
+                if version in self._uncommitted:
+                    # Built from changes that may still roll back, and the version
+                    # with them: use it for this query only.
+                    return index
+                self._index, self._version = index, version
+            return self._index
+
+    def _apply(self, change):
+        """Bump the version in the current transaction and apply `change(index)` once it commits."""
+        if not self.enabled():
+            # Spare the write its counter update. Workers enabling the index
+            # later start from a fresh copy.
+            self.invalidate()
+            return
+        version = IndexVersion.bump(self.version_name)
+        with self._lock:
+            self._uncommitted.add(version)
+        # A rolled back save leaves neither the change nor the bumped version behind.
+        transaction.on_commit(lambda: self._commit(change, version))
+
+    def _commit(self, change, version):
+        with self._lock:
+            self._uncommitted.discard(version)
+            if self._index is not None and self._version is not None and version == self._version + 1:
+                change(self._index)
+                self._version = version
+            else:
+                # Another worker changed the table in between: rebuild on next use.
+                self._index = None
@@ -0,0 +1,143 @@
+"""
+Batched ingestion of wind speed readings.
+
+Rows are validated in one pass with a single serializer whose anemometer field
+is a plain integer; all referenced anemometers are then resolved with one `IN`
+query instead of one existence query per row. Valid rows are inserted with
+`bulk_create` in chunks, each chunk updating the rollups in the same transaction.
+
+For backfills, `copy_readings` streams rows with PostgreSQL's `COPY FROM STDIN`
+and falls back to a batched `executemany` on other databases (SQLite in dev).
+"""
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from rest_framework import serializers
+
+from . import cache
+from .models import Anemometer, WindSpeedReading
+from .rollups import record_readings
+
+
+class ReadingRowSerializer(serializers.Serializer):
+    anemometer = serializers.IntegerField()
+    speed_knots = serializers.FloatField()
+    recorded_at = serializers.DateTimeField(required=False)
+
+
+def validate_readings(rows, scope=None):
+    """
+    Validate raw reading dicts.
+
+    `scope`, if given, is applied to each row first and may reject it by raising
+    `ValidationError` (see `api.devices.scoped_row`).
+
+    Returns the unsaved valid `WindSpeedReading` instances and a list of
+    `{'index': ..., 'errors': {...}}` entries for the rejected rows.
+    """
+    row_serializer = ReadingRowSerializer()
+    validated, errors = [], []
+    for index, row in enumerate(rows):
+        try:
+            if scope is not None:
+                row = scope(row)
+            validated.append((index, row_serializer.run_validation(row)))
+        except serializers.ValidationError as exc:
+            errors.append({'index': index, 'errors': exc.detail})
+
+    referenced = {data['anemometer'] for _, data in validated}
+    existing = set(Anemometer.objects.filter(pk__in=referenced).values_list('pk', flat=True))
+
+    readings = []
+    for index, data in validated:
+        anemometer_id = data['anemometer']
+        if anemometer_id not in existing:
+            errors.append({
+                'index': index,
+                'errors': {'anemometer': [f'Invalid pk "{anemometer_id}" - object does not exist.']},
+            })
+            continue
+        reading = WindSpeedReading(anemometer_id=anemometer_id, speed_knots=data['speed_knots'])
+        if 'recorded_at' in data:
+            reading.recorded_at = data['recorded_at']
+        readings.append(reading)
+    errors.sort(key=lambda error: error['index'])
+    return readings, errors
+
+
+def insert_readings(readings, batch_size=None):
+    """Insert readings with `bulk_create` in chunks and update their rollups. Returns the count."""
+    batch_size = batch_size or settings.READINGS_BULK_BATCH_SIZE
+    inserted = 0
+    for offset in range(0, len(readings), batch_size):
+        chunk = readings[offset:offset + batch_size]
+        with transaction.atomic():
+            WindSpeedReading.objects.bulk_create(chunk)
+            record_readings((r.anemometer_id, r.speed_knots, r.recorded_at) for r in chunk)
+            cache.readings_changed()
+        inserted += len(chunk)
+    return inserted
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Send `rows` to the quoted `columns` of `table` with `COPY FROM STDIN` (PostgreSQL only)."""
+    raw = cursor.cursor
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    if hasattr(raw, 'copy_expert'):  # psycopg2
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        raw.copy_expert(sql, buffer)
+    else:  # psycopg 3
+        with raw.copy(sql) as copy:
+            for row in rows:
+                copy.write_row(row)
+
+
+def copy_readings(readings, batch_size=None, using=DEFAULT_DB_ALIAS):
+    """
+    Insert readings with `COPY FROM STDIN` on PostgreSQL, or `executemany` elsewhere.
+
+    Rows are sent in chunks, each in its own transaction with the matching rollup
+    update. Unlike `insert_readings`, primary keys are not set on the instances.
+    Returns the count.
+    """
+    batch_size = batch_size or settings.READINGS_BULK_BATCH_SIZE
+    connection = connections[using]
+    meta = WindSpeedReading._meta
+    table = connection.ops.quote_name(meta.db_table)
+    fields = [meta.get_field('anemometer'), meta.get_field('speed_knots'), meta.get_field('recorded_at')]
+    columns = [connection.ops.quote_name(field.column) for field in fields]
+    insert_sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES (%s, %s, %s)"
+
+    inserted = 0
+    for offset in range(0, len(readings), batch_size):
+        chunk = readings[offset:offset + batch_size]
+        rows = [
+            (r.anemometer_id, r.speed_knots, fields[2].get_db_prep_save(r.recorded_at, connection))
+            for r in chunk
+        ]
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                copy_rows(cursor, table, columns, rows)
+            else:
+                cursor.executemany(insert_sql, rows)
+            record_readings((r.anemometer_id, r.speed_knots, r.recorded_at) for r in chunk)
+            cache.readings_changed()
+        inserted += len(chunk)
+    return inserted
+
+
+def read_rows(stream, data_format):
+    """Yield reading dicts from a text stream of CSV (with a header row) or NDJSON lines."""
+    if data_format == 'csv':
+        for row in csv.DictReader(stream):
+            yield {key: value for key, value in row.items() if value not in ('', None)}
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
@@ -0,0 +1,119 @@
+"""
+Logging building blocks of the production profile (`windforlife/settings/prod.py`).
+
+- `BackgroundHandler` queues records and leaves formatting and writing to a
+  `QueueListener` thread: a slow disk or pipe no longer blocks requests. When
+  the queue is full, records are dropped and counted instead of blocking.
+- `JSONFormatter` writes one JSON object per line, with the `extra` fields of
+  the record.
+- `SamplingFilter` keeps a fraction of the records up to a level (INFO by
+  default), for loggers that log on every request; records above that level
+  always pass.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+# Attributes of every LogRecord: anything else was passed through `extra`.
+_RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {'message', 'asctime', 'taskName'}
+
+
+class BackgroundHandler(logging.handlers.QueueHandler):
+    """
+    `QueueHandler` whose `QueueListener` thread writes the records to stdout, and to
+    `filename` if given (reopened when logrotate moves it), with this handler's formatter.
+    """
+
+    def __init__(self, filename=None, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        targets = [logging.StreamHandler(sys.stdout)]
+        if filename:
+            targets.append(logging.handlers.WatchedFileHandler(filename))
+        self.listener = logging.handlers.QueueListener(self.queue, *targets)
+        self.dropped = 0
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def setFormatter(self, fmt):
+        # Records are formatted by the listener's handlers, in the background thread.
+        for handler in self.listener.handlers:
+            handler.setFormatter(fmt)
+
+    def _start(self):
+        # Lazily, in each worker: the thread of a listener started before a fork is gone in the child.
+        # Checked again under the lock so that threads logging at once start a single listener.
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self.listener.start()
+                self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Merge the arguments into the message and render the traceback now, while they are
+        # current, but leave the formatting of the record to the listener.
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        super().emit(record)
+
+    def close(self):
+        # Called by logging.shutdown() at exit: write out what is still queued.
+        with self._start_lock:
+            if self._pid == os.getpid():
+                self._pid = None
+                self.listener.stop()
+        super().close()
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, traceback and extra fields."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'process': record.process,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a `rate` fraction of the records up to `max_level`, and every record above it."""
+
+    def __init__(self, rate=1.0, max_level='INFO'):
+        super().__init__()
+        self.rate = float(rate)
+        self.max_level = logging.getLevelName(max_level) if isinstance(max_level, str) else max_level
+
+    def filter(self, record):
+        return record.levelno > self.max_level or self.rate >= 1.0 or random.random() < self.rate
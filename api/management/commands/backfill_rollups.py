@@ -0,0 +1,38 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date, parse_datetime
+
+from api.rollups import backfill
+
+
+class Command(BaseCommand):
+    help = "Rebuild the hourly and daily wind speed rollups from the raw readings."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--anemometer', type=int, action='append', dest='anemometers',
+            help="Only rebuild the rollups of this anemometer id (repeatable).",
+        )
+        parser.add_argument(
+            '--since',
+            help="Only rebuild buckets from the UTC day of this ISO date or datetime.",
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                day = parse_date(options['since'])
+                if day is None:
+                    raise CommandError(f"Invalid --since value: {options['since']!r}")
+                since = datetime.combine(day, time.min)
+
+        written = backfill(
+            anemometer_ids=options['anemometers'],
+            since=since,
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} rollup buckets."))
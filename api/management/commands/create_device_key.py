@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Anemometer, DeviceCredential
+
+
+class Command(BaseCommand):
+    help = (
+        "Create an API key for the gateway of an anemometer, allowed to post its readings "
+        "with 'Authorization: Device <key>'. The key is printed once and not stored."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('anemometer', type=int, help="Anemometer id.")
+        parser.add_argument('--name', default='', help="Label of the key, e.g. the gateway's serial number.")
+
+    def handle(self, *args, **options):
+        try:
+            anemometer = Anemometer.objects.get(pk=options['anemometer'])
+        except Anemometer.DoesNotExist:
+            raise CommandError(f"Anemometer {options['anemometer']} does not exist.")
+        credential, key = DeviceCredential.issue(anemometer, name=options['name'])
+        self.stderr.write(f"Created key {credential.prefix}... (credential {credential.pk}) for {anemometer}.")
+        self.stdout.write(key)
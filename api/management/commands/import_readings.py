@@ -0,0 +1,55 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ingest import copy_readings, read_rows, validate_readings
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream wind speed readings from a CSV or NDJSON file into the database, "
+        "using COPY FROM STDIN on PostgreSQL and batched executemany elsewhere."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' to read from stdin.")
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=settings.READINGS_BULK_BATCH_SIZE)
+        parser.add_argument('--max-errors', type=int, default=20, help="Number of rejected rows to print.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        data_format = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+        if path == '-' and not options['format']:
+            raise CommandError("--format is required when reading from stdin.")
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            created, rejected = self._import(read_rows(stream, data_format), options)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write(self.style.SUCCESS(f"Imported {created} readings, rejected {rejected}."))
+
+    def _import(self, rows, options):
+        batch_size = options['batch_size']
+        created = rejected = offset = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                created, rejected = self._flush(batch, offset, created, rejected, options)
+                offset += len(batch)
+                batch = []
+        if batch:
+            created, rejected = self._flush(batch, offset, created, rejected, options)
+        return created, rejected
+
+    def _flush(self, batch, offset, created, rejected, options):
+        readings, errors = validate_readings(batch)
+        for error in errors:
+            if rejected < options['max_errors']:
+                self.stderr.write(f"Row {offset + error['index'] + 1}: {dict(error['errors'])}")
+            rejected += 1
+        return created + copy_readings(readings, batch_size=options['batch_size']), rejected
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from api import cache, partitions
+
+
+class Command(BaseCommand):
+    help = "Manage the monthly PostgreSQL partitions of the wind speed readings table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'action', choices=['convert', 'revert', 'maintain'],
+            help="convert/revert the table to/from monthly partitions, or maintain its partitions.",
+        )
+        parser.add_argument('--ahead', type=int, default=3, help="Months to create ahead of the current one.")
+        parser.add_argument('--retain', type=int, help="Detach partitions older than this many months.")
+        parser.add_argument('--drop', action='store_true', help="Drop expired partitions instead of only detaching them.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'postgresql':
+            raise CommandError("Partitioning of the readings table requires PostgreSQL.")
+
+        with transaction.atomic(using=options['database']):
+            if options['action'] == 'convert':
+                partitions.convert(connection)
+                self.stdout.write(self.style.SUCCESS("Readings table is partitioned by month."))
+                return
+            if options['action'] == 'revert':
+                partitions.revert(connection)
+                self.stdout.write(self.style.SUCCESS("Readings table is no longer partitioned."))
+                return
+
+            if not partitions.is_partitioned(connection):
+                raise CommandError("The readings table is not partitioned; run the 'convert' action first.")
+            for name in partitions.create_partitions(connection, options['ahead']):
+                self.stdout.write(f"Created partition {name}.")
+            if options['retain'] is not None:
+                expired = partitions.expire_partitions(connection, options['retain'], drop=options['drop'])
+                for name in expired:
+                    self.stdout.write(f"{'Dropped' if options['drop'] else 'Detached'} partition {name}.")
+                if expired:
+                    cache.invalidate()
@@ -0,0 +1,62 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from api.factories import create_anemometers, seed_readings
+from api.models import Anemometer
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate anemometers and synthetic wind speed time series (diurnal cycle, "
+        "weather swings, gusts) for performance testing. Requires the dev dependencies."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--anemometers', type=int, default=100, help="New anemometers to create.")
+        parser.add_argument(
+            '--existing', action='store_true',
+            help="Seed readings for every existing anemometer instead of creating new ones.",
+        )
+        parser.add_argument('--readings', type=int, default=1000, help="Readings per anemometer.")
+        parser.add_argument('--interval', type=int, default=600, help="Seconds between readings.")
+        parser.add_argument('--start', help="ISO datetime of the first readings; defaults to series ending now.")
+        parser.add_argument('--seed', type=int, help="Random seed, for reproducible data.")
+        parser.add_argument('--prefix', default='Seeded', help="Name prefix of the new anemometers.")
+        parser.add_argument('--chunk-size', type=int, default=100000)
+        parser.add_argument(
+            '--defer-indexes', action='store_true',
+            help="Drop the readings indexes during the load and rebuild them after (idle databases only).",
+        )
+
+    def handle(self, *args, **options):
+        start = None
+        if options['start']:
+            start = parse_datetime(options['start'])
+            if start is None:
+                raise CommandError(f"Invalid --start value: {options['start']!r}")
+        if options['interval'] < 1:
+            raise CommandError("--interval must be at least one second.")
+
+        began = time.perf_counter()
+        if options['existing']:
+            ids = list(Anemometer.objects.order_by('pk').values_list('pk', flat=True))
+        else:
+            ids = [anemometer.pk for anemometer in create_anemometers(
+                options['anemometers'], seed=options['seed'], prefix=options['prefix'],
+            )]
+        inserted = seed_readings(
+            ids, options['readings'],
+            start=start,
+            interval=timedelta(seconds=options['interval']),
+            seed=options['seed'],
+            chunk_size=options['chunk_size'],
+            defer_indexes=options['defer_indexes'],
+        )
+        elapsed = time.perf_counter() - began
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {inserted} readings for {len(ids)} anemometers in {elapsed:.1f}s "
+            f"({inserted / elapsed:.0f} readings/s)."
+        ))
@@ -0,0 +1,185 @@
+"""
+Prometheus metrics of the API, served in the text exposition format at `/metrics`.
+
+`PerformanceMiddleware` records, per view (URL name), the request latency, the
+number and duration of database queries and the response size as histograms,
+and counts requests by status. Metrics are kept in memory by each process:
+`/metrics` reports the worker that serves the scrape, so scrape every worker
+(one process per container, or one port per worker).
+
+Observing a value takes a lock and a bisect over the buckets, a couple of
+microseconds (`python -m benchmarks.bench_metrics`).
+"""
+import ipaddress
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+
+
+class Histogram:
+    """Histogram whose series are keyed by label values, rendered with cumulative buckets."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series = {}
+
+    def observe(self, value, labels=()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, [("le", _number(bound))])} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}'
+
+
+class Gauge:
+    """Gauge read from `function()` at scrape time."""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, function):
+        self.name, self.documentation, self.function = name, documentation, function
+
+    def samples(self):
+        yield f'{self.name} {_number(self.function())}'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+requests_total = registry.register(Counter(
+    'windforlife_http_requests_total', 'HTTP requests by view, method and status.', ['view', 'method', 'status'],
+))
+request_seconds = registry.register(Histogram(
+    'windforlife_http_request_duration_seconds', 'Wall time of HTTP requests.', LATENCY_BUCKETS, ['view', 'method'],
+))
+request_queries = registry.register(Histogram(
+    'windforlife_http_request_db_queries', 'Database queries per HTTP request.', QUERY_COUNT_BUCKETS, ['view', 'method'],
+))
+request_db_seconds = registry.register(Histogram(
+    'windforlife_http_request_db_duration_seconds', 'Time spent in database queries per HTTP request.', LATENCY_BUCKETS, ['view', 'method'],
+))
+response_bytes = registry.register(Histogram(
+    'windforlife_http_response_size_bytes', 'Size of non-streamed HTTP response bodies.', SIZE_BUCKETS, ['view', 'method'],
+))
+
+
+def _buffer_metric(name):
+    def read():
+        from .buffer import reading_buffer
+        return reading_buffer.metrics()[name]
+    return read
+
+
+registry.register(Gauge('windforlife_reading_buffer_queue_depth', 'Readings waiting in the write-behind buffer.', _buffer_metric('queue_depth')))
+registry.register(Gauge('windforlife_reading_buffer_flushed_rows', 'Readings written by the write-behind buffer.', _buffer_metric('flushed_rows')))
+registry.register(Gauge('windforlife_reading_buffer_failed_rows', 'Readings lost to failed buffer flushes.', _buffer_metric('failed_rows')))
+registry.register(Gauge('windforlife_reading_buffer_timeouts', 'Requests that gave up waiting for a buffer flush.', _buffer_metric('timeouts')))
+registry.register(Gauge('windforlife_reading_buffer_last_flush_seconds', 'Duration of the last buffer flush.', _buffer_metric('last_flush_seconds')))
+
+
+def observe_request(view, method, status, seconds, queries, db_seconds, size=None):
+    labels = (view, method)
+    requests_total.inc((view, method, str(status)))
+    request_seconds.observe(seconds, labels)
+    request_queries.observe(queries, labels)
+    request_db_seconds.observe(db_seconds, labels)
+    if size is not None:
+        response_bytes.observe(size, labels)
+
+
+def _may_scrape(request):
+    """Whether the request carries the `METRICS_TOKEN` or comes from `METRICS_ALLOWED_IPS`."""
+    token = settings.METRICS_TOKEN
+    if token and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False) for network in settings.METRICS_ALLOWED_IPS)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint: 404 unless `METRICS_ENDPOINT_ENABLED`, 403 to other clients."""
+    if not settings.METRICS_ENDPOINT_ENABLED:
+        raise Http404
+    if not _may_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,91 @@
+"""
+Per-request performance instrumentation.
+
+`PerformanceMiddleware` times every request, counts and times its database
+queries through `connection.execute_wrapper` on every configured alias, and
+measures the response body. The figures feed the Prometheus histograms of
+`api.metrics` (by view name) and, with `SERVER_TIMING_ENABLED`, the
+`Server-Timing` header shown in browsers' network panels:
+
+    Server-Timing: app;dur=12.41, db;dur=3.08;desc="4 queries"
+
+Disable the whole middleware with `PERFORMANCE_METRICS_ENABLED=False`.
+"""
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics
+
+# Other methods share one label value, keeping the number of series bounded.
+METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'})
+
+
+class QueryTimer:
+    """`execute_wrapper` counting queries and summing their duration."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = settings.SERVER_TIMING_ENABLED
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with self._wrap_queries(timer):
+            response = self.get_response(request)
+        self._record(request, response, timer, time.perf_counter() - start)
+        return response
+
+    async def _acall(self, request):
+        timer = QueryTimer()
+        start = time.perf_counter()
+        # Database connections are shared with the threads of sync_to_async.
+        with self._wrap_queries(timer):
+            response = await self.get_response(request)
+        self._record(request, response, timer, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def _wrap_queries(timer):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(timer))
+        return stack
+
+    def _record(self, request, response, timer, seconds):
+        match = request.resolver_match
+        view = (match.view_name or match.url_name or 'unnamed') if match else 'unmatched'
+        method = request.method if request.method in METHODS else 'other'
+        size = None if response.streaming else len(response.content)
+        metrics.observe_request(view, method, response.status_code, seconds, timer.count, timer.seconds, size)
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'app;dur={seconds * 1000:.2f}, db;dur={timer.seconds * 1000:.2f};desc="{timer.count} queries"'
+            )
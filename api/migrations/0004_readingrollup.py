@@ -0,0 +1,70 @@
+# Generated by Django 4.2 on 2026-10-18 16:10
+
+from datetime import timezone
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import Trunc
+import django.db.models.deletion
+
+
+def backfill_rollups(apps, schema_editor):
+    # Readings stored before this migration never went through the rollup updates.
+    WindSpeedReading = apps.get_model('api', 'WindSpeedReading')
+    ReadingRollup = apps.get_model('api', 'ReadingRollup')
+    alias = schema_editor.connection.alias
+    for granularity in ('hour', 'day'):
+        rows = WindSpeedReading.objects.using(alias).order_by().annotate(
+            bucket=Trunc('recorded_at', granularity, tzinfo=timezone.utc),
+        ).values('anemometer_id', 'bucket').annotate(
+            count=Count('id'),
+            speed_sum=Sum('speed_knots'),
+            speed_min=Min('speed_knots'),
+            speed_max=Max('speed_knots'),
+        )
+        batch = []
+        for row in rows.iterator(chunk_size=1000):
+            batch.append(ReadingRollup(
+                anemometer_id=row['anemometer_id'],
+                granularity=granularity,
+                bucket_start=row['bucket'],
+                count=row['count'],
+                speed_sum=row['speed_sum'],
+                speed_min=row['speed_min'],
+                speed_max=row['speed_max'],
+            ))
+            if len(batch) >= 1000:
+                ReadingRollup.objects.using(alias).bulk_create(batch)
+                batch = []
+        ReadingRollup.objects.using(alias).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_indexversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.PositiveBigIntegerField()),
+                ('speed_sum', models.FloatField()),
+                ('speed_min', models.FloatField()),
+                ('speed_max', models.FloatField()),
+                ('anemometer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='api.anemometer')),
+            ],
+            options={
+                'ordering': ['bucket_start'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='readingrollup',
+            constraint=models.UniqueConstraint(fields=('anemometer', 'granularity', 'bucket_start'), name='unique_reading_rollup_bucket'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def unpartition_readings(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        from api import partitions
+        partitions.revert(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    """
+    Partitioning is applied with `manage.py partition_readings convert`, so that
+    the schema migrations give the same result whatever the settings. Going back
+    past this migration still turns a partitioned table back into a plain one.
+    """
+
+    dependencies = [
+        ('api', '0004_readingrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, unpartition_readings),
+    ]
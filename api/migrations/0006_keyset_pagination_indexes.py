@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 16:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_partition_readings'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='anemometer',
+            index=models.Index(fields=['name', 'id'], name='api_anemome_name_b79bd7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='windspeedreading',
+            index=models.Index(fields=['recorded_at', 'id'], name='api_windspe_recorde_b3321b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='windspeedreading',
+            index=models.Index(fields=['anemometer', 'recorded_at', 'id'], name='api_windspe_anemome_8c551f_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2 on 2026-10-18 16:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+GIN_INDEX = 'api_anemometer_tags_gin'
+
+
+def index_tags(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        # jsonb_ops (not jsonb_path_ops) so the index serves both `@>` and `?|`.
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {GIN_INDEX} ON api_anemometer USING gin (tags)')
+        return
+
+    Anemometer = apps.get_model('api', 'Anemometer')
+    Tag = apps.get_model('api', 'Tag')
+    AnemometerTag = apps.get_model('api', 'AnemometerTag')
+    tag_ids = {}
+    links = []
+    for anemometer_id, tags in Anemometer.objects.values_list('id', 'tags').iterator(chunk_size=2000):
+        for name in {tag for tag in tags or () if isinstance(tag, str)}:
+            if name not in tag_ids:
+                tag_ids[name] = Tag.objects.create(name=name).id
+            links.append(AnemometerTag(anemometer_id=anemometer_id, tag_id=tag_ids[name]))
+        if len(links) >= 2000:
+            AnemometerTag.objects.bulk_create(links)
+            links = []
+    AnemometerTag.objects.bulk_create(links)
+
+
+def unindex_tags(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {GIN_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AnemometerTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anemometer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='api.anemometer')),
+                ('tag', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='anemometer_links', to='api.tag')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='anemometertag',
+            constraint=models.UniqueConstraint(fields=('tag', 'anemometer'), name='unique_anemometer_tag'),
+        ),
+        migrations.RunPython(index_tags, unindex_tags),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+TRIGRAM_INDEX = 'api_anemometer_name_trgm'
+
+
+def index_names(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        # Matches the `UPPER(name::text) LIKE UPPER(...)` of `icontains` lookups.
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} ON api_anemometer USING gin (UPPER(name::text) gin_trgm_ops)'
+        )
+
+
+def unindex_names(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {TRIGRAM_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_tag_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_names, unindex_names),
+    ]
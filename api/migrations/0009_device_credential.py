@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 17:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceCredential',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('prefix', models.CharField(help_text='First characters of the key, to tell keys apart.', max_length=8)),
+                ('key_hash', models.CharField(max_length=64, unique=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('anemometer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='device_credentials', to='api.anemometer')),
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+from django.db import migrations
+
+OLD_GIN_INDEX = 'api_anemometer_tags_gin'
+GIN_INDEX = 'api_anemometer_tags_lower_gin'
+
+
+def lowercase_tags(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        # Matches `api.tags.lowercased_tags()`.
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {GIN_INDEX} ON api_anemometer USING gin ((LOWER(tags::text)::jsonb))'
+        )
+        schema_editor.execute(f'DROP INDEX IF EXISTS {OLD_GIN_INDEX}')
+        return
+    mirror_tags(apps, str.lower)
+
+
+def restore_tags(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {OLD_GIN_INDEX} ON api_anemometer USING gin (tags)')
+        schema_editor.execute(f'DROP INDEX IF EXISTS {GIN_INDEX}')
+        return
+    mirror_tags(apps, str)
+
+
+def mirror_tags(apps, normalize):
+    """Rebuild the tag tables from `Anemometer.tags`, with names passed through `normalize`."""
+    Anemometer = apps.get_model('api', 'Anemometer')
+    Tag = apps.get_model('api', 'Tag')
+    AnemometerTag = apps.get_model('api', 'AnemometerTag')
+    AnemometerTag.objects.all().delete()
+    Tag.objects.all().delete()
+    tag_ids = {}
+    links = []
+    for anemometer_id, tags in Anemometer.objects.values_list('id', 'tags').iterator(chunk_size=2000):
+        for name in {normalize(tag) for tag in tags or () if isinstance(tag, str)}:
+            if name not in tag_ids:
+                tag_ids[name] = Tag.objects.create(name=name).id
+            links.append(AnemometerTag(anemometer_id=anemometer_id, tag_id=tag_ids[name]))
+        if len(links) >= 2000:
+            AnemometerTag.objects.bulk_create(links)
+            links = []
+    AnemometerTag.objects.bulk_create(links)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_device_credential'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_tags, restore_tags),
+    ]
@@ -1,8 +1,26 @@
-from django.db import models
+import secrets
+
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.utils.crypto import salted_hmac
 from django.utils.timezone import now
 
+from .geo import bounding_box
+
+
+class AnemometerQuerySet(models.QuerySet):
+    def within_bounding_box(self, latitude, longitude, radius):
+        """
+        Pre-filter anemometers to the box enclosing a `radius` nautical miles circle.
 
-# Create your models here.
+        The range lookups are served by the (latitude, longitude) composite index;
+        callers still have to refine the candidates with an exact distance check.
+        """
+        min_lat, max_lat, lon_ranges = bounding_box(latitude, longitude, radius)
+        lon_query = Q()
+        for min_lon, max_lon in lon_ranges:
+            lon_query |= Q(longitude__range=(min_lon, max_lon))
+        return self.filter(lon_query, latitude__range=(min_lat, max_lat))
 
 
 class Anemometer(models.Model):
@@ -12,6 +30,8 @@ class Anemometer(models.Model):
     tags = models.JSONField(default=list)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = AnemometerQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
@@ -19,6 +39,28 @@ class Anemometer(models.Model):
         ordering = ['name']
         indexes = [
             models.Index(fields=['latitude', 'longitude']),  # Composite index for spatial queries
+            models.Index(fields=['name', 'id']),  # Keyset pagination
+        ]
+
+class Tag(models.Model):
+    """
+    Normalized tag name, mirroring `Anemometer.tags` on databases without an
+    indexable JSON containment operator (see `api.tags`).
+    """
+    name = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class AnemometerTag(models.Model):
+    anemometer = models.ForeignKey(Anemometer, on_delete=models.CASCADE, related_name='tag_links')
+    # Served by the (tag, anemometer) unique index.
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='anemometer_links', db_index=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'anemometer'], name='unique_anemometer_tag'),
         ]
 
 class WindSpeedReading(models.Model):
@@ -28,4 +70,98 @@ class WindSpeedReading(models.Model):
 
     class Meta:
         ordering = ['-recorded_at']
+        indexes = [
+            # Keyset pagination, unfiltered and filtered by anemometer
+            models.Index(fields=['recorded_at', 'id']),
+            models.Index(fields=['anemometer', 'recorded_at', 'id']),
+        ]
+
+
+
+class IndexVersion(models.Model):
+    """
+    Monotonic counter shared by every worker process.
+
+    In-process indexes remember the version they were built at and rebuild
+    themselves as soon as the stored version differs.
+    """
+    name = models.CharField(max_length=64, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}@{self.version}"
+
+    @classmethod
+    def current(cls, name):
+        return cls.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, name):
+        """Increment the counter in the current transaction and return the new value."""
+        with transaction.atomic():
+            cls.objects.get_or_create(name=name)
+            cls.objects.filter(name=name).update(version=F('version') + 1)
+            return cls.current(name)
+
+
+class ReadingRollup(models.Model):
+    """
+    Pre-aggregated wind speed readings of one anemometer over an hour or a day.
+
+    Buckets are aligned on UTC boundaries and maintained incrementally as
+    readings are ingested (see `api.rollups`).
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    GRANULARITY_CHOICES = [
+        (HOUR, 'Hour'),
+        (DAY, 'Day'),
+    ]
+
+    anemometer = models.ForeignKey(Anemometer, on_delete=models.CASCADE, related_name='rollups')
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    count = models.PositiveBigIntegerField()
+    speed_sum = models.FloatField()
+    speed_min = models.FloatField()
+    speed_max = models.FloatField()
+
+    class Meta:
+        ordering = ['bucket_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['anemometer', 'granularity', 'bucket_start'],
+                name='unique_reading_rollup_bucket',
+            ),
+        ]
+
+
+class DeviceCredential(models.Model):
+    """
+    API key of an anemometer's field gateway, allowed to post readings for that
+    anemometer only (see `api.devices`).
+
+    Only an HMAC-SHA256 of the key, keyed with SECRET_KEY, is stored. Keys are
+    random, so unlike passwords they need no salt or slow hash: verifying one
+    costs microseconds. Rotating SECRET_KEY invalidates every key.
+    """
+    anemometer = models.ForeignKey(Anemometer, on_delete=models.CASCADE, related_name='device_credentials')
+    name = models.CharField(max_length=255, blank=True)
+    prefix = models.CharField(max_length=8, help_text="First characters of the key, to tell keys apart.")
+    key_hash = models.CharField(max_length=64, unique=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name or self.prefix} ({self.anemometer_id})"
+
+    @staticmethod
+    def hash_key(key):
+        return salted_hmac('api.DeviceCredential', key, algorithm='sha256').hexdigest()
 
+    @classmethod
+    def issue(cls, anemometer, name=''):
+        """Create a credential for `anemometer`; returns it with its key, which is not stored."""
+        key = secrets.token_urlsafe(32)
+        credential = cls.objects.create(anemometer=anemometer, name=name, prefix=key[:8], key_hash=cls.hash_key(key))
+        return credential, key
@@ -0,0 +1,214 @@
+"""
+Pagination classes of the API.
+
+Page number pagination stays the default; `?count=false` skips its
+`COUNT(*)` over the whole table. Viewsets using `SelectablePaginationMixin`
+also accept `?pagination=cursor`, a keyset pagination whose position is the
+full ordering tuple (e.g. `(recorded_at, id)`), so every page is a bounded
+index range scan whatever its depth.
+"""
+import json
+from base64 import b64decode, b64encode
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PageNumberPagination(pagination.PageNumberPagination):
+    """
+    DRF page number pagination, with `?count=false` to skip the total count.
+
+    Without the count, one extra row is fetched to tell whether a next page
+    exists and `count` is returned as null.
+    """
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.countless = request.query_params.get(self.count_query_param, '').lower() in ('false', '0', 'no')
+        if not self.countless:
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        self.request = request
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+            if self.page_number < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+
+        offset = (self.page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        if not rows and self.page_number != 1:
+            raise NotFound(self.invalid_page_message)
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        if not self.countless:
+            return super().get_paginated_response(data)
+        url = self.request.build_absolute_uri()
+        next_url = replace_query_param(url, self.page_query_param, self.page_number + 1) if self.has_next else None
+        previous_url = None
+        if self.page_number == 2:
+            previous_url = remove_query_param(url, self.page_query_param)
+        elif self.page_number > 2:
+            previous_url = replace_query_param(url, self.page_query_param, self.page_number - 1)
+        return Response({'count': None, 'next': next_url, 'previous': previous_url, 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count']['nullable'] = True
+        return response_schema
+
+
+class KeysetPagination(pagination.BasePagination):
+    """
+    Cursor pagination keyed on the whole `ordering` tuple.
+
+    The cursor encodes the ordering values of the last (or first, going back)
+    row of the page. The next page is filtered with a condition whose leading
+    term is a plain range on the first ordering field, so the backing
+    composite index serves it as a range scan.
+    """
+    ordering = ()
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def _encode(self, values, reverse):
+        payload = json.dumps({'v': values, 'r': reverse}, separators=(',', ':'))
+        return replace_query_param(self.base_url, self.cursor_query_param, b64encode(payload.encode()).decode())
+
+    def _decode(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(b64decode(encoded.encode(), validate=True))
+            values, reverse = payload['v'], bool(payload['r'])
+            if len(values) != len(self.ordering):
+                raise ValueError
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def _fields(self, queryset):
+        return [
+            (name.lstrip('-'), name.startswith('-'), queryset.model._meta.get_field(name.lstrip('-')))
+            for name in self.ordering
+        ]
+
+    def _position(self, fields, obj):
+        values = []
+        for _, _, field in fields:
+            # Rows are model instances, or dicts when paginating a `values()` queryset.
+            value = obj[field.attname] if isinstance(obj, dict) else getattr(obj, field.attname)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return values
+
+    def _after(self, fields, values, reverse):
+        """Rows strictly after `values` in the (possibly reversed) ordering."""
+        parsed = [
+            parse_datetime(value) if field.get_internal_type() == 'DateTimeField' else field.to_python(value)
+            for (_, _, field), value in zip(fields, values)
+        ]
+
+        def lookup(index, strict):
+            name, descending, _ = fields[index]
+            ascending = descending == reverse
+            return f"{name}__{'gt' if ascending else 'lt'}{'' if strict else 'e'}"
+
+        # (a, b) after (x, y) is: a > x OR (a = x AND b > y), for any number of fields.
+        condition = Q()
+        for depth in range(len(fields)):
+            term = Q(**{lookup(depth, strict=True): parsed[depth]})
+            for prefix in range(depth):
+                term &= Q(**{fields[prefix][0]: parsed[prefix]})
+            condition |= term
+        # The redundant non-strict range on the first field is what the index scan uses.
+        return Q(**{lookup(0, strict=False): parsed[0]}) & condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        fields = self._fields(queryset)
+        values, reverse = self._decode(request)
+
+        queryset = queryset.order_by(*[
+            ('-' if descending != reverse else '') + name for name, descending, _ in fields
+        ])
+        if values is not None:
+            try:
+                queryset = queryset.filter(self._after(fields, values, reverse))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = values is not None, has_more
+
+        self.next_position = self._position(fields, rows[-1]) if rows and self.has_next else None
+        self.previous_position = self._position(fields, rows[0]) if rows and self.has_previous else None
+        return rows
+
+    def get_next_link(self):
+        return self._encode(self.next_position, False) if self.next_position is not None else None
+
+    def get_previous_link(self):
+        return self._encode(self.previous_position, True) if self.previous_position is not None else None
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ReadingKeysetPagination(KeysetPagination):
+    ordering = ('-recorded_at', '-id')
+
+
+class AnemometerKeysetPagination(KeysetPagination):
+    ordering = ('name', 'id')
+
+
+class SelectablePaginationMixin:
+    """
+    Lets clients pick `?pagination=cursor` (the view's `keyset_pagination_class`)
+    instead of the default `pagination_class`, per request.
+    """
+    keyset_pagination_class = None
+    pagination_query_param = 'pagination'
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            request = getattr(self, 'request', None)
+            wants_cursor = request is not None and (
+                request.query_params.get(self.pagination_query_param) == 'cursor'
+                or KeysetPagination.cursor_query_param in request.query_params
+            )
+            pagination_class = self.keyset_pagination_class if wants_cursor and self.keyset_pagination_class else self.pagination_class
+            self._paginator = pagination_class() if pagination_class is not None else None
+        return self._paginator
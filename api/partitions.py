@@ -0,0 +1,188 @@
+"""
+Opt-in monthly range partitioning of the readings table on PostgreSQL.
+
+`convert` rebuilds `api_windspeedreading` as a table partitioned by
+`recorded_at`, with one partition per month holding data and a DEFAULT
+partition catching rows outside of them; `revert` turns it back into a plain
+table. `create_partitions` adds the coming months ahead of time (moving any
+matching rows out of the DEFAULT partition) and `expire_partitions` detaches
+or drops months past the retention period.
+
+PostgreSQL requires the primary key of a partitioned table to contain the
+partition key, so the key becomes (id, recorded_at); ids stay unique through
+their identity sequence and the Django model is unchanged. Queries bounded on
+`recorded_at` (the raw edges of the rollup windows, time-bounded stats) only
+scan the partitions of their range.
+"""
+import re
+from datetime import date, datetime, timezone
+
+from .models import WindSpeedReading
+
+TABLE = WindSpeedReading._meta.db_table
+PARTITION_NAME = re.compile(rf'^{TABLE}_p(\d{{4}})(\d{{2}})$')
+
+
+def month_start(moment):
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y%m}'
+
+
+def _bounds(month):
+    upper = add_months(month, 1)
+    return (
+        datetime(month.year, month.month, 1, tzinfo=timezone.utc).isoformat(),
+        datetime(upper.year, upper.month, 1, tzinfo=timezone.utc).isoformat(),
+    )
+
+
+def is_partitioned(connection):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def monthly_partitions(connection):
+    """Months that have a partition, sorted."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass",
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    months = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def _definitions(cursor, table):
+    """
+    Primary key name, secondary index definitions and foreign key definitions of
+    `table`, to recreate them on its replacement.
+    """
+    cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'", [table])
+    primary_key = cursor.fetchone()[0]
+    cursor.execute(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname <> %s",
+        [table, primary_key],
+    )
+    indexes = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table],
+    )
+    return primary_key, indexes, cursor.fetchall()
+
+
+def _rebuild(connection, partitioned):
+    quote = connection.ops.quote_name
+    legacy = f'{TABLE}_legacy'
+    with connection.cursor() as cursor:
+        primary_key, indexes, foreign_keys = _definitions(cursor, TABLE)
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} RENAME TO {quote(legacy)}')
+        # Index names are unique per schema: move the old ones out of the way.
+        for name in [primary_key] + [name for name, _ in indexes]:
+            cursor.execute(f'ALTER INDEX {quote(name)} RENAME TO {quote(name[:56] + "_legacy")}')
+
+        key_columns = '(id, recorded_at)' if partitioned else '(id)'
+        suffix = ' PARTITION BY RANGE (recorded_at)' if partitioned else ''
+        cursor.execute(
+            f'CREATE TABLE {quote(TABLE)} (LIKE {quote(legacy)} INCLUDING DEFAULTS INCLUDING IDENTITY, '
+            f'CONSTRAINT {quote(primary_key)} PRIMARY KEY {key_columns}){suffix}'
+        )
+        if partitioned:
+            cursor.execute(f'CREATE TABLE {quote(TABLE + "_default")} PARTITION OF {quote(TABLE)} DEFAULT')
+            cursor.execute(f'SELECT min(recorded_at), max(recorded_at) FROM {quote(legacy)}')
+            first, last = cursor.fetchone()
+            if first is not None:
+                month, last_month = month_start(first), month_start(last)
+                while month <= last_month:
+                    _create_partition(cursor, quote, month)
+                    month = add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO {quote(TABLE)} SELECT * FROM {quote(legacy)}')
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE((SELECT max(id) FROM {quote(TABLE)}), 0) + 1, false)",
+            [TABLE],
+        )
+        cursor.execute(f'DROP TABLE {quote(legacy)}')
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(name)} {definition}')
+
+
+def _create_partition(cursor, quote, month):
+    """Create the partition of `month`, moving its rows out of the DEFAULT partition."""
+    name = partition_name(month)
+    lower, upper = _bounds(month)
+    cursor.execute(f'CREATE TABLE {quote(name)} (LIKE {quote(TABLE)} INCLUDING DEFAULTS)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {quote(TABLE + "_default")} '
+        f'WHERE recorded_at >= %s AND recorded_at < %s RETURNING *) '
+        f'INSERT INTO {quote(name)} SELECT * FROM moved',
+        [lower, upper],
+    )
+    cursor.execute(f"ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(name)} FOR VALUES FROM ('{lower}') TO ('{upper}')")
+
+
+def convert(connection):
+    """Rebuild the readings table as a monthly partitioned table (no-op if it already is)."""
+    if not is_partitioned(connection):
+        _rebuild(connection, partitioned=True)
+
+
+def revert(connection):
+    """Rebuild the readings table as a plain table (no-op if it is not partitioned)."""
+    if is_partitioned(connection):
+        _rebuild(connection, partitioned=False)
+
+
+def create_partitions(connection, ahead, today=None):
+    """Create the partitions of the current month and the `ahead` following ones. Returns their names."""
+    quote = connection.ops.quote_name
+    existing = set(monthly_partitions(connection))
+    current = month_start(today or datetime.now(timezone.utc))
+    created = []
+    with connection.cursor() as cursor:
+        for offset in range(ahead + 1):
+            month = add_months(current, offset)
+            if month not in existing:
+                _create_partition(cursor, quote, month)
+                created.append(partition_name(month))
+    return created
+
+
+def expire_partitions(connection, retain, drop=False, today=None):
+    """
+    Detach (and optionally drop) the partitions of months older than `retain` months.
+
+    Rollup buckets of the expired readings are kept. Returns the partition names.
+    """
+    quote = connection.ops.quote_name
+    cutoff = add_months(month_start(today or datetime.now(timezone.utc)), -retain)
+    expired = [partition_name(month) for month in monthly_partitions(connection) if month < cutoff]
+    with connection.cursor() as cursor:
+        for name in expired:
+            cursor.execute(f'ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)}')
+            if drop:
+                cursor.execute(f'DROP TABLE {quote(name)}')
+    return expired
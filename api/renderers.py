@@ -0,0 +1,54 @@
+"""
+JSON renderer using orjson when it is installed and provably gives the same bytes.
+
+`JSONRenderer` (compact, non-ASCII kept, strict floats) and orjson agree on
+dicts with string keys, lists, strings, booleans, None, 64-bit integers and
+finite floats written without an exponent, once U+2028/U+2029 are escaped like
+DRF does. Data holding anything else (datetimes, Decimals, lazy strings,
+other floats) or rendered with an indent goes through `JSONRenderer` itself.
+`FastRows` from the fast-path serializers carry a precomputed verdict, so
+their rows are not walked again.
+"""
+from rest_framework.renderers import JSONRenderer
+
+from .serializers import FastRows, _json_safe_float
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def orjson_compatible(data):
+    """Whether orjson renders `data` exactly like the standard library encoder."""
+    if isinstance(data, FastRows):
+        return data.json_safe
+    kind = type(data)
+    if kind is str or kind is int or kind is bool or data is None:
+        return True
+    if kind is float:
+        return _json_safe_float(data)
+    if isinstance(data, dict):
+        return all(type(key) is str and orjson_compatible(value) for key, value in data.items())
+    if isinstance(data, list):
+        return all(orjson_compatible(value) for value in data)
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+            or not orjson_compatible(data)
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data)
+        except (orjson.JSONEncodeError, TypeError):
+            # Integers beyond 64 bits, lone surrogates: let the standard path decide.
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
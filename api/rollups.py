@@ -0,0 +1,386 @@
+"""
+Incremental hourly and daily rollups of wind speed readings.
+
+Every ingested reading is added to the count/sum/min/max of its anemometer's
+hourly and daily `ReadingRollup` buckets, so means over a time window cost a
+handful of bucket rows instead of a scan over the raw readings. Updated or
+deleted readings are handled by recomputing their buckets from the raw rows,
+and `backfill` (the `backfill_rollups` command) rebuilds them wholesale.
+"""
+from datetime import timedelta, timezone as dt_timezone
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F, FloatField, Max, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least, Trunc
+
+from . import cache
+from .models import ReadingRollup, WindSpeedReading
+from .utils import as_utc
+
+STEPS = {
+    ReadingRollup.HOUR: timedelta(hours=1),
+    ReadingRollup.DAY: timedelta(days=1),
+}
+
+
+class ReadingStats(NamedTuple):
+    count: int
+    total: float
+    minimum: Optional[float]
+    maximum: Optional[float]
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    def __add__(self, other):
+        return ReadingStats(
+            self.count + other.count,
+            self.total + other.total,
+            min((v for v in (self.minimum, other.minimum) if v is not None), default=None),
+            max((v for v in (self.maximum, other.maximum) if v is not None), default=None),
+        )
+
+
+EMPTY_STATS = ReadingStats(0, 0.0, None, None)
+
+
+def bucket_start(moment, granularity):
+    """Start of the UTC hour or day containing `moment`."""
+    moment = as_utc(moment)
+    if granularity == ReadingRollup.DAY:
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _bucket_ceil(moment, granularity):
+    start = bucket_start(moment, granularity)
+    return start if start == moment else start + STEPS[granularity]
+
+
+def _merge_bucket(anemometer_id, granularity, start, count, total, low, high):
+    bucket = ReadingRollup.objects.filter(anemometer_id=anemometer_id, granularity=granularity, bucket_start=start)
+    changes = {
+        'count': F('count') + count,
+        'speed_sum': F('speed_sum') + total,
+        'speed_min': Least('speed_min', Value(low)),
+        'speed_max': Greatest('speed_max', Value(high)),
+    }
+    if bucket.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            ReadingRollup.objects.create(
+                anemometer_id=anemometer_id,
+                granularity=granularity,
+                bucket_start=start,
+                count=count,
+                speed_sum=total,
+                speed_min=low,
+                speed_max=high,
+            )
+    except IntegrityError:
+        # A concurrent writer created the bucket in between.
+        bucket.update(**changes)
+
+
+def _write_back(rollups):
+    """Persist the counters of locked rollups with one executemany (bulk_update's CASE is slow)."""
+    if not rollups:
+        return
+    connection = connections[router.db_for_write(ReadingRollup)]
+    meta = ReadingRollup._meta
+    columns = ', '.join(
+        f'{connection.ops.quote_name(meta.get_field(name).column)} = %s'
+        for name in ('count', 'speed_sum', 'speed_min', 'speed_max')
+    )
+    sql = f'UPDATE {connection.ops.quote_name(meta.db_table)} SET {columns} WHERE {connection.ops.quote_name(meta.pk.column)} = %s'
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(r.count, r.speed_sum, r.speed_min, r.speed_max, r.pk) for r in rollups])
+
+
+def _insert_new(buckets):
+    """Insert new rollups with one executemany, skipping model instances (bulk_create is slow)."""
+    if not buckets:
+        return
+    connection = connections[router.db_for_write(ReadingRollup)]
+    meta = ReadingRollup._meta
+    names = ('anemometer', 'granularity', 'bucket_start', 'count', 'speed_sum', 'speed_min', 'speed_max')
+    columns = ', '.join(connection.ops.quote_name(meta.get_field(name).column) for name in names)
+    sql = f'INSERT INTO {connection.ops.quote_name(meta.db_table)} ({columns}) VALUES ({", ".join(["%s"] * len(names))})'
+    # Buckets of different anemometers share their starts: adapt each start once.
+    starts = {start: connection.ops.adapt_datetimefield_value(start) for _, _, start in buckets}
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            (anemometer_id, granularity, starts[start], count, total, low, high)
+            for (anemometer_id, granularity, start), (count, total, low, high) in buckets.items()
+        ])
+
+
+def record_readings(rows):
+    """Add (anemometer_id, speed_knots, recorded_at) rows to their hourly and daily buckets."""
+    buckets = {}
+    for anemometer_id, speed, recorded_at in rows:
+        for granularity in STEPS:
+            key = (anemometer_id, granularity, bucket_start(recorded_at, granularity))
+            count, total, low, high = buckets.get(key, (0, 0.0, speed, speed))
+            buckets[key] = (count + 1, total + speed, min(low, speed), max(high, speed))
+    merge_buckets(buckets)
+
+
+def merge_buckets(buckets):
+    """Add {(anemometer_id, granularity, bucket_start): (count, sum, min, max)} to the stored rollups."""
+    if not buckets:
+        return
+
+    with transaction.atomic():
+        # Lock every existing bucket of the batch with one query (a superset bounded by
+        # the batch's anemometers and time span), then write them back in bulk.
+        starts = [start for _, _, start in buckets]
+        existing = ReadingRollup.objects.select_for_update().filter(
+            anemometer_id__in={anemometer_id for anemometer_id, _, _ in buckets},
+            bucket_start__gte=min(starts),
+            bucket_start__lte=max(starts),
+        )
+        changed = []
+        for rollup in existing:
+            values = buckets.pop((rollup.anemometer_id, rollup.granularity, rollup.bucket_start), None)
+            if values is None:
+                continue
+            count, total, low, high = values
+            rollup.count += count
+            rollup.speed_sum += total
+            rollup.speed_min = min(rollup.speed_min, low)
+            rollup.speed_max = max(rollup.speed_max, high)
+            changed.append(rollup)
+        _write_back(changed)
+
+        try:
+            with transaction.atomic():
+                _insert_new(buckets)
+        except IntegrityError:
+            # A concurrent writer created some of these buckets in between: merge them
+            # one at a time, sorted so that concurrent batches lock rows in the same order.
+            for key, values in sorted(buckets.items()):
+                _merge_bucket(*key, *values)
+
+
+def recompute_buckets(rows):
+    """Rebuild the buckets containing (anemometer_id, recorded_at) rows from raw readings."""
+    keys = {
+        (anemometer_id, granularity, bucket_start(recorded_at, granularity))
+        for anemometer_id, recorded_at in rows
+        for granularity in STEPS
+    }
+    with transaction.atomic():
+        for anemometer_id, granularity, start in sorted(keys):
+            stats = WindSpeedReading.objects.filter(
+                anemometer_id=anemometer_id,
+                recorded_at__gte=start,
+                recorded_at__lt=start + STEPS[granularity],
+            ).aggregate(
+                count=Count('id'),
+                speed_sum=Sum('speed_knots'),
+                speed_min=Min('speed_knots'),
+                speed_max=Max('speed_knots'),
+            )
+            lookup = {'anemometer_id': anemometer_id, 'granularity': granularity, 'bucket_start': start}
+            if stats['count']:
+                ReadingRollup.objects.update_or_create(defaults=stats, **lookup)
+            else:
+                ReadingRollup.objects.filter(**lookup).delete()
+
+
+def backfill(anemometer_ids=None, since=None, batch_size=1000):
+    """
+    Rebuild the rollups from raw readings and return the number of buckets written.
+
+    The scope can be narrowed to some anemometers and to readings recorded from
+    the start of the UTC day containing `since`.
+    """
+    readings = WindSpeedReading.objects.order_by()
+    rollups = ReadingRollup.objects.all()
+    if anemometer_ids:
+        readings = readings.filter(anemometer_id__in=anemometer_ids)
+        rollups = rollups.filter(anemometer_id__in=anemometer_ids)
+    if since is not None:
+        since = bucket_start(since, ReadingRollup.DAY)
+        readings = readings.filter(recorded_at__gte=since)
+        rollups = rollups.filter(bucket_start__gte=since)
+
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+        for granularity in STEPS:
+            rows = readings.annotate(
+                bucket=Trunc('recorded_at', granularity, tzinfo=dt_timezone.utc),
+            ).values('anemometer_id', 'bucket').annotate(
+                count=Count('id'),
+                speed_sum=Sum('speed_knots'),
+                speed_min=Min('speed_knots'),
+                speed_max=Max('speed_knots'),
+            )
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(ReadingRollup(
+                    anemometer_id=row['anemometer_id'],
+                    granularity=granularity,
+                    bucket_start=row['bucket'],
+                    count=row['count'],
+                    speed_sum=row['speed_sum'],
+                    speed_min=row['speed_min'],
+                    speed_max=row['speed_max'],
+                ))
+                if len(batch) >= batch_size:
+                    written += len(ReadingRollup.objects.bulk_create(batch))
+                    batch = []
+            written += len(ReadingRollup.objects.bulk_create(batch))
+        cache.invalidate()
+    return written
+
+
+def _range(field, start, end):
+    """Half-open [start, end) filter on `field`, or None when the range is empty."""
+    if start is not None and end is not None and start >= end:
+        return None
+    query = Q()
+    if start is not None:
+        query &= Q(**{f'{field}__gte': start})
+    if end is not None:
+        query &= Q(**{f'{field}__lt': end})
+    return query
+
+
+def _any(ranges):
+    ranges = [query for query in ranges if query is not None]
+    if not ranges:
+        return None
+    query = ranges[0]
+    for other in ranges[1:]:
+        query |= other
+    return query
+
+
+RAW_AGGREGATES = {
+    'count': Count('id'),
+    'total': Sum('speed_knots'),
+    'minimum': Min('speed_knots'),
+    'maximum': Max('speed_knots'),
+}
+BUCKET_AGGREGATES = {
+    'count': Sum('count'),
+    'total': Sum('speed_sum'),
+    'minimum': Min('speed_min'),
+    'maximum': Max('speed_max'),
+}
+
+
+def _stats(row):
+    return ReadingStats(row['count'] or 0, row['total'] or 0.0, row['minimum'], row['maximum'])
+
+
+def _window_ranges(start, end):
+    """
+    Split [start, end) into (days, hours, raw) filters for daily buckets, hourly buckets
+    and raw readings. Any of them is None when that source is not needed.
+    """
+    hour_start = _bucket_ceil(start, ReadingRollup.HOUR) if start is not None else None
+    hour_end = bucket_start(end, ReadingRollup.HOUR) if end is not None else None
+    if hour_start is not None and hour_end is not None and hour_start >= hour_end:
+        # The window does not contain a whole hour.
+        return None, None, _range('recorded_at', start, end)
+
+    raw = _any([
+        _range('recorded_at', start, hour_start) if start is not None else None,
+        _range('recorded_at', hour_end, end) if end is not None else None,
+    ])
+    day_start = _bucket_ceil(start, ReadingRollup.DAY) if start is not None else None
+    day_end = bucket_start(end, ReadingRollup.DAY) if end is not None else None
+    if day_start is not None and day_end is not None and day_start >= day_end:
+        return None, _range('bucket_start', hour_start, hour_end), raw
+
+    hours = _any([
+        _range('bucket_start', hour_start, day_start) if start is not None else None,
+        _range('bucket_start', day_end, hour_end) if end is not None else None,
+    ])
+    return _range('bucket_start', day_start, day_end), hours, raw
+
+
+def _stats_queries(scope, start, end):
+    """(queryset, aggregates) pairs whose summed `ReadingStats` are those of `aggregate_readings`."""
+    start = as_utc(start) if start is not None else None
+    end = as_utc(end) if end is not None else None
+    if settings.READING_ROLLUPS_ENABLED:
+        days, hours, raw = _window_ranges(start, end)
+    else:
+        days, hours, raw = None, None, _range('recorded_at', start, end)
+
+    queries = []
+    for granularity, time_range in ((ReadingRollup.DAY, days), (ReadingRollup.HOUR, hours)):
+        if time_range is not None:
+            queries.append((ReadingRollup.objects.filter(scope, time_range, granularity=granularity), BUCKET_AGGREGATES))
+    if raw is not None:
+        queries.append((WindSpeedReading.objects.filter(scope, raw), RAW_AGGREGATES))
+    return queries
+
+
+def aggregate_readings(scope, start=None, end=None):
+    """
+    Count, sum, min and max of the readings matching `scope` with start <= recorded_at < end.
+
+    `scope` is a Q object over the `anemometer` relation, shared by readings and
+    rollups. Whole days are read from daily buckets, the remaining whole hours
+    from hourly buckets and only the sub-hour edges of the window from raw
+    readings. With `READING_ROLLUPS_ENABLED` off, the raw readings are aggregated.
+    """
+    stats = EMPTY_STATS
+    for queryset, aggregates in _stats_queries(scope, start, end):
+        stats += _stats(queryset.aggregate(**aggregates))
+    return stats
+
+
+async def aaggregate_readings(scope, start=None, end=None):
+    """Async version of `aggregate_readings`, for the ASGI views."""
+    stats = EMPTY_STATS
+    for queryset, aggregates in _stats_queries(scope, start, end):
+        stats += _stats(await queryset.aaggregate(**aggregates))
+    return stats
+
+
+def _per_anemometer(queryset, **aggregate):
+    """Correlated subquery aggregating `queryset` for the outer anemometer row."""
+    (name, expression), = aggregate.items()
+    values = queryset.filter(anemometer=OuterRef('pk')).order_by().values('anemometer')
+    return Coalesce(Subquery(values.annotate(**{name: expression}).values(name)), Value(0), output_field=FloatField())
+
+
+def window_annotations(prefix, start=None, end=None):
+    """
+    Annotations computing `<prefix>_count` and `<prefix>_sum` of the readings of each
+    anemometer with start <= recorded_at < end, from the same sources as `aggregate_readings`.
+    """
+    start = as_utc(start) if start is not None else None
+    end = as_utc(end) if end is not None else None
+    if settings.READING_ROLLUPS_ENABLED:
+        days, hours, raw = _window_ranges(start, end)
+    else:
+        days, hours, raw = None, None, _range('recorded_at', start, end)
+
+    counts, sums = [], []
+    for granularity, time_range in ((ReadingRollup.DAY, days), (ReadingRollup.HOUR, hours)):
+        if time_range is not None:
+            buckets = ReadingRollup.objects.filter(time_range, granularity=granularity)
+            counts.append(_per_anemometer(buckets, total=Sum('count')))
+            sums.append(_per_anemometer(buckets, total=Sum('speed_sum')))
+    if raw is not None:
+        readings = WindSpeedReading.objects.filter(raw)
+        counts.append(_per_anemometer(readings, total=Count('id')))
+        sums.append(_per_anemometer(readings, total=Sum('speed_knots')))
+    if not counts:
+        return {f'{prefix}_count': Value(0.0), f'{prefix}_sum': Value(0.0)}
+    return {
+        f'{prefix}_count': sum(counts[1:], counts[0]),
+        f'{prefix}_sum': sum(sums[1:], sums[0]),
+    }
@@ -0,0 +1,19 @@
+"""
+drf-spectacular extensions describing the API's own authentication classes in
+the OpenAPI schema. Registered on import, from `ApiConfig.ready`.
+"""
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from drf_spectacular.plumbing import build_bearer_security_scheme_object
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    target_class = 'api.authentication.CachedJWTAuthentication'
+
+
+class DeviceKeyScheme(OpenApiAuthenticationExtension):
+    target_class = 'api.devices.DeviceKeyAuthentication'
+    name = 'deviceKey'
+
+    def get_security_definition(self, auto_schema):
+        return build_bearer_security_scheme_object(header_name='HTTP_AUTHORIZATION', token_prefix=self.target.keyword)
@@ -0,0 +1,282 @@
+"""
+Indexed name search of anemometers.
+
+`?search=` used to compile to `UPPER(name) LIKE UPPER('%term%')`, which no
+B-tree can serve. `NameSearchFilter` offers three modes (`?search_mode=`):
+
+- `substring` (default): like DRF's `SearchFilter`, the term is split into
+  words (quoted phrases kept together) that must all appear in the name,
+  case-insensitively. Matches are ranked by trigram similarity to the term,
+  then by name.
+- `fuzzy`: names whose trigram similarity to the term reaches
+  `SIMILARITY_THRESHOLD` (typos, word order), ranked by similarity.
+- `prefix`: case-sensitive prefix match, as a range on the existing B-tree
+  index of `name`, ordered by name.
+
+On PostgreSQL the substring and fuzzy modes use a `pg_trgm` GIN index on
+`UPPER(name)` (migration 0008). Other databases use `NameIndex`, a per-process
+trigram index kept in sync by `api.indexing.VersionedIndex`. It returns
+every match, the `NAME_SEARCH_RANKED_RESULTS` most similar first and the
+others by name.
+"""
+import json
+import re
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, CharField, F, IntegerField, TextField, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Concat, StrIndex, Upper
+from rest_framework import filters
+from rest_framework.filters import search_smart_split
+from rest_framework.exceptions import ValidationError
+
+from .indexing import VersionedIndex
+from .models import Anemometer
+
+SEARCH_SUBSTRING = 'substring'
+SEARCH_PREFIX = 'prefix'
+SEARCH_FUZZY = 'fuzzy'
+SEARCH_MODES = (SEARCH_SUBSTRING, SEARCH_PREFIX, SEARCH_FUZZY)
+
+# pg_trgm's default `pg_trgm.similarity_threshold`.
+SIMILARITY_THRESHOLD = 0.3
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def word_trigrams(text):
+    """Trigrams of each word padded like pg_trgm does ("  word "), case-insensitive."""
+    trigrams = set()
+    for word in _WORD.findall(text.casefold()):
+        padded = f'  {word} '
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+def similarity(a, b):
+    """pg_trgm's `similarity()`: shared trigrams over the union of both sets."""
+    a, b = word_trigrams(a), word_trigrams(b)
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+def _substring_trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NgramIndex:
+    """
+    Trigram posting lists over anemometer names.
+
+    Substring lookups intersect the postings of the raw trigrams of the term
+    and check the few remaining candidates; fuzzy lookups count the shared
+    word trigrams of every name holding at least one of them.
+    """
+
+    def __init__(self):
+        self._names = {}
+        self._substring = {}
+        self._fuzzy = {}
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, pk, name):
+        self.discard(pk)
+        folded = name.casefold()
+        self._names[pk] = (name, folded, word_trigrams(name))
+        for trigram in _substring_trigrams(folded):
+            self._substring.setdefault(trigram, set()).add(pk)
+        for trigram in self._names[pk][2]:
+            self._fuzzy.setdefault(trigram, set()).add(pk)
+
+    def discard(self, pk):
+        entry = self._names.pop(pk, None)
+        if entry is None:
+            return
+        _, folded, trigrams = entry
+        for postings, keys in ((self._substring, _substring_trigrams(folded)), (self._fuzzy, trigrams)):
+            for trigram in keys:
+                members = postings[trigram]
+                members.discard(pk)
+                if not members:
+                    del postings[trigram]
+
+    def _ranked(self, term, matches, limit):
+        """(pk, score) pairs by descending similarity, then name (all of them with `limit` None)."""
+        terms = word_trigrams(term)
+        scored = []
+        for pk in matches:
+            name, _, trigrams = self._names[pk]
+            shared = len(terms & trigrams)
+            union = len(terms) + len(trigrams) - shared
+            scored.append((-(shared / union if union else 0.0), name, pk))
+        scored.sort()
+        return [(pk, -score) for score, _, pk in scored[:limit]]
+
+    def substring(self, words, limit=None):
+        """Names containing every one of `words`."""
+        folded = [word.casefold() for word in words]
+        candidates = None
+        for word in folded:
+            trigrams = _substring_trigrams(word)
+            if not trigrams:
+                # One or two characters: no trigram to look up.
+                continue
+            postings = sorted((self._substring.get(trigram, set()) for trigram in trigrams), key=len)
+            found = set(postings[0]).intersection(*postings[1:])
+            candidates = found if candidates is None else candidates & found
+        if candidates is None:
+            candidates = self._names.keys()
+        matches = [pk for pk in candidates if all(word in self._names[pk][1] for word in folded)]
+        return self._ranked(' '.join(words), matches, limit)
+
+    def fuzzy(self, term, limit=None, threshold=SIMILARITY_THRESHOLD):
+        terms = word_trigrams(term)
+        shared = Counter()
+        for trigram in terms:
+            shared.update(self._fuzzy.get(trigram, ()))
+        # similarity >= threshold implies shared >= threshold * len(terms): skip the
+        # bulk of the candidates, which only share a trigram or two, without a lookup.
+        least = threshold * len(terms)
+        matches = [
+            pk for pk, count in shared.items()
+            if count >= least and count / (len(terms) + len(self._names[pk][2]) - count) >= threshold
+        ]
+        return self._ranked(term, matches, limit)
+
+
+class NameIndex(VersionedIndex):
+    """Process-wide `NgramIndex` kept in sync with the `Anemometer` table."""
+
+    version_name = 'anemometer-names'
+
+    def build(self):
+        ngrams = NgramIndex()
+        for pk, name in Anemometer.objects.values_list('id', 'name').iterator():
+            ngrams.add(pk, name)
+        return ngrams
+
+    def enabled(self):
+        return uses_name_index(Anemometer.objects.db)
+
+    def search(self, words, mode):
+        """Ranked (pk, score) pairs of every anemometer matching `words`."""
+        with self._lock:
+            ngrams = self._fresh()
+            return ngrams.fuzzy(' '.join(words)) if mode == SEARCH_FUZZY else ngrams.substring(words)
+
+    def saved(self, anemometer):
+        self._apply(lambda ngrams: ngrams.add(anemometer.pk, anemometer.name))
+
+    def deleted(self, anemometer):
+        self._apply(lambda ngrams: ngrams.discard(anemometer.pk))
+
+
+name_index = NameIndex()
+
+
+def uses_name_index(using):
+    """Whether substring/fuzzy searches on database `using` go through `NameIndex`."""
+    return connections[using].vendor != 'postgresql'
+
+
+def _prefix_upper_bound(prefix):
+    """
+    Smallest string greater than every string starting with `prefix`, or None when
+    there is none (empty, or only U+10FFFF characters).
+    """
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    following = ord(prefix[-1]) + 1
+    if 0xD800 <= following <= 0xDFFF:
+        # Surrogates cannot be encoded: the next character is past them.
+        following = 0xE000
+    return prefix[:-1] + chr(following)
+
+
+def _id_set(ids, vendor):
+    """`ids` as the right-hand side of an `__in` lookup."""
+    if vendor == 'sqlite':
+        # One JSON parameter, where an IN list of every match of a broad term could
+        # exceed SQLite's limit on the number of parameters.
+        return RawSQL('SELECT value FROM json_each(%s)', [json.dumps(ids)])
+    return ids
+
+
+def search_names(queryset, term, mode=SEARCH_SUBSTRING):
+    """Anemometers of `queryset` whose name matches `term`, ranked."""
+    vendor = connections[queryset.db].vendor
+    if mode == SEARCH_PREFIX:
+        if vendor == 'postgresql':
+            # Served by the varchar_pattern_ops index Django adds next to the unique one.
+            return queryset.filter(name__startswith=term).order_by('name')
+        # A range on the binary-collated B-tree, which LIKE cannot use on SQLite.
+        queryset = queryset.filter(name__gte=term)
+        upper_bound = _prefix_upper_bound(term)
+        if upper_bound is not None:
+            queryset = queryset.filter(name__lt=upper_bound)
+        return queryset.order_by('name')
+
+    words = search_smart_split(term) if mode == SEARCH_SUBSTRING else [term]
+    if vendor == 'postgresql':
+        from django.contrib.postgres.lookups import TrigramSimilar
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        if mode == SEARCH_FUZZY:
+            # Same expression as the GIN index; pg_trgm ignores case anyway.
+            queryset = queryset.filter(TrigramSimilar(Upper(Cast('name', TextField())), term))
+        else:
+            for word in words:
+                queryset = queryset.filter(name__icontains=word)
+        return queryset.annotate(search_rank=TrigramSimilarity('name', term)).order_by('-search_rank', 'name')
+
+    matches = [pk for pk, _ in name_index.search(words, mode)]
+    ranked = matches[:settings.NAME_SEARCH_RANKED_RESULTS]
+    # Rank the most similar matches by position in ",pk1,pk2,...,": one parameter, where a
+    # CASE over hundreds of WHEN branches would be evaluated for every row. The position
+    # is only looked up for the ranked rows; the other matches (rank NULL) follow by name.
+    ranking = Value(''.join(f',{pk}' for pk in ranked) + ',')
+    position = StrIndex(ranking, Concat(Value(','), Cast('pk', CharField()), Value(',')))
+    rank = Case(When(pk__in=_id_set(ranked, vendor), then=position), default=None, output_field=IntegerField())
+    return queryset.filter(pk__in=_id_set(matches, vendor)).annotate(search_rank=rank).order_by(
+        F('search_rank').asc(nulls_last=True), 'name',
+    )
+
+
+class NameSearchFilter(filters.SearchFilter):
+    """`SearchFilter` on the anemometer name backed by `search_names`."""
+    search_mode_param = 'search_mode'
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term:
+            return queryset
+        mode = request.query_params.get(self.search_mode_param, SEARCH_SUBSTRING)
+        if mode not in SEARCH_MODES:
+            raise ValidationError({self.search_mode_param: [f'"{mode}" is not a valid choice.']})
+        return search_names(queryset, term, mode)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.search_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Anemometer name to search for.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.search_mode_param,
+                'required': False,
+                'in': 'query',
+                'description': 'substring (default), prefix (case-sensitive) or fuzzy matching.',
+                'schema': {'type': 'string', 'enum': list(SEARCH_MODES)},
+            },
+        ]
@@ -1,8 +1,97 @@
+from django.conf import settings
 from rest_framework import serializers
+from rest_framework.settings import ISO_8601, api_settings
 from drf_spectacular.utils import extend_schema_field
 from django.utils.timezone import now, timedelta
-from django.db.models import Avg
+from django.db.models import Prefetch, Q
 from .models import Anemometer, WindSpeedReading
+from .rollups import aggregate_readings, window_annotations
+from .series import BUCKETS, default_range
+
+class FastRows(list):
+    """
+    Rows built by a `FastReadSerializer`. `json_safe` is False when a float would be
+    written differently by orjson than by the standard library (or is not finite).
+    """
+    json_safe = True
+
+
+def _json_safe_float(value):
+    # Python and orjson agree on the shortest representation of floats written
+    # without an exponent, which Python uses for 1e-4 <= |value| < 1e16.
+    return value == 0.0 or 1e-4 <= abs(value) < 1e16
+
+
+class FastReadSerializer:
+    """
+    Read-only equivalent of `serializer_class(objects, many=True).data`.
+
+    Builds plain dicts from `values()` rows (or model instances) with one
+    converter per field, precomputed from the serializer's own fields, instead
+    of running DRF's field machinery for every object. Only plain model fields
+    are supported.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._fields = None
+
+    @property
+    def fields(self):
+        """(key, attname, serializer field) of the readable fields, in output order."""
+        if self._fields is None:
+            opts = self.serializer_class.Meta.model._meta
+            self._fields = [
+                (name, opts.get_field(field.source).attname, field)
+                for name, field in self.serializer_class().fields.items()
+                if not field.write_only
+            ]
+        return self._fields
+
+    @property
+    def attnames(self):
+        return [attname for _, attname, _ in self.fields]
+
+    def _converter(self, field, unsafe):
+        if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+            return None
+        if isinstance(field, serializers.IntegerField):
+            return int
+        if isinstance(field, serializers.FloatField):
+            def convert_float(value):
+                value = float(value)
+                if not _json_safe_float(value):
+                    unsafe.append(value)
+                return value
+            return convert_float
+        if isinstance(field, serializers.DateTimeField) and (getattr(field, 'format', api_settings.DATETIME_FORMAT) or '').lower() == ISO_8601:
+            field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+
+            def convert_datetime(value):
+                if field_timezone is not None and value.tzinfo is not None:
+                    value = value.astimezone(field_timezone)
+                else:
+                    value = field.enforce_timezone(value)
+                value = value.isoformat()
+                return value[:-6] + 'Z' if value.endswith('+00:00') else value
+            return convert_datetime
+        return field.to_representation
+
+    def serialize(self, objects):
+        objects = objects if isinstance(objects, list) else list(objects)
+        unsafe = []
+        converters = [(key, attname, self._converter(field, unsafe)) for key, attname, field in self.fields]
+        rows = FastRows()
+        from_dicts = bool(objects) and isinstance(objects[0], dict)
+        for obj in objects:
+            row = {}
+            for key, attname, convert in converters:
+                value = obj[attname] if from_dicts else getattr(obj, attname)
+                row[key] = value if value is None or convert is None else convert(value)
+            rows.append(row)
+        rows.json_safe = not unsafe
+        return rows
+
 
 class WindSpeedReadingSerializer(serializers.ModelSerializer):
     class Meta:
@@ -10,6 +99,9 @@ class WindSpeedReadingSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+fast_reading_serializer = FastReadSerializer(WindSpeedReadingSerializer)
+
+
 class AnemometerSerializer(serializers.ModelSerializer):
     tags = serializers.ListField(child=serializers.CharField(), required=False, help_text="List of tags for the anemometer.")
 
@@ -21,28 +113,139 @@ class AnemometerSerializer(serializers.ModelSerializer):
         model = Anemometer
         fields = '__all__'
 
+    @staticmethod
+    def daily_window():
+        start_of_day = now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return start_of_day, start_of_day + timedelta(days=1)
+
+    @staticmethod
+    def weekly_window():
+        return now() - timedelta(days=7), None
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """
+        Annotate the daily/weekly means and prefetch the latest readings, so a page of
+        anemometers renders with a constant number of queries.
+        """
+        return queryset.annotate(
+            **window_annotations('daily_speed', *cls.daily_window()),
+            **window_annotations('weekly_speed', *cls.weekly_window()),
+        ).prefetch_related(
+            # Sliced prefetches are limited per anemometer with ROW_NUMBER() OVER (PARTITION BY ...).
+            Prefetch(
+                'readings',
+                queryset=WindSpeedReading.objects.order_by('-recorded_at', '-id')[:5],
+                to_attr='prefetched_latest_readings',
+            ),
+        )
+
     @extend_schema_field(serializers.ListSerializer(child=WindSpeedReadingSerializer()))
     def get_latest_readings(self, obj):
         """Get the latest 5 wind speed readings for the anemometer."""
-        latest_readings = obj.readings.all()[:5]  # Query is pre-fetched in the view
+        latest_readings = getattr(obj, 'prefetched_latest_readings', None)
+        if latest_readings is None:
+            latest_readings = obj.readings.all()[:5]
+        if settings.FAST_SERIALIZERS_ENABLED:
+            return fast_reading_serializer.serialize(latest_readings)
         return WindSpeedReadingSerializer(latest_readings, many=True).data
 
     def get_daily_mean_speed(self, obj):
         """Get the mean wind speed for the current day."""
-        current_time = now()
-        start_of_day = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_of_day = current_time.replace(hour=23, minute=59, second=59, microsecond=999999)
-        daily_readings = obj.readings.filter(recorded_at__range=(start_of_day, end_of_day))
-        return daily_readings.aggregate(Avg('speed_knots'))['speed_knots__avg'] or 0
+        if hasattr(obj, 'daily_speed_count'):
+            return obj.daily_speed_sum / obj.daily_speed_count if obj.daily_speed_count else 0
+        return aggregate_readings(Q(anemometer=obj), *self.daily_window()).mean or 0
 
     def get_weekly_mean_speed(self, obj):
         """Get the mean wind speed for the last 7 days."""
-        week_ago = now() - timedelta(days=7)
-        weekly_readings = obj.readings.filter(recorded_at__gte=week_ago)
-        return weekly_readings.aggregate(Avg('speed_knots'))['speed_knots__avg'] or 0
+        if hasattr(obj, 'weekly_speed_count'):
+            return obj.weekly_speed_sum / obj.weekly_speed_count if obj.weekly_speed_count else 0
+        return aggregate_readings(Q(anemometer=obj), *self.weekly_window()).mean or 0
+
+
+class BulkReadingErrorSerializer(serializers.Serializer):
+    index = serializers.IntegerField(help_text="Position of the rejected reading in the request body.")
+    errors = serializers.DictField(child=serializers.ListField(child=serializers.CharField()))
+
+
+class BulkReadingsResultSerializer(serializers.Serializer):
+    created = serializers.IntegerField(help_text="Number of readings created.")
+    errors = BulkReadingErrorSerializer(many=True)
+
+
+class ReadingBufferMetricsSerializer(serializers.Serializer):
+    queue_depth = serializers.IntegerField(help_text="Readings queued or being flushed.")
+    flushes = serializers.IntegerField()
+    flushed_rows = serializers.IntegerField()
+    failed_rows = serializers.IntegerField(help_text="Readings lost to failed flushes.")
+    timeouts = serializers.IntegerField(help_text="Requests that gave up waiting for their flush (503).")
+    last_flush_seconds = serializers.FloatField()
+    max_flush_seconds = serializers.FloatField()
+    mean_flush_seconds = serializers.FloatField()
 
 
 class WindSpeedStatsSerializer(serializers.Serializer):
     latitude = serializers.FloatField(required=True)
     longitude = serializers.FloatField(required=True)
     radius = serializers.FloatField(required=True, min_value=0)
+    start = serializers.DateTimeField(required=False, help_text="Only include readings recorded at or after this time.")
+    end = serializers.DateTimeField(required=False, help_text="Only include readings recorded before this time.")
+
+    def validate(self, attrs):
+        if 'start' in attrs and 'end' in attrs and attrs['start'] >= attrs['end']:
+            raise serializers.ValidationError({'end': ['Ensure this value is after start.']})
+        return attrs
+
+
+class ReadingSeriesQuerySerializer(serializers.Serializer):
+    bucket = serializers.ChoiceField(choices=list(BUCKETS), default='1h', help_text="Width of the buckets.")
+    start = serializers.DateTimeField(required=False, help_text="Only include readings recorded at or after this time.")
+    end = serializers.DateTimeField(required=False, help_text="Only include readings recorded before this time (default: now).")
+    max_points = serializers.IntegerField(
+        required=False, min_value=3,
+        help_text="Downsample the series to at most this many points with LTTB.",
+    )
+
+    def validate(self, attrs):
+        attrs['start'], attrs['end'] = default_range(attrs['bucket'], attrs.get('start'), attrs.get('end'))
+        if attrs['start'] >= attrs['end']:
+            raise serializers.ValidationError({'end': ['Ensure this value is after start.']})
+        max_buckets = settings.SERIES_MAX_BUCKETS
+        if (attrs['end'] - attrs['start']) / BUCKETS[attrs['bucket']] > max_buckets:
+            raise serializers.ValidationError({
+                'non_field_errors': [f'Ensure the time range spans no more than {max_buckets} buckets.'],
+            })
+        return attrs
+
+
+class ReadingSeriesPointSerializer(serializers.Serializer):
+    start = serializers.DateTimeField(help_text="Start of the bucket.")
+    count = serializers.IntegerField()
+    min = serializers.FloatField()
+    max = serializers.FloatField()
+    mean = serializers.FloatField()
+
+
+class ReadingSeriesSerializer(serializers.Serializer):
+    anemometer = serializers.IntegerField()
+    bucket = serializers.CharField()
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    downsampled = serializers.BooleanField(help_text="Whether points were dropped by LTTB downsampling.")
+    points = ReadingSeriesPointSerializer(many=True)
+
+
+class ReadingExportQuerySerializer(serializers.Serializer):
+    output = serializers.ChoiceField(choices=['csv', 'ndjson'], default='csv', help_text="Export format.")
+    gzip = serializers.BooleanField(default=False, help_text="Compress the export with gzip.")
+    anemometer = serializers.ListField(
+        child=serializers.IntegerField(), required=False,
+        help_text="Only export the readings of these anemometers (repeatable).",
+    )
+    start = serializers.DateTimeField(required=False, help_text="Only include readings recorded at or after this time.")
+    end = serializers.DateTimeField(required=False, help_text="Only include readings recorded before this time.")
+
+    def validate(self, attrs):
+        if 'start' in attrs and 'end' in attrs and attrs['start'] >= attrs['end']:
+            raise serializers.ValidationError({'end': ['Ensure this value is after start.']})
+        return attrs
@@ -0,0 +1,161 @@
+"""
+Time-bucketed series of an anemometer's readings, for charts.
+
+Readings are grouped in SQL into buckets of 1 minute, 5 minutes, 1 hour or 1
+day, aligned on the Unix epoch in UTC: with `date_bin` on PostgreSQL (14+), and
+elsewhere with `Trunc` to the minute, hour or day, 5-minute buckets being
+folded from minute rows in Python. Hourly and daily series read their whole
+buckets from the rollups and only aggregate raw readings for the partial
+buckets at the edges of the range.
+
+`lttb` implements Largest-Triangle-Three-Buckets downsampling, which keeps the
+visual shape of a series (peaks included) with a fraction of its points.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, DateTimeField, DurationField, Func, Max, Min, Sum, Value
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import ReadingRollup, WindSpeedReading
+from .rollups import EMPTY_STATS, ReadingStats
+from .utils import as_utc
+
+BUCKETS = {
+    '1m': timedelta(minutes=1),
+    '5m': timedelta(minutes=5),
+    '1h': timedelta(hours=1),
+    '1d': timedelta(days=1),
+}
+# Range covered when the request has no `start`.
+DEFAULT_SPANS = {
+    '1m': timedelta(hours=6),
+    '5m': timedelta(days=1),
+    '1h': timedelta(days=7),
+    '1d': timedelta(days=90),
+}
+ROLLUP_GRANULARITIES = {'1h': ReadingRollup.HOUR, '1d': ReadingRollup.DAY}
+TRUNC_KINDS = {'1m': 'minute', '5m': 'minute', '1h': 'hour', '1d': 'day'}
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class DateBin(Func):
+    """PostgreSQL's `date_bin(stride, source, origin)`."""
+    function = 'date_bin'
+    output_field = DateTimeField()
+
+    def __init__(self, stride, expression, origin=EPOCH, **extra):
+        super().__init__(Value(stride, output_field=DurationField()), expression, Value(origin), **extra)
+
+
+def floor_to(moment, step):
+    return EPOCH + (moment - EPOCH) // step * step
+
+
+def ceil_to(moment, step):
+    start = floor_to(moment, step)
+    return start if start == moment else start + step
+
+
+def default_range(bucket, start=None, end=None):
+    """Fill in a missing end (now) or start (`DEFAULT_SPANS` before the end)."""
+    end = end or timezone.now()
+    return start or end - DEFAULT_SPANS[bucket], end
+
+
+def _merge(points, moment, stats):
+    points[moment] = points.get(moment, EMPTY_STATS) + stats
+
+
+def _raw_points(points, anemometer_id, bucket, start, end):
+    if start >= end:
+        return
+    step = BUCKETS[bucket]
+    readings = WindSpeedReading.objects.filter(
+        anemometer_id=anemometer_id, recorded_at__gte=start, recorded_at__lt=end,
+    ).order_by()
+    if connections[readings.db].vendor == 'postgresql':
+        moment = DateBin(step, 'recorded_at')
+    else:
+        moment = Trunc('recorded_at', TRUNC_KINDS[bucket], tzinfo=dt_timezone.utc)
+    rows = readings.annotate(moment=moment).values('moment').annotate(
+        count=Count('id'),
+        total=Sum('speed_knots'),
+        minimum=Min('speed_knots'),
+        maximum=Max('speed_knots'),
+    )
+    for row in rows:
+        # No-op unless minutes are folded into 5-minute buckets.
+        _merge(points, floor_to(as_utc(row['moment']), step), ReadingStats(row['count'], row['total'], row['minimum'], row['maximum']))
+
+
+def reading_series(anemometer_id, bucket, start, end):
+    """
+    (bucket start, `ReadingStats`) pairs of the non-empty buckets of one anemometer's
+    readings with start <= recorded_at < end, sorted by time.
+    """
+    start, end = as_utc(start), as_utc(end)
+    step = BUCKETS[bucket]
+    points = {}
+    granularity = ROLLUP_GRANULARITIES.get(bucket)
+    whole_start, whole_end = ceil_to(start, step), floor_to(end, step)
+    if granularity is not None and settings.READING_ROLLUPS_ENABLED and whole_start < whole_end:
+        rollups = ReadingRollup.objects.filter(
+            anemometer_id=anemometer_id, granularity=granularity,
+            bucket_start__gte=whole_start, bucket_start__lt=whole_end,
+        ).values_list('bucket_start', 'count', 'speed_sum', 'speed_min', 'speed_max')
+        for moment, count, total, low, high in rollups:
+            _merge(points, as_utc(moment), ReadingStats(count, total, low, high))
+        _raw_points(points, anemometer_id, bucket, start, whole_start)
+        _raw_points(points, anemometer_id, bucket, whole_end, end)
+    else:
+        _raw_points(points, anemometer_id, bucket, start, end)
+    return sorted(points.items())
+
+
+def lttb(x, y, threshold):
+    """
+    Indices of the `threshold` points of (x, y) kept by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; every other bucket of points keeps
+    the one forming the largest triangle with the previously kept point and the
+    average of the next bucket.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        low = int(math.floor(i * every)) + 1
+        high = int(math.floor((i + 1) * every)) + 1
+        next_low, next_high = high, min(int(math.floor((i + 2) * every)) + 1, n)
+        if next_low >= next_high:
+            next_low, next_high = n - 1, n
+        avg_x, avg_y = x[next_low:next_high].mean(), y[next_low:next_high].mean()
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[low:high] - y[previous])
+            - (x[previous] - x[low:high]) * (avg_y - y[previous])
+        )
+        previous = low + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample(points, max_points):
+    """Keep at most `max_points` of the (moment, stats) pairs, choosing them by LTTB on the means."""
+    if len(points) <= max_points:
+        return points
+    x = [moment.timestamp() for moment, _ in points]
+    y = [stats.mean for _, stats in points]
+    return [points[i] for i in lttb(x, y, max_points)]
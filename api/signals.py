@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+
+from . import cache, rollups, tags
+from .authentication import user_cache
+from .devices import credential_cache
+from .models import Anemometer, DeviceCredential, WindSpeedReading
+from .search import name_index
+from .spatial import anemometer_index
+
+
+@receiver(post_save, sender=Anemometer)
+def update_spatial_index_on_save(sender, instance, **kwargs):
+    anemometer_index.saved(instance)
+
+
+@receiver(post_save, sender=Anemometer)
+def update_name_index_on_save(sender, instance, **kwargs):
+    name_index.saved(instance)
+
+
+@receiver(post_delete, sender=Anemometer)
+def update_name_index_on_delete(sender, instance, **kwargs):
+    name_index.deleted(instance)
+
+
+@receiver(post_save, sender=Anemometer)
+def update_tag_table_on_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'tags' in update_fields:
+        tags.sync_tags([instance])
+
+
+@receiver(post_delete, sender=Anemometer)
+def update_spatial_index_on_delete(sender, instance, **kwargs):
+    anemometer_index.deleted(instance)
+
+
+@receiver(pre_save, sender=WindSpeedReading)
+def remember_reading_bucket(sender, instance, **kwargs):
+    if not instance._state.adding:
+        instance._previous_bucket = sender.objects.filter(pk=instance.pk).values_list(
+            'anemometer_id', 'recorded_at'
+        ).first()
+
+
+@receiver(post_save, sender=WindSpeedReading)
+def update_rollups_on_save(sender, instance, created, **kwargs):
+    if created:
+        rollups.record_readings([(instance.anemometer_id, instance.speed_knots, instance.recorded_at)])
+        return
+    # Updates can move a reading out of its buckets: rebuild both the old and new ones.
+    affected = [(instance.anemometer_id, instance.recorded_at)]
+    previous = getattr(instance, '_previous_bucket', None)
+    if previous is not None:
+        affected.append(previous)
+    rollups.recompute_buckets(affected)
+
+
+@receiver(post_delete, sender=WindSpeedReading)
+def update_rollups_on_delete(sender, instance, origin=None, **kwargs):
+    # Deleting an anemometer deletes its buckets with it (cascade): no need to rebuild them.
+    if isinstance(origin, Anemometer) or getattr(origin, 'model', None) is Anemometer:
+        return
+    rollups.recompute_buckets([(instance.anemometer_id, instance.recorded_at)])
+
+
+@receiver(post_save, sender=Anemometer)
+@receiver(post_delete, sender=Anemometer)
+def invalidate_cached_responses(sender, **kwargs):
+    cache.invalidate()
+
+
+@receiver(post_save, sender=WindSpeedReading)
+@receiver(post_delete, sender=WindSpeedReading)
+def expire_cached_responses(sender, **kwargs):
+    cache.readings_changed()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def evict_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(getattr(instance, api_settings.USER_ID_FIELD))
+
+
+@receiver(post_save, sender=DeviceCredential)
+@receiver(post_delete, sender=DeviceCredential)
+def evict_cached_credential(sender, instance, **kwargs):
+    credential_cache.invalidate(instance.key_hash)
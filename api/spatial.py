@@ -0,0 +1,106 @@
+"""
+In-process spatial index over anemometer locations.
+
+Stations are bucketed in a lat/lon grid, so a radius query only looks at the
+cells overlapping the query's bounding box instead of every anemometer. Each
+worker process keeps its own copy, kept in sync with the `Anemometer` table
+by `VersionedIndex` (see `api.indexing`).
+"""
+import math
+
+import numpy as np
+from django.conf import settings
+
+from .geo import StationArray, bounding_box
+from .indexing import VersionedIndex
+from .models import Anemometer
+
+
+class GridIndex:
+    """Stations bucketed in square cells of `cell_size` degrees."""
+
+    def __init__(self, cell_size=1.0):
+        self.cell_size = cell_size
+        self._cells = {}
+        self._positions = {}
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _cell(self, latitude, longitude):
+        return math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size)
+
+    def add(self, pk, latitude, longitude):
+        self.discard(pk)
+        self._positions[pk] = (latitude, longitude)
+        self._cells.setdefault(self._cell(latitude, longitude), {})[pk] = (latitude, longitude)
+
+    def discard(self, pk):
+        position = self._positions.pop(pk, None)
+        if position is None:
+            return
+        cell = self._cell(*position)
+        members = self._cells[cell]
+        del members[pk]
+        if not members:
+            del self._cells[cell]
+
+    def ids(self):
+        return self._positions.keys()
+
+    def candidates(self, latitude, longitude, radius):
+        """Stations of every cell overlapping the bounding box of the circle."""
+        min_lat, max_lat, lon_ranges = bounding_box(latitude, longitude, radius)
+        rows = []
+        min_row, max_row = math.floor(min_lat / self.cell_size), math.floor(max_lat / self.cell_size)
+        for min_lon, max_lon in lon_ranges:
+            min_col, max_col = math.floor(min_lon / self.cell_size), math.floor(max_lon / self.cell_size)
+            for row in range(min_row, max_row + 1):
+                for col in range(min_col, max_col + 1):
+                    members = self._cells.get((row, col))
+                    if members:
+                        rows.extend((pk, lat, lon) for pk, (lat, lon) in members.items())
+        return StationArray.from_rows(rows)
+
+    def within_radius(self, latitude, longitude, radius):
+        """Ids of the stations within `radius` nautical miles, with geodesic semantics."""
+        stations = self.candidates(latitude, longitude, radius)
+        return stations.ids[stations.within_radius(latitude, longitude, radius)].tolist()
+
+
+class AnemometerIndex(VersionedIndex):
+    """Process-wide `GridIndex` kept in sync with the `Anemometer` table."""
+
+    version_name = 'anemometer-locations'
+
+    def build(self):
+        grid = GridIndex(settings.SPATIAL_INDEX_CELL_DEGREES)
+        for pk, latitude, longitude in Anemometer.objects.values_list('id', 'latitude', 'longitude').iterator():
+            grid.add(pk, latitude, longitude)
+        return grid
+
+    def enabled(self):
+        return settings.SPATIAL_INDEX_ENABLED
+
+    def partition(self, latitude, longitude, radius):
+        """
+        Split the known anemometers into (inside, outside) id lists for a radius query.
+
+        `outside` is only materialized when it is the shorter list, otherwise None.
+        """
+        with self._lock:
+            grid = self._fresh()
+            inside = grid.within_radius(latitude, longitude, radius)
+            if len(inside) * 2 <= len(grid):
+                return inside, None
+            outside = np.setdiff1d(np.fromiter(grid.ids(), dtype=np.int64, count=len(grid)), inside)
+            return inside, outside.tolist()
+
+    def saved(self, anemometer):
+        self._apply(lambda grid: grid.add(anemometer.pk, anemometer.latitude, anemometer.longitude))
+
+    def deleted(self, anemometer):
+        self._apply(lambda grid: grid.discard(anemometer.pk))
+
+
+anemometer_index = AnemometerIndex()
@@ -0,0 +1,82 @@
+"""
+Indexed tag membership filtering of anemometers.
+
+On PostgreSQL, `Anemometer.tags` is a `jsonb` array covered by a GIN index on
+its lowercased copy (migration 0010): "any" filters use `?|` (`has_any_keys`)
+and "all" filters `@>` (`contains`), both served by the index. Other databases
+cannot index JSON array membership, so tags are mirrored, lowercased, in the
+normalized `Tag` and `AnemometerTag` tables, kept in sync when anemometers are
+saved, and filters become an index lookup on `(tag, anemometer)`.
+
+Matching is on whole tags, case-insensitively as before: "test" matches
+"Test" but no longer "contest". Stored tags keep their case.
+"""
+from django.db import connections, router, transaction
+from django.db.models import Count, JSONField, TextField
+from django.db.models.functions import Cast, Lower
+
+from .models import Anemometer, AnemometerTag, Tag
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+MATCH_CHOICES = ((MATCH_ANY, 'Any of the tags'), (MATCH_ALL, 'All of the tags'))
+
+
+def uses_tag_table(using):
+    """Whether tag filters on database `using` go through the normalized tables."""
+    return connections[using].vendor != 'postgresql'
+
+
+def _names(tags):
+    """Distinct tag names, lowercased."""
+    return {tag.lower() for tag in tags or () if isinstance(tag, str)}
+
+
+def lowercased_tags():
+    """`LOWER(tags::text)::jsonb`, the expression of the PostgreSQL GIN index."""
+    return Cast(Lower(Cast('tags', TextField())), JSONField())
+
+
+def filter_by_tags(queryset, tags, match=MATCH_ANY):
+    """Anemometers having any (or all, with `match='all'`) of `tags`."""
+    tags = sorted(_names(tags))
+    if not tags:
+        return queryset
+    if not uses_tag_table(queryset.db):
+        queryset = queryset.alias(lowercased_tags=lowercased_tags())
+        if match == MATCH_ALL:
+            return queryset.filter(lowercased_tags__contains=tags)
+        return queryset.filter(lowercased_tags__has_any_keys=tags)
+
+    links = AnemometerTag.objects.filter(tag__name__in=tags)
+    if match == MATCH_ALL:
+        links = links.values('anemometer_id').annotate(matched=Count('tag_id')).filter(matched=len(tags))
+    return queryset.filter(id__in=links.values('anemometer_id'))
+
+
+def sync_tags(anemometers):
+    """Mirror the `tags` of saved anemometers into the normalized tag tables."""
+    anemometers = list(anemometers)
+    using = router.db_for_write(Anemometer)
+    if not anemometers or not uses_tag_table(using):
+        return
+
+    wanted = {anemometer.pk: _names(anemometer.tags) for anemometer in anemometers}
+    names = set().union(*wanted.values())
+    with transaction.atomic(using=using):
+        Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+        tag_ids = dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+        desired = {(anemometer_id, tag_ids[name]) for anemometer_id, tags in wanted.items() for name in tags}
+        existing = {
+            (anemometer_id, tag_id): pk
+            for pk, anemometer_id, tag_id in AnemometerTag.objects.filter(
+                anemometer_id__in=wanted,
+            ).values_list('pk', 'anemometer_id', 'tag_id')
+        }
+        stale = [pk for link, pk in existing.items() if link not in desired]
+        if stale:
+            AnemometerTag.objects.filter(pk__in=stale).delete()
+        AnemometerTag.objects.bulk_create(
+            [AnemometerTag(anemometer_id=anemometer_id, tag_id=tag_id) for anemometer_id, tag_id in desired - existing.keys()],
+            ignore_conflicts=True,
+        )
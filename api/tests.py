@@ -1,14 +1,31 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+import time
 import pytest
 import freezegun
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min, Q, Sum
 from rest_framework.test import APIClient
+from .authentication import user_cache
+from .devices import credential_cache
 from .factories import UserFactory, AnemometerFactory, WindSpeedReadingFactory
-from .models import Anemometer, WindSpeedReading
+from .geo import StationArray, bounding_box, haversine_nm, vincenty_nm
+from .models import Anemometer, IndexVersion, ReadingRollup, WindSpeedReading
+from .rollups import aggregate_readings
+from .spatial import GridIndex, anemometer_index
 
 
 # Create your tests here.
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    user_cache.clear()
+    credential_cache.clear()
+
 @pytest.fixture
 def client():
     return APIClient()
@@ -467,3 +484,1258 @@ def test_unauthorized_access(client, endpoint):
     response = client.get(endpoint)
     assert response.status_code == 401
     assert response.json()["detail"] == "Authentication credentials were not provided."
+
+
+def test_bounding_box_wraps_antimeridian():
+    min_lat, max_lat, lon_ranges = bounding_box(0.0, 179.9, 60)
+    assert min_lat < -1.0 and max_lat > 1.0
+    assert len(lon_ranges) == 2
+    assert lon_ranges[0][1] == 180.0 and lon_ranges[1][0] == -180.0
+
+def test_bounding_box_reaching_pole_covers_all_longitudes():
+    _, max_lat, lon_ranges = bounding_box(89.5, 10.0, 60)
+    assert max_lat == 90.0
+    assert lon_ranges == [(-180.0, 180.0)]
+
+@pytest.mark.django_db
+def test_wind_speed_statistics_ignores_anemometers_outside_radius(client, token):
+    near = AnemometerFactory(latitude=34.0522, longitude=-118.2437)
+    # 0.16 degrees of latitude is ~9.6nm, just within a 10nm radius.
+    edge = AnemometerFactory(latitude=34.2122, longitude=-118.2437)
+    far = AnemometerFactory(latitude=34.3522, longitude=-118.2437)
+    WindSpeedReadingFactory(anemometer=near, speed_knots=10.0)
+    WindSpeedReadingFactory(anemometer=edge, speed_knots=20.0)
+    WindSpeedReadingFactory(anemometer=far, speed_knots=90.0)
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    response = client.get('/api/stats/?latitude=34.0522&longitude=-118.2437&radius=10')
+
+    assert response.status_code == 200
+    assert response.json() == {'max': 20.0, 'mean': 15.0, 'min': 10.0}
+
+@pytest.mark.django_db
+def test_wind_speed_statistics_across_antimeridian(client, token):
+    east = AnemometerFactory(latitude=0.0, longitude=179.95)
+    west = AnemometerFactory(latitude=0.0, longitude=-179.95)
+    WindSpeedReadingFactory(anemometer=east, speed_knots=8.0)
+    WindSpeedReadingFactory(anemometer=west, speed_knots=12.0)
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    response = client.get('/api/stats/?latitude=0&longitude=180&radius=5')
+
+    assert response.status_code == 200
+    assert response.json() == {'max': 12.0, 'mean': 10.0, 'min': 8.0}
+
+def test_vincenty_matches_geopy_geodesic():
+    from geopy.distance import geodesic
+    latitudes = [34.2122, -33.8688, 51.5074, 0.0, 89.9]
+    longitudes = [-118.2437, 151.2093, -0.1278, 0.0, 179.0]
+    distances = vincenty_nm(34.0522, -118.2437, latitudes, longitudes)
+    for lat, lon, distance in zip(latitudes, longitudes, distances):
+        assert distance == pytest.approx(geodesic((34.0522, -118.2437), (lat, lon)).nautical, abs=1e-6)
+
+def test_vincenty_falls_back_to_geodesic_for_antipodal_points():
+    from geopy.distance import geodesic
+    distance = vincenty_nm(0.0, 0.0, [0.5], [179.7])[0]
+    assert distance == pytest.approx(geodesic((0.0, 0.0), (0.5, 179.7)).nautical, abs=1e-6)
+
+def test_station_array_within_radius_matches_geodesic():
+    import random
+    from geopy.distance import geodesic
+    rng = random.Random(42)
+    rows = [(i, 45 + rng.uniform(-1, 1), 5 + rng.uniform(-1.5, 1.5)) for i in range(500)]
+    stations = StationArray.from_rows(rows)
+    mask = stations.within_radius(45.0, 5.0, 40)
+    expected = [geodesic((45.0, 5.0), (lat, lon)).nautical <= 40 for _, lat, lon in rows]
+    assert mask.tolist() == expected
+    assert haversine_nm(45.0, 5.0, stations.latitudes, stations.longitudes).shape == (500,)
+
+def test_grid_index_only_scans_overlapping_cells():
+    grid = GridIndex(cell_size=1.0)
+    grid.add(1, 45.1, 5.1)
+    grid.add(2, 45.2, 5.3)
+    grid.add(3, -30.0, 120.0)
+    assert sorted(grid.candidates(45.0, 5.0, 30).ids.tolist()) == [1, 2]
+    assert sorted(grid.within_radius(45.0, 5.0, 30)) == [1, 2]
+    grid.add(2, -30.1, 120.1)
+    grid.discard(1)
+    assert grid.within_radius(45.0, 5.0, 30) == []
+    assert len(grid) == 2
+
+@pytest.mark.django_db
+def test_spatial_index_is_updated_on_save_and_delete():
+    near = AnemometerFactory(latitude=10.0, longitude=10.0)
+    assert anemometer_index.partition(10.0, 10.0, 5)[0] == [near.pk]
+    moved = AnemometerFactory(latitude=50.0, longitude=50.0)
+    moved.latitude, moved.longitude = 10.01, 10.01
+    moved.save()
+    assert sorted(anemometer_index.partition(10.0, 10.0, 5)[0]) == sorted([near.pk, moved.pk])
+    near.delete()
+    assert anemometer_index.partition(10.0, 10.0, 5)[0] == [moved.pk]
+
+@pytest.mark.django_db(transaction=True)
+def test_spatial_index_is_only_updated_once_the_change_commits():
+    first = AnemometerFactory(latitude=10.0, longitude=10.0)
+    assert anemometer_index.partition(10.0, 10.0, 5)[0] == [first.pk]
+    grid = anemometer_index._index
+    with pytest.raises(RuntimeError), transaction.atomic():
+        AnemometerFactory(latitude=10.01, longitude=10.01)
+        # Not kept: built from a change that is rolled back below.
+        assert len(anemometer_index.partition(10.0, 10.0, 5)[0]) == 2
+        assert anemometer_index._index is grid and len(grid) == 1
+        raise RuntimeError
+    assert anemometer_index.partition(10.0, 10.0, 5)[0] == [first.pk]
+
+    with transaction.atomic():
+        second = AnemometerFactory(latitude=10.01, longitude=10.01)
+        assert len(grid) == 1
+    # Applied in place on commit rather than rebuilt.
+    assert anemometer_index._index is grid and len(grid) == 2
+    assert sorted(anemometer_index.partition(10.0, 10.0, 5)[0]) == sorted([first.pk, second.pk])
+
+@pytest.mark.django_db
+def test_spatial_index_rebuilds_after_changes_from_other_workers():
+    first = AnemometerFactory(latitude=10.0, longitude=10.0)
+    assert anemometer_index.partition(10.0, 10.0, 5)[0] == [first.pk]
+    # Another worker writes without going through this process' signals.
+    Anemometer.objects.filter(pk=first.pk).update(latitude=-10.0)
+    IndexVersion.bump(anemometer_index.version_name)
+    assert anemometer_index.partition(10.0, 10.0, 5)[0] == []
+
+@pytest.mark.django_db
+def test_disabled_spatial_index_does_not_bump_its_version(settings):
+    settings.SPATIAL_INDEX_ENABLED = False
+    anemometer = AnemometerFactory()
+    anemometer.delete()
+    assert IndexVersion.current(anemometer_index.version_name) == 0
+
+@pytest.mark.django_db
+def test_wind_speed_statistics_without_spatial_index(client, token, settings):
+    settings.SPATIAL_INDEX_ENABLED = False
+    near = AnemometerFactory(latitude=34.0522, longitude=-118.2437)
+    far = AnemometerFactory(latitude=35.0522, longitude=-118.2437)
+    WindSpeedReadingFactory(anemometer=near, speed_knots=10.0)
+    WindSpeedReadingFactory(anemometer=far, speed_knots=90.0)
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    response = client.get('/api/stats/?latitude=34.0522&longitude=-118.2437&radius=10')
+
+    assert response.json() == {'max': 10.0, 'mean': 10.0, 'min': 10.0}
+
+@pytest.mark.django_db
+def test_rollups_are_updated_when_readings_change():
+    anemometer = AnemometerFactory()
+    reading = WindSpeedReadingFactory(anemometer=anemometer, speed_knots=10.0, recorded_at=datetime(2025, 2, 22, 14, 5, tzinfo=timezone.utc))
+    WindSpeedReadingFactory(anemometer=anemometer, speed_knots=20.0, recorded_at=datetime(2025, 2, 22, 14, 50, tzinfo=timezone.utc))
+    hour = ReadingRollup.objects.get(granularity=ReadingRollup.HOUR)
+    assert (hour.count, hour.speed_sum, hour.speed_min, hour.speed_max) == (2, 30.0, 10.0, 20.0)
+
+    reading.recorded_at = datetime(2025, 2, 23, 1, 0, tzinfo=timezone.utc)
+    reading.save()
+    days = ReadingRollup.objects.filter(granularity=ReadingRollup.DAY).values_list('bucket_start', 'count', 'speed_sum')
+    assert list(days) == [
+        (datetime(2025, 2, 22, tzinfo=timezone.utc), 1, 20.0),
+        (datetime(2025, 2, 23, tzinfo=timezone.utc), 1, 10.0),
+    ]
+
+@pytest.mark.django_db
+def test_deleting_reading_recomputes_its_rollups(client, token):
+    reading = WindSpeedReadingFactory(speed_knots=10.0, recorded_at=datetime(2025, 2, 22, 14, 5, tzinfo=timezone.utc))
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    response = client.delete(f'/api/readings/{reading.id}/')
+    assert response.status_code == 204
+    assert not ReadingRollup.objects.exists()
+
+@pytest.mark.django_db
+def test_rollups_follow_readings_deleted_through_the_orm(client, token):
+    anemometer, other = AnemometerFactory(latitude=34.0522, longitude=-118.2437), AnemometerFactory(latitude=34.0522, longitude=-118.2437)
+    base = datetime(2025, 2, 22, 14, 5, tzinfo=timezone.utc)
+    for speed in (10.0, 20.0, 30.0):
+        WindSpeedReadingFactory(anemometer=anemometer, speed_knots=speed, recorded_at=base)
+    WindSpeedReadingFactory(anemometer=other, speed_knots=50.0, recorded_at=base)
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    params = {'latitude': 34.0522, 'longitude': -118.2437, 'radius': 10, 'start': '2025-02-22T00:00:00Z', 'end': '2025-02-23T00:00:00Z'}
+
+    WindSpeedReading.objects.filter(speed_knots__gte=30.0).delete()
+    assert client.get('/api/stats/', params).json() == {'max': 20.0, 'mean': 15.0, 'min': 10.0}
+    WindSpeedReading.objects.get(speed_knots=20.0).delete()
+    assert client.get('/api/stats/', params).json() == {'max': 10.0, 'mean': 10.0, 'min': 10.0}
+
+    other.delete()
+    assert set(ReadingRollup.objects.values_list('anemometer_id', 'count')) == {(anemometer.id, 1)}
+
+@pytest.mark.django_db
+def test_aggregate_readings_matches_raw_aggregate():
+    anemometer = AnemometerFactory()
+    start = datetime(2025, 2, 20, tzinfo=timezone.utc)
+    for i in range(200):
+        WindSpeedReadingFactory(anemometer=anemometer, speed_knots=float(i % 37), recorded_at=start + timedelta(minutes=47 * i))
+    windows = [
+        (None, None),
+        (start + timedelta(hours=5, minutes=13), None),
+        (start + timedelta(hours=5, minutes=13), start + timedelta(days=3, hours=2, minutes=7)),
+        (start + timedelta(hours=30, minutes=1), start + timedelta(hours=30, minutes=59)),
+        (start + timedelta(hours=30, minutes=1), start + timedelta(hours=40, minutes=12)),
+        (None, start + timedelta(days=2)),
+    ]
+    for window_start, window_end in windows:
+        raw = WindSpeedReading.objects.filter(anemometer=anemometer)
+        if window_start:
+            raw = raw.filter(recorded_at__gte=window_start)
+        if window_end:
+            raw = raw.filter(recorded_at__lt=window_end)
+        expected = raw.aggregate(count=Count('id'), mean=Avg('speed_knots'), minimum=Min('speed_knots'), maximum=Max('speed_knots'))
+        stats = aggregate_readings(Q(anemometer=anemometer), window_start, window_end)
+        assert (stats.count, stats.minimum, stats.maximum) == (expected['count'], expected['minimum'], expected['maximum'])
+        assert stats.mean == pytest.approx(expected['mean'])
+
+@pytest.mark.django_db
+def test_backfill_rollups_command_rebuilds_buckets():
+    reading = WindSpeedReadingFactory(speed_knots=12.0, recorded_at=datetime(2025, 2, 22, 14, 5, tzinfo=timezone.utc))
+    ReadingRollup.objects.all().delete()
+    call_command('backfill_rollups', '--since', '2025-02-22')
+    assert ReadingRollup.objects.filter(anemometer=reading.anemometer).count() == 2
+    assert ReadingRollup.objects.get(granularity=ReadingRollup.DAY).speed_sum == 12.0
+
+@pytest.mark.django_db(transaction=True)
+def test_rollup_migration_backfills_existing_readings():
+    from django.db import connection
+    from django.db.migrations.executor import MigrationExecutor
+
+    before, rollups = [('api', '0003_indexversion')], [('api', '0004_readingrollup')]
+    executor = MigrationExecutor(connection)
+    latest = executor.loader.graph.leaf_nodes()
+    executor.migrate(before)
+    apps = executor.loader.project_state(before).apps
+    anemometer = apps.get_model('api', 'Anemometer').objects.create(name='Legacy', latitude=0.0, longitude=0.0)
+    for speed, minute in [(10.0, 5), (20.0, 50)]:
+        apps.get_model('api', 'WindSpeedReading').objects.create(
+            anemometer=anemometer, speed_knots=speed, recorded_at=datetime(2025, 2, 22, 14, minute, tzinfo=timezone.utc),
+        )
+    try:
+        MigrationExecutor(connection).migrate(rollups)
+        buckets = ReadingRollup.objects.order_by('granularity').values_list('granularity', 'count', 'speed_sum', 'speed_min', 'speed_max')
+        assert list(buckets) == [(ReadingRollup.DAY, 2, 30.0, 10.0, 20.0), (ReadingRollup.HOUR, 2, 30.0, 10.0, 20.0)]
+    finally:
+        MigrationExecutor(connection).migrate(latest)
+
+@pytest.mark.django_db
+@freezegun.freeze_time(datetime(2025, 2, 22, 14, 6, 26, tzinfo=timezone.utc))
+def test_anemometer_daily_and_weekly_mean_speed(client, user):
+    anemometer = AnemometerFactory()
+    now = datetime(2025, 2, 22, 14, 6, 26, tzinfo=timezone.utc)
+    for speed, age in [(10.0, timedelta(hours=1)), (20.0, timedelta(days=2)), (60.0, timedelta(days=8))]:
+        WindSpeedReadingFactory(anemometer=anemometer, speed_knots=speed, recorded_at=now - age)
+    client.force_authenticate(user=user)
+
+    response = client.get(f'/api/anemometers/{anemometer.id}/')
+
+    assert response.json()['daily_mean_speed'] == 10.0
+    assert response.json()['weekly_mean_speed'] == 15.0
+
+@pytest.mark.django_db
+def test_anemometer_list_uses_constant_number_of_queries(client, user, django_assert_num_queries):
+    for anemometer in AnemometerFactory.create_batch(10):
+        for speed in range(8):
+            WindSpeedReadingFactory(anemometer=anemometer, speed_knots=float(speed))
+    client.force_authenticate(user=user)
+
+    # COUNT for pagination, the annotated page and the window-limited readings prefetch.
+    with django_assert_num_queries(3):
+        response = client.get('/api/anemometers/')
+
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert len(results) == 10
+    assert all(len(a['latest_readings']) == 5 for a in results)
+    latest = [r['recorded_at'] for r in results[0]['latest_readings']]
+    assert latest == sorted(latest, reverse=True)
+
+@pytest.mark.django_db
+def test_bulk_create_readings(client, token):
+    first, second = AnemometerFactory.create_batch(2)
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    rows = [
+        {'anemometer': first.id, 'speed_knots': 10.0, 'recorded_at': '2025-02-22T14:00:00Z'},
+        {'anemometer': second.id, 'speed_knots': 20.0, 'recorded_at': '2025-02-22T14:10:00Z'},
+        {'anemometer': first.id, 'speed_knots': 30.0},
+    ]
+
+    response = client.post('/api/readings/bulk/', rows, format='json')
+
+    assert response.status_code == 201, response.content
+    assert response.json() == {'created': 3, 'errors': []}
+    assert WindSpeedReading.objects.filter(anemometer=first).count() == 2
+    assert ReadingRollup.objects.get(anemometer=second, granularity=ReadingRollup.DAY).speed_sum == 20.0
+
+@pytest.mark.django_db
+def test_bulk_create_readings_reports_row_errors(client, token):
+    anemometer = AnemometerFactory()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    body = '\n'.join([
+        f'{{"anemometer": {anemometer.id}, "speed_knots": 12.5}}',
+        '',
+        '{"anemometer": 999999, "speed_knots": 3}',
+        f'{{"anemometer": {anemometer.id}, "speed_knots": "fast"}}',
+    ])
+
+    response = client.post('/api/readings/bulk/', body, content_type='application/x-ndjson')
+
+    assert response.status_code == 207
+    assert response.json() == {
+        'created': 1,
+        'errors': [
+            {'index': 1, 'errors': {'anemometer': ['Invalid pk "999999" - object does not exist.']}},
+            {'index': 2, 'errors': {'speed_knots': ['A valid number is required.']}},
+        ],
+    }
+    assert WindSpeedReading.objects.get().speed_knots == 12.5
+
+@pytest.mark.django_db
+def test_bulk_create_readings_rejects_oversized_batches(client, token, settings):
+    settings.READINGS_BULK_MAX_ROWS = 2
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    response = client.post('/api/readings/bulk/', [{}, {}, {}], format='json')
+    assert response.status_code == 400
+    assert response.json() == {'non_field_errors': ['Ensure this request has no more than 2 readings.']}
+
+@pytest.mark.django_db
+def test_bulk_create_readings_copy_mode(client, token):
+    anemometer = AnemometerFactory()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    rows = [{'anemometer': anemometer.id, 'speed_knots': speed, 'recorded_at': '2025-02-22T14:00:00Z'} for speed in (4.0, 8.0)]
+
+    response = client.post('/api/readings/bulk/?mode=copy', rows, format='json')
+
+    assert response.status_code == 201, response.content
+    assert sorted(WindSpeedReading.objects.values_list('speed_knots', flat=True)) == [4.0, 8.0]
+    assert ReadingRollup.objects.get(granularity=ReadingRollup.HOUR).count == 2
+
+@pytest.mark.django_db
+def test_import_readings_command(tmp_path, capsys):
+    anemometer = AnemometerFactory()
+    path = tmp_path / 'readings.csv'
+    path.write_text(
+        'anemometer,speed_knots,recorded_at\n'
+        f'{anemometer.id},10.5,2025-02-22T14:00:00Z\n'
+        f'{anemometer.id},11.5,\n'
+        f'{anemometer.id},fast,2025-02-22T14:00:00Z\n'
+    )
+
+    call_command('import_readings', str(path), '--batch-size', '2')
+
+    output = capsys.readouterr()
+    assert 'Imported 2 readings, rejected 1.' in output.out
+    assert 'Row 3:' in output.err
+    assert sorted(WindSpeedReading.objects.values_list('speed_knots', flat=True)) == [10.5, 11.5]
+
+def test_partition_month_arithmetic():
+    from datetime import date
+    from .partitions import add_months, month_start, partition_name
+    assert month_start(datetime(2025, 2, 22, 14, 6, tzinfo=timezone.utc)) == date(2025, 2, 1)
+    assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+    assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+    assert partition_name(date(2025, 2, 1)) == 'api_windspeedreading_p202502'
+
+@pytest.mark.django_db
+def test_partition_readings_command_requires_postgresql():
+    from django.core.management.base import CommandError
+    with pytest.raises(CommandError, match='requires PostgreSQL'):
+        call_command('partition_readings', 'maintain')
+
+@pytest.mark.postgresql
+@pytest.mark.django_db(transaction=True)
+def test_partition_readings_command_converts_and_reverts(settings):
+    from io import StringIO
+    from django.db import connection
+    from .checks import check_readings_partitioned
+    from .partitions import is_partitioned, monthly_partitions
+    if connection.vendor != 'postgresql':
+        pytest.skip("Partitioning needs PostgreSQL.")
+    settings.READINGS_PARTITIONED = True
+    anemometer = AnemometerFactory()
+    for month in (1, 3):
+        WindSpeedReadingFactory(anemometer=anemometer, recorded_at=datetime(2025, month, 10, tzinfo=timezone.utc))
+    assert [w.id for w in check_readings_partitioned(None, databases=['default'])] == ['api.W002']
+
+    try:
+        call_command('partition_readings', 'convert', stdout=StringIO())
+        assert is_partitioned(connection) and check_readings_partitioned(None, databases=['default']) == []
+        assert [month.month for month in monthly_partitions(connection)] == [1, 2, 3]
+        WindSpeedReadingFactory(anemometer=anemometer, recorded_at=datetime(2025, 2, 1, tzinfo=timezone.utc))
+        assert WindSpeedReading.objects.filter(recorded_at__month=2).count() == 1
+        call_command('partition_readings', 'maintain', '--ahead', '1', stdout=StringIO())
+        assert len(monthly_partitions(connection)) >= 5
+    finally:
+        call_command('partition_readings', 'revert', stdout=StringIO())
+    assert not is_partitioned(connection)
+    assert WindSpeedReading.objects.count() == 3
+
+@pytest.mark.django_db
+def test_wind_speed_statistics_within_time_range(client, token):
+    anemometer = AnemometerFactory(latitude=34.0522, longitude=-118.2437)
+    for speed, recorded_at in [(10.0, '2025-02-01T10:15:00Z'), (20.0, '2025-02-10T08:00:00Z'), (60.0, '2025-03-01T00:00:00Z')]:
+        WindSpeedReadingFactory(anemometer=anemometer, speed_knots=speed, recorded_at=datetime.fromisoformat(recorded_at))
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    response = client.get('/api/stats/', {
+        'latitude': 34.0522, 'longitude': -118.2437, 'radius': 10,
+        'start': '2025-02-01T10:00:00Z', 'end': '2025-03-01T00:00:00Z',
+    })
+    assert response.json() == {'max': 20.0, 'mean': 15.0, 'min': 10.0}
+
+    response = client.get('/api/stats/', {
+        'latitude': 34.0522, 'longitude': -118.2437, 'radius': 10,
+        'start': '2025-03-01T00:00:00Z', 'end': '2025-02-01T00:00:00Z',
+    })
+    assert response.status_code == 400
+    assert response.json() == {'end': ['Ensure this value is after start.']}
+
+@pytest.mark.django_db
+def test_readings_cursor_pagination_walks_both_ways(client, token, monkeypatch):
+    from .pagination import ReadingKeysetPagination
+    monkeypatch.setattr(ReadingKeysetPagination, 'page_size', 3)
+    anemometer = AnemometerFactory()
+    moment = datetime(2025, 2, 22, 14, 0, tzinfo=timezone.utc)
+    # Ties on recorded_at must be split by id without skipping or repeating rows.
+    readings = [WindSpeedReadingFactory(anemometer=anemometer, speed_knots=5.0, recorded_at=moment - timedelta(minutes=i // 2)) for i in range(7)]
+    expected = [reading.id for reading in sorted(readings, key=lambda r: (r.recorded_at, r.id), reverse=True)]
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    seen, pages, url = [], [], '/api/readings/?pagination=cursor'
+    while url:
+        body = client.get(url).json()
+        assert 'count' not in body
+        pages.append(body)
+        seen += [row['id'] for row in body['results']]
+        url = body['next']
+    assert seen == expected
+    assert pages[0]['previous'] is None
+
+    previous = client.get(pages[-1]['previous']).json()
+    assert [row['id'] for row in previous['results']] == [row['id'] for row in pages[-2]['results']]
+
+@pytest.mark.django_db
+def test_readings_cursor_pagination_rejects_invalid_cursor(client, token):
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    response = client.get('/api/readings/', {'cursor': 'not-a-cursor'})
+    assert response.status_code == 404
+
+@pytest.mark.django_db
+def test_page_number_pagination_without_count(client, token):
+    AnemometerFactory.create_batch(3)
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    body = client.get('/api/anemometers/', {'count': 'false'}).json()
+    assert body['count'] is None
+    assert body['next'] is None
+    assert len(body['results']) == 3
+
+@pytest.mark.django_db
+def test_wind_speed_statistics_are_cached_until_readings_change(client, user, settings, django_assert_num_queries):
+    settings.RESPONSE_CACHE_ENABLED = True
+    settings.RESPONSE_CACHE_READINGS_DELAY = 0
+    anemometer = AnemometerFactory(latitude=34.0522, longitude=-118.2437)
+    WindSpeedReadingFactory(anemometer=anemometer, speed_knots=10.0)
+    client.force_authenticate(user=user)
+    params = {'latitude': 34.0522, 'longitude': -118.2437, 'radius': 10}
+
+    first = client.get('/api/stats/', params)
+    assert first.json()['mean'] == 10.0
+    with django_assert_num_queries(0):
+        # Same parameters in another order hit the cache.
+        assert client.get('/api/stats/', dict(reversed(params.items()))).json() == first.json()
+
+    WindSpeedReadingFactory(anemometer=anemometer, speed_knots=20.0)
+    assert client.get('/api/stats/', params).json()['mean'] == 15.0
+
+@pytest.mark.django_db
+def test_cached_responses_survive_new_readings_for_the_readings_delay(client, user, settings, django_assert_num_queries):
+    settings.RESPONSE_CACHE_ENABLED = True
+    settings.RESPONSE_CACHE_READINGS_DELAY = 10
+    client.force_authenticate(user=user)
+    params = {'latitude': 34.0522, 'longitude': -118.2437, 'radius': 10}
+
+    with freezegun.freeze_time(datetime(2025, 2, 22, 14, 0, tzinfo=timezone.utc)) as clock:
+        anemometer = AnemometerFactory(latitude=34.0522, longitude=-118.2437)
+        WindSpeedReadingFactory(anemometer=anemometer, speed_knots=10.0)
+        first = client.get('/api/stats/', params)
+        WindSpeedReadingFactory(anemometer=anemometer, speed_knots=20.0)
+        clock.tick(9)
+        with django_assert_num_queries(0):
+            cached = client.get('/api/stats/', params)
+        assert cached['ETag'] == first['ETag'] and cached.json()['mean'] == 10.0
+
+        clock.tick(1)
+        response = client.get('/api/stats/', params)
+        assert response['ETag'] != first['ETag'] and response.json()['mean'] == 15.0
+
+        # Anemometer changes still invalidate right away.
+        AnemometerFactory()
+        assert client.get('/api/stats/', params)['ETag'] != response['ETag']
+
+@pytest.mark.django_db
+def test_cached_anemometer_responses_answer_conditional_requests(client, user, settings):
+    settings.RESPONSE_CACHE_ENABLED = True
+    anemometer = AnemometerFactory()
+    client.force_authenticate(user=user)
+
+    response = client.get(f'/api/anemometers/{anemometer.id}/')
+    assert response.status_code == 200
+    assert response['Last-Modified']
+    etag = response['ETag']
+
+    assert client.get(f'/api/anemometers/{anemometer.id}/', HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    anemometer.name = 'Renamed'
+    anemometer.save()
+    response = client.get(f'/api/anemometers/{anemometer.id}/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()['name'] == 'Renamed'
+    assert response['ETag'] != etag
+
+def test_response_cache_requires_a_shared_cache(settings):
+    from .checks import check_response_cache
+
+    settings.RESPONSE_CACHE_ENABLED = True
+    assert [warning.id for warning in check_response_cache(None)] == ['api.W001']
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379/1'}}
+    assert check_response_cache(None) == []
+
+@pytest.mark.django_db
+def test_anemometer_tag_filter_matches_whole_tags(client, user):
+    AnemometerFactory(name='Contest', tags=['contest'])
+    AnemometerFactory(name='Test', tags=['Test', 'coastal'])
+    AnemometerFactory(name='Coastal', tags=['coastal'])
+    client.force_authenticate(user=user)
+
+    response = client.get('/api/anemometers/', {'tags': 'test'})
+    assert [a['name'] for a in response.json()['results']] == ['Test']
+
+    response = client.get('/api/anemometers/', {'tags': 'test,coastal', 'tags_match': 'all'})
+    assert [a['name'] for a in response.json()['results']] == ['Test']
+
+    response = client.get('/api/anemometers/', {'tags': 'test,coastal', 'tags_match': 'any'})
+    assert [a['name'] for a in response.json()['results']] == ['Coastal', 'Test']
+
+    response = client.get('/api/anemometers/', {'tags': 'COASTAL,Test', 'tags_match': 'all'})
+    assert [a['name'] for a in response.json()['results']] == ['Test']
+
+    assert client.get('/api/anemometers/', {'tags': 'test', 'tags_match': 'most'}).status_code == 400
+
+@pytest.mark.django_db
+def test_tag_table_follows_anemometer_tags():
+    from .models import AnemometerTag
+    anemometer = AnemometerFactory(tags=['coastal', 'low-wind'])
+    anemometer.tags = ['coastal', 'High-Wind']
+    anemometer.save()
+
+    names = AnemometerTag.objects.filter(anemometer=anemometer).values_list('tag__name', flat=True)
+    assert sorted(names) == ['coastal', 'high-wind']
+
+@pytest.mark.django_db(transaction=True)
+def test_tag_migration_lowercases_the_tag_table():
+    from django.db import connection
+    from django.db.migrations.executor import MigrationExecutor
+    from .models import AnemometerTag
+
+    before, lowercased = [('api', '0009_device_credential')], [('api', '0010_lowercase_tags')]
+    executor = MigrationExecutor(connection)
+    latest = executor.loader.graph.leaf_nodes()
+    executor.migrate(before)
+    apps = executor.loader.project_state(before).apps
+    apps.get_model('api', 'Anemometer').objects.create(name='Legacy', latitude=0.0, longitude=0.0, tags=['Coastal', 'coastal', 'High-Wind'])
+    try:
+        MigrationExecutor(connection).migrate(lowercased)
+        assert sorted(AnemometerTag.objects.values_list('tag__name', flat=True)) == ['coastal', 'high-wind']
+    finally:
+        MigrationExecutor(connection).migrate(latest)
+
+def test_ngram_index_substring_and_fuzzy_lookups():
+    from .search import NgramIndex, similarity
+    index = NgramIndex()
+    for pk, name in enumerate(['Harbour North', 'North Ridge', 'Contest Field', 'Test Site', 'Northern Lights']):
+        index.add(pk, name)
+
+    assert [pk for pk, _ in index.substring(['test'], 10)] == [3, 2]
+    assert [pk for pk, _ in index.substring(['nor'], 10)] == [1, 0, 4]
+    assert [pk for pk, _ in index.fuzzy('Nroth Ridge', 10)] == [1]
+    assert index.fuzzy('Nroth Ridge', 10)[0][1] == pytest.approx(similarity('Nroth Ridge', 'North Ridge'))
+
+    assert [pk for pk, _ in index.substring(['ridge', 'nor'], 10)] == [1]
+    index.discard(3)
+    assert [pk for pk, _ in index.substring(['test'], 10)] == [2]
+
+def test_prefix_upper_bound_handles_the_last_code_points():
+    from .search import _prefix_upper_bound
+    assert _prefix_upper_bound('Nort') == 'Noru'
+    assert _prefix_upper_bound('N\U0010ffff\U0010ffff') == 'O'
+    assert _prefix_upper_bound('\ud7ff') == '\ue000'
+    assert _prefix_upper_bound('\U0010ffff') is None
+    assert _prefix_upper_bound('') is None
+
+@pytest.mark.django_db
+def test_anemometer_name_search_modes(client, user):
+    for name in ['Harbour North', 'North Ridge', 'Contest Field', 'Test Site']:
+        AnemometerFactory(name=name)
+    client.force_authenticate(user=user)
+
+    def names(**params):
+        response = client.get('/api/anemometers/', params)
+        assert response.status_code == 200, response.content
+        return [a['name'] for a in response.json()['results']]
+
+    assert names(search='north') == ['North Ridge', 'Harbour North']
+    assert names(search='Ridge North') == ['North Ridge']
+    assert names(search='"Ridge North"') == []
+    assert names(search='North', search_mode='prefix') == ['North Ridge']
+    assert names(search='north', search_mode='prefix') == []
+    assert names(search='North\U0010ffff', search_mode='prefix') == []
+    assert names(search='Harbor Nort', search_mode='fuzzy') == ['Harbour North']
+
+    Anemometer.objects.filter(name='Test Site').get().delete()
+    renamed = Anemometer.objects.get(name='Contest Field')
+    renamed.name = 'Northbound'
+    renamed.save()
+    assert names(search='north') == ['North Ridge', 'Harbour North', 'Northbound']
+    assert names(search='test') == []
+    assert client.get('/api/anemometers/', {'search': 'x', 'search_mode': 'regex'}).status_code == 400
+
+@pytest.mark.django_db
+def test_anemometer_name_search_counts_every_match(client, user, settings):
+    settings.NAME_SEARCH_RANKED_RESULTS = 2
+    for i in range(5):
+        AnemometerFactory(name=f'Cape {i}')
+    AnemometerFactory(name='Cape')
+    client.force_authenticate(user=user)
+    body = client.get('/api/anemometers/', {'search': 'cape'}).json()
+    assert body['count'] == 6
+    # The two most similar first, then the others by name.
+    assert [a['name'] for a in body['results']] == ['Cape', 'Cape 0', 'Cape 1', 'Cape 2', 'Cape 3', 'Cape 4']
+
+@pytest.mark.django_db
+def test_anemometer_series_buckets(client, user):
+    anemometer = AnemometerFactory()
+    base = datetime(2025, 2, 22, 10, 0, tzinfo=timezone.utc)
+    for minutes, speed in [(0, 10.0), (2, 20.0), (4, 30.0), (7, 40.0), (61, 5.0), (125, 7.0)]:
+        WindSpeedReadingFactory(anemometer=anemometer, speed_knots=speed, recorded_at=base + timedelta(minutes=minutes))
+    client.force_authenticate(user=user)
+    url = f'/api/anemometers/{anemometer.id}/series/'
+
+    body = client.get(url, {'bucket': '5m', 'start': '2025-02-22T10:00:00Z', 'end': '2025-02-22T11:00:00Z'}).json()
+    assert body['points'] == [
+        {'start': '2025-02-22T10:00:00Z', 'count': 3, 'min': 10.0, 'max': 30.0, 'mean': 20.0},
+        {'start': '2025-02-22T10:05:00Z', 'count': 1, 'min': 40.0, 'max': 40.0, 'mean': 40.0},
+    ]
+
+    # Whole hours come from the rollups, the partial ones at the edges from raw readings.
+    body = client.get(url, {'bucket': '1h', 'start': '2025-02-22T10:03:00Z', 'end': '2025-02-22T12:30:00Z'}).json()
+    assert [(p['start'], p['count'], p['mean']) for p in body['points']] == [
+        ('2025-02-22T10:00:00Z', 2, 35.0),
+        ('2025-02-22T11:00:00Z', 1, 5.0),
+        ('2025-02-22T12:00:00Z', 1, 7.0),
+    ]
+
+    response = client.get(url, {'bucket': '1m', 'start': '2025-01-01T00:00:00Z', 'end': '2025-03-01T00:00:00Z'})
+    assert response.status_code == 400
+    assert client.get(url, {'bucket': '2m'}).status_code == 400
+
+def test_lttb_keeps_endpoints_and_peaks():
+    from .series import lttb
+    x = list(range(100))
+    y = [0.0] * 100
+    y[37] = 50.0
+    selected = lttb(x, y, 10)
+    assert len(selected) == 10
+    assert selected[0] == 0 and selected[-1] == 99
+    assert 37 in selected
+    assert list(lttb(x[:5], y[:5], 10)) == [0, 1, 2, 3, 4]
+
+@pytest.mark.django_db
+def test_anemometer_series_downsampling(client, user):
+    anemometer = AnemometerFactory()
+    base = datetime(2025, 2, 22, 0, 0, tzinfo=timezone.utc)
+    for minutes in range(60):
+        WindSpeedReadingFactory(anemometer=anemometer, speed_knots=float(minutes % 7), recorded_at=base + timedelta(minutes=minutes))
+    client.force_authenticate(user=user)
+
+    body = client.get(f'/api/anemometers/{anemometer.id}/series/', {
+        'bucket': '1m', 'start': '2025-02-22T00:00:00Z', 'end': '2025-02-22T01:00:00Z', 'max_points': 12,
+    }).json()
+    assert body['downsampled'] is True
+    assert len(body['points']) == 12
+    assert body['points'][0]['start'] == '2025-02-22T00:00:00Z'
+    assert body['points'][-1]['start'] == '2025-02-22T00:59:00Z'
+
+@pytest.mark.django_db
+def test_export_readings_streams_csv_and_ndjson(client, user, settings):
+    import gzip
+    import json
+    settings.READINGS_EXPORT_CHUNK_SIZE = 2
+    first, second = AnemometerFactory(), AnemometerFactory()
+    base = datetime(2025, 2, 22, 14, 0, tzinfo=timezone.utc)
+    readings = [
+        WindSpeedReadingFactory(anemometer=anemometer, speed_knots=speed, recorded_at=base + timedelta(minutes=minutes))
+        for anemometer, speed, minutes in [(first, 10.5, 0), (second, 3.0, 1), (first, 12.0, 2), (first, 8.25, 90)]
+    ]
+    client.force_authenticate(user=user)
+
+    response = client.get('/api/readings/export/', {'anemometer': first.id, 'end': '2025-02-22T15:00:00Z'}, HTTP_ACCEPT='text/csv')
+    assert response.status_code == 200
+    assert response.streaming
+    assert response['Content-Type'] == 'text/csv'
+    assert b''.join(response.streaming_content).decode() == (
+        'id,anemometer,speed_knots,recorded_at\n'
+        f'{readings[0].id},{first.id},10.5,2025-02-22T14:00:00Z\n'
+        f'{readings[2].id},{first.id},12.0,2025-02-22T14:02:00Z\n'
+    )
+
+    response = client.get('/api/readings/export/', {'output': 'ndjson', 'gzip': 'true'})
+    assert response['Content-Disposition'] == 'attachment; filename="readings.ndjson.gz"'
+    lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+    assert [json.loads(line)['speed_knots'] for line in lines] == [10.5, 3.0, 12.0, 8.25]
+
+    response = client.get('/api/readings/export/', {'output': 'xml'}, HTTP_ACCEPT='text/csv')
+    assert response.status_code == 400
+    assert 'output' in response.json()
+
+@pytest.mark.django_db
+def test_export_readings_writes_non_finite_speeds_as_null(client, user):
+    import json
+    base = datetime(2025, 2, 22, 14, 0, tzinfo=timezone.utc)
+    for minutes, speed in enumerate((float('inf'), 4.5, float('-inf'))):
+        WindSpeedReadingFactory(speed_knots=speed, recorded_at=base + timedelta(minutes=minutes))
+    client.force_authenticate(user=user)
+
+    response = client.get('/api/readings/export/', {'output': 'ndjson'})
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    assert [json.loads(line)['speed_knots'] for line in lines] == [None, 4.5, None]
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [{}, {'pagination': 'cursor'}, {'count': 'false'}])
+def test_fast_reading_list_is_byte_identical(client, user, settings, params):
+    anemometer = AnemometerFactory()
+    for speed, recorded_at in [(10.5, '2025-02-22T14:00:00.123456+00:00'), (1e-07, '2025-02-22T15:00:00+00:00'), (3.0, '2025-02-22T16:00:00+00:00')]:
+        WindSpeedReadingFactory(anemometer=anemometer, speed_knots=speed, recorded_at=datetime.fromisoformat(recorded_at))
+    client.force_authenticate(user=user)
+
+    fast = client.get('/api/readings/', params).content
+    settings.FAST_SERIALIZERS_ENABLED = False
+    cache.clear()
+    assert client.get('/api/readings/', params).content == fast
+
+def test_fast_json_renderer_matches_json_renderer():
+    from decimal import Decimal
+    from rest_framework.renderers import JSONRenderer
+    from .renderers import FastJSONRenderer
+    from .serializers import FastRows
+    for data in [
+        {'name': 'Cap Nord\u2028', 'speed': 12.5, 'tags': ['é', 'a"b'], 'ok': True, 'none': None},
+        [1e16, 1e-05, -0.0, 2 ** 70],
+        {'when': datetime(2025, 2, 22, tzinfo=timezone.utc), 'amount': Decimal('1.10')},
+        FastRows([{'id': 1, 'speed_knots': 4.2}]),
+    ]:
+        assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+    with pytest.raises(ValueError):
+        FastJSONRenderer().render({'speed': float('nan')})
+
+@pytest.mark.django_db
+def test_async_stats_match_sync_stats(client, token):
+    near = AnemometerFactory(latitude=34.05, longitude=-118.24)
+    far = AnemometerFactory(latitude=40.0, longitude=-100.0)
+    moment = datetime(2025, 2, 22, 14, 30, tzinfo=timezone.utc)
+    for anemometer, speed in [(near, 10.5), (near, 4.0), (far, 30.0)]:
+        WindSpeedReadingFactory(anemometer=anemometer, speed_knots=speed, recorded_at=moment)
+
+    assert client.get('/api/async/stats/', {'latitude': 34.05, 'longitude': -118.24, 'radius': 10}).status_code == 401
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    for params in [
+        {'latitude': 34.05, 'longitude': -118.24, 'radius': 10},
+        {'latitude': 34.05, 'longitude': -118.24, 'radius': 10, 'start': '2025-02-22T00:00:00Z', 'end': '2025-02-22T14:45:00Z'},
+    ]:
+        response = client.get('/api/async/stats/', params)
+        assert response.status_code == 200
+        assert response.json() == {'min': 4.0, 'max': 10.5, 'mean': 7.25}
+        assert response.content == client.get('/api/stats/', params).content
+    assert client.get('/api/async/stats/', {'latitude': 'north'}).status_code == 400
+
+@pytest.mark.django_db
+def test_async_reading_create(client, token):
+    anemometer = AnemometerFactory()
+    payload = {'anemometer': anemometer.id, 'speed_knots': 12.5, 'recorded_at': '2025-02-22T14:30:00Z'}
+    assert client.post('/api/async/readings/', payload, format='json').status_code == 401
+
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    response = client.post('/api/async/readings/', payload, format='json')
+    assert response.status_code == 201
+    reading = WindSpeedReading.objects.get()
+    assert response.json() == {'id': reading.id, 'anemometer': anemometer.id, 'speed_knots': 12.5, 'recorded_at': '2025-02-22T14:30:00Z'}
+    assert ReadingRollup.objects.filter(anemometer=anemometer).count() == 2
+
+    response = client.post('/api/async/readings/', {'anemometer': anemometer.id + 1, 'speed_knots': 'fast'}, format='json')
+    assert response.status_code == 400
+    assert set(response.json()) == {'speed_knots'}
+    response = client.post('/api/async/readings/', {'anemometer': anemometer.id + 1, 'speed_knots': 3.0}, format='json')
+    assert response.json() == {'anemometer': [f'Invalid pk "{anemometer.id + 1}" - object does not exist.']}
+    assert client.get('/api/async/readings/').status_code == 405
+    assert WindSpeedReading.objects.count() == 1
+
+@pytest.mark.django_db(transaction=True)
+def test_asgi_application_closes_connections_after_each_request(monkeypatch):
+    import json
+    from asgiref.sync import async_to_sync
+    from django.core.asgi import get_asgi_application
+    from django.db import connections
+    from windforlife.settings import asgi as asgi_settings
+
+    def post_token():
+        messages = []
+        body = json.dumps({'username': 'nobody', 'password': 'wrong'}).encode()
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+            'scheme': 'http', 'path': '/api/token/', 'raw_path': b'/api/token/', 'query_string': b'',
+            'root_path': '', 'headers': [(b'host', b'testserver'), (b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode())],
+            'client': ('127.0.0.1', 1234), 'server': ('testserver', 80),
+        }
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        async_to_sync(get_asgi_application())(scope, receive, send)
+        return messages[0]['status']
+
+    # The request runs in the thread of the test, so on this connection. Django never
+    # really closes in-memory SQLite databases: record the calls to close instead.
+    closed = []
+    wrapper = connections['default']
+    monkeypatch.setattr(wrapper, 'close', lambda: closed.append(True))
+    monkeypatch.setitem(wrapper.settings_dict, 'CONN_MAX_AGE', 60)
+    wrapper.connect()
+    assert post_token() == 401
+    assert closed == []
+
+    # The maximum age is read when connecting.
+    monkeypatch.setitem(wrapper.settings_dict, 'CONN_MAX_AGE', asgi_settings.DATABASES['default']['CONN_MAX_AGE'])
+    wrapper.connect()
+    assert post_token() == 401
+    assert closed
+
+@pytest.mark.django_db
+def test_reading_buffer_flushes_on_timer_size_and_stop(settings, monkeypatch):
+    from . import buffer
+    flushed = []
+    monkeypatch.setattr(buffer, 'insert_readings', lambda readings: flushed.append(list(readings)))
+    settings.READINGS_BUFFER_DURABILITY = buffer.DURABILITY_ENQUEUE
+    settings.READINGS_BUFFER_FLUSH_INTERVAL_MS = 10
+    settings.READINGS_BUFFER_MAX_ROWS = 3
+    reading_buffer = buffer.ReadingBuffer()
+
+    assert reading_buffer.submit('a') is False
+    for _ in range(200):
+        if flushed:
+            break
+        time.sleep(0.01)
+    assert flushed == [['a']]
+
+    settings.READINGS_BUFFER_FLUSH_INTERVAL_MS = 60000
+    time.sleep(0.05)  # Let the timer pick up the longer interval.
+    assert [reading_buffer.submit(r) for r in 'bcd'] == [False, False, True]
+    assert flushed[1:] == [['b', 'c', 'd']]
+    reading_buffer.submit('e')
+    assert reading_buffer.metrics()['queue_depth'] == 1
+    reading_buffer.stop()
+    assert flushed[2:] == [['e']]
+    metrics = reading_buffer.metrics()
+    assert (metrics['queue_depth'], metrics['flushes'], metrics['flushed_rows'], metrics['failed_rows']) == (0, 3, 5, 0)
+
+@pytest.mark.django_db
+def test_reading_buffer_retries_a_failed_batch_row_by_row(settings, monkeypatch):
+    from . import buffer
+    depths = []
+
+    def insert_readings(readings):
+        depths.append(reading_buffer.metrics()['queue_depth'])
+        if any(reading.speed_knots < 0 for reading in readings):
+            raise ValueError('bad reading')
+
+    monkeypatch.setattr(buffer, 'insert_readings', insert_readings)
+    monkeypatch.setattr(buffer.ReadingBuffer, '_ensure_thread', lambda self: None)
+    settings.READINGS_BUFFER_DURABILITY = buffer.DURABILITY_ENQUEUE
+    settings.READINGS_BUFFER_MAX_ROWS = 3
+    reading_buffer = buffer.ReadingBuffer()
+
+    good, bad = WindSpeedReading(anemometer_id=1, speed_knots=5.0), WindSpeedReading(anemometer_id=2, speed_knots=-1.0)
+    assert [reading_buffer.submit(good), reading_buffer.submit(bad)] == [False, False]
+    # The request completing the batch only fails if its own reading does.
+    settings.READINGS_BUFFER_DURABILITY = buffer.DURABILITY_FLUSH
+    assert reading_buffer.submit(WindSpeedReading(anemometer_id=3, speed_knots=7.0)) is True
+    # The batch being flushed still counts as queued.
+    assert depths == [3, 3, 3, 3]
+    metrics = reading_buffer.metrics()
+    assert (metrics['queue_depth'], metrics['flushed_rows'], metrics['failed_rows']) == (0, 2, 1)
+
+    settings.READINGS_BUFFER_MAX_ROWS = 1
+    with pytest.raises(ValueError):
+        reading_buffer.submit(WindSpeedReading(anemometer_id=2, speed_knots=-2.0))
+    assert reading_buffer.metrics()['failed_rows'] == 2
+
+@pytest.mark.django_db
+def test_buffered_reading_create(client, user, settings, monkeypatch):
+    from . import buffer
+    # Flushed from the test's thread only, which holds the test transaction.
+    monkeypatch.setattr(buffer.ReadingBuffer, '_ensure_thread', lambda self: None)
+    reading_buffer = buffer.ReadingBuffer()
+    monkeypatch.setattr('api.views.reading_buffer', reading_buffer)
+    settings.READINGS_BUFFER_ENABLED = True
+    settings.READINGS_BUFFER_DURABILITY = buffer.DURABILITY_ENQUEUE
+    anemometer = AnemometerFactory()
+    client.force_authenticate(user=user)
+
+    payload = {'anemometer': anemometer.id, 'speed_knots': 12.5, 'recorded_at': '2025-02-22T14:30:00Z'}
+    response = client.post('/api/readings/', payload)
+    assert response.status_code == 202
+    assert response.data['id'] is None
+    assert client.post('/api/readings/', {'anemometer': anemometer.id + 1, 'speed_knots': 1.0}).status_code == 400
+    assert WindSpeedReading.objects.count() == 0
+    assert client.get('/api/readings/buffer/').data['queue_depth'] == 1
+
+    assert reading_buffer.flush() == 1
+    assert WindSpeedReading.objects.get().speed_knots == 12.5
+    assert ReadingRollup.objects.filter(anemometer=anemometer).count() == 2
+
+    settings.READINGS_BUFFER_DURABILITY = buffer.DURABILITY_FLUSH
+    settings.READINGS_BUFFER_MAX_ROWS = 1
+    response = client.post('/api/readings/', {**payload, 'speed_knots': 8.0})
+    assert response.status_code == 201
+    assert response.data['id'] == WindSpeedReading.objects.get(speed_knots=8.0).id
+    assert client.get('/api/readings/buffer/').data['flushed_rows'] == 2
+
+    # Nothing flushes the next batch (no thread): the request gives up with a 503.
+    settings.READINGS_BUFFER_MAX_ROWS = 10
+    settings.READINGS_BUFFER_FLUSH_INTERVAL_MS = 20
+    settings.READINGS_BUFFER_STATEMENT_TIMEOUT_MS = 0
+    response = client.post('/api/readings/', {**payload, 'speed_knots': 9.0})
+    assert response.status_code == 503
+    assert response.data['detail'].code == 'flush_timeout'
+    assert client.get('/api/readings/buffer/').data['timeouts'] == 1
+    # The reading is still queued, and stored by the next flush.
+    assert reading_buffer.flush() == 1
+    assert WindSpeedReading.objects.filter(speed_knots=9.0).exists()
+
+def test_choose_replica_round_robin_and_weighted(settings):
+    from .db_router import WEIGHTED, choose_replica
+    settings.DATABASE_REPLICAS = {}
+    assert choose_replica() is None
+    settings.DATABASE_REPLICAS = {'replica1': 1, 'replica2': 1}
+    picks = [choose_replica() for _ in range(4)]
+    assert sorted(picks) == ['replica1', 'replica1', 'replica2', 'replica2']
+    assert picks[0] != picks[1]
+    settings.DATABASE_REPLICA_SELECTION = WEIGHTED
+    settings.DATABASE_REPLICAS = {'replica1': 3, 'replica2': 0}
+    assert {choose_replica() for _ in range(20)} == {'replica1'}
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+def test_safe_requests_read_from_replica_until_the_client_writes(client, user, settings):
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+    settings.DATABASE_REPLICAS = {'replica': 1}
+    anemometer = AnemometerFactory()
+    client.force_authenticate(user=user)
+
+    def queries(alias, method, *args):
+        with CaptureQueriesContext(connections[alias]) as context:
+            response = getattr(client, method)(*args)
+        assert response.status_code < 400, response.content
+        return len(context)
+
+    assert queries('replica', 'get', f'/api/anemometers/{anemometer.id}/') > 0
+    assert queries('replica', 'get', '/api/stats/', {'latitude': 0, 'longitude': 0, 'radius': 10}) > 0
+    export = client.get('/api/readings/export/')
+    with CaptureQueriesContext(connections['replica']) as context:
+        b''.join(export.streaming_content)
+    assert len(context) > 0
+
+    assert queries('replica', 'post', '/api/readings/', {'anemometer': anemometer.id, 'speed_knots': 4.0}) == 0
+    assert queries('replica', 'get', '/api/readings/') == 0
+    cache.clear()  # The pin expires.
+    assert queries('replica', 'get', '/api/readings/') > 0
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+def test_responses_read_from_a_replica_are_not_cached(client, user, settings):
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+    settings.RESPONSE_CACHE_ENABLED = True
+    settings.DATABASE_REPLICAS = {'replica': 1}
+    anemometer = AnemometerFactory()
+    client.force_authenticate(user=user)
+
+    for _ in range(2):
+        with CaptureQueriesContext(connections['replica']) as context:
+            response = client.get(f'/api/anemometers/{anemometer.id}/')
+        assert response.status_code == 200
+        assert len(context) > 0
+        assert not response.has_header('ETag')
+
+    settings.DATABASE_REPLICAS = {}
+    etag = client.get(f'/api/anemometers/{anemometer.id}/')['ETag']
+    settings.DATABASE_REPLICAS = {'replica': 1}
+    with CaptureQueriesContext(connections['replica']) as context:
+        response = client.get(f'/api/anemometers/{anemometer.id}/')
+    assert response['ETag'] == etag  # Served from the body cached from the primary.
+    assert len(context) == 0
+
+def test_read_replicas_require_a_shared_cache(settings):
+    from django.core.exceptions import ImproperlyConfigured
+    from .checks import check_replica_pin_cache
+    settings.DATABASE_REPLICAS = {'replica': 1}
+    with pytest.raises(ImproperlyConfigured):
+        check_replica_pin_cache()
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379/1'}}
+    check_replica_pin_cache()
+
+@pytest.mark.django_db
+def test_performance_middleware_records_timings_and_queries(client, user, settings):
+    settings.SERVER_TIMING_ENABLED = True
+    settings.METRICS_ENDPOINT_ENABLED = True
+
+    def scrape():
+        samples = {}
+        for line in client.get('/metrics').content.decode().splitlines():
+            if not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                samples[name] = float(value)
+        return samples
+
+    anemometer = AnemometerFactory()
+    client.force_authenticate(user=user)
+    before = scrape()
+
+    response = client.get(f'/api/anemometers/{anemometer.id}/')
+    app, db = response['Server-Timing'].split(', ')
+    assert app.startswith('app;dur=') and db.startswith('db;dur=')
+    queries = int(db.split('desc="')[1].split(' ')[0])
+    assert queries > 0
+    client.post('/api/readings/', {'anemometer': anemometer.id, 'speed_knots': 'fast'})
+    client.get('/nowhere/')
+
+    after = scrape()
+    def delta(name):
+        return after[name] - before.get(name, 0)
+    assert delta('windforlife_http_requests_total{view="windspeedreading-list",method="POST",status="400"}') == 1
+    assert delta('windforlife_http_requests_total{view="unmatched",method="GET",status="404"}') == 1
+    assert delta('windforlife_http_request_duration_seconds_bucket{view="anemometer-detail",method="GET",le="+Inf"}') == 1
+    assert delta('windforlife_http_request_db_queries_sum{view="anemometer-detail",method="GET"}') == queries
+    assert after['windforlife_reading_buffer_queue_depth'] == 0
+
+def test_metrics_endpoint_is_opt_in_and_restricted(client, settings):
+    assert client.get('/metrics').status_code == 404
+    settings.METRICS_ENDPOINT_ENABLED = True
+    assert client.get('/metrics').status_code == 200
+    settings.METRICS_ALLOWED_IPS = ['10.0.0.0/8']
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code == 200
+    settings.METRICS_TOKEN = 'scraper-token'
+    assert client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code == 403
+    assert client.get('/metrics', HTTP_AUTHORIZATION='Bearer scraper-token').status_code == 200
+
+def test_histogram_renders_cumulative_buckets():
+    from .metrics import Histogram, Registry
+    registry = Registry()
+    histogram = registry.register(Histogram('latency_seconds', 'Latency.', (0.1, 1.0), ['view']))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, ('a"b',))
+    assert registry.render() == (
+        '# HELP latency_seconds Latency.\n'
+        '# TYPE latency_seconds histogram\n'
+        'latency_seconds_bucket{view="a\\"b",le="0.1"} 2\n'
+        'latency_seconds_bucket{view="a\\"b",le="1.0"} 3\n'
+        'latency_seconds_bucket{view="a\\"b",le="+Inf"} 4\n'
+        'latency_seconds_sum{view="a\\"b"} 3.65\n'
+        'latency_seconds_count{view="a\\"b"} 4\n'
+    )
+
+def test_background_handler_writes_json_lines(tmp_path):
+    import json
+    import logging
+    from .log import BackgroundHandler, JSONFormatter, SamplingFilter
+    path = tmp_path / 'api.log'
+    handler = BackgroundHandler(filename=str(path))
+    handler.setFormatter(JSONFormatter())
+    logger = logging.getLogger('api.tests.background')
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        logger.info("Reading %s stored", 7, extra={'anemometer': 3})
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.exception("Failed")
+    finally:
+        logger.removeHandler(handler)
+        handler.close()  # Drains the queue.
+
+    first, second = [json.loads(line) for line in path.read_text().splitlines()]
+    assert first['message'] == 'Reading 7 stored' and first['level'] == 'INFO' and first['anemometer'] == 3
+    assert second['logger'] == 'api.tests.background' and 'ZeroDivisionError' in second['exception']
+
+    sampling = SamplingFilter(rate=0.0)
+    assert not sampling.filter(logging.makeLogRecord({'levelno': logging.INFO}))
+    assert sampling.filter(logging.makeLogRecord({'levelno': logging.WARNING}))
+
+def test_background_handler_starts_one_listener_for_concurrent_records(monkeypatch):
+    import logging
+    import os
+    import threading
+    import time
+    from types import SimpleNamespace
+    from . import log
+    def slow_getpid():
+        time.sleep(0.01)  # Leaves every thread time to reach the check.
+        return os.getpid()
+    monkeypatch.setattr(log, 'os', SimpleNamespace(getpid=slow_getpid))
+    handler = log.BackgroundHandler()
+    starts = []
+    monkeypatch.setattr(handler.listener, 'start', lambda: starts.append(threading.get_ident()))
+    barrier = threading.Barrier(8)
+    def emit():
+        barrier.wait()
+        handler.emit(logging.makeLogRecord({'msg': 'Reading stored'}))
+    threads = [threading.Thread(target=emit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(starts) == 1 and handler.queue.qsize() == 8
+
+def test_generated_readings_are_reproducible_across_chunk_sizes():
+    from .factories import generate_readings
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    def generate(seed, chunk_size):
+        chunks = list(generate_readings([1, 2, 3], 50, start, timedelta(minutes=30), seed=seed, chunk_size=chunk_size))
+        return [np.concatenate(arrays) for arrays in zip(*chunks)]
+
+    ids, speeds, moments = generate(7, 1000)
+    assert len(ids) == 150 and set(ids.tolist()) == {1, 2, 3}
+    assert (speeds >= 0).all() and moments.min() >= np.datetime64('2025-01-01T00:00:00')
+    assert all((a == b).all() for a, b in zip(generate(7, 1000), generate(7, 16)))
+    assert not (generate(8, 1000)[1] == speeds).all()
+
+@pytest.mark.django_db
+def test_seed_readings_command_inserts_readings_and_rollups():
+    from io import StringIO
+    out = StringIO()
+    call_command('seed_readings', anemometers=3, readings=200, interval=900, seed=1, chunk_size=250, defer_indexes=True, stdout=out)
+    assert 'Seeded 600 readings for 3 anemometers' in out.getvalue()
+    assert Anemometer.objects.filter(name__startswith='Seeded ').count() == 3
+    assert WindSpeedReading.objects.count() == 600
+
+    # Chunks merged into existing buckets give the same rollups as rebuilding them.
+    call_command('seed_readings', existing=True, readings=10, interval=900, seed=2, start='2025-01-01T00:00:00Z', stdout=out)
+    rollups = set(ReadingRollup.objects.values_list('anemometer_id', 'granularity', 'bucket_start', 'count', 'speed_min', 'speed_max'))
+    call_command('backfill_rollups', stdout=StringIO())
+    assert set(ReadingRollup.objects.values_list('anemometer_id', 'granularity', 'bucket_start', 'count', 'speed_min', 'speed_max')) == rollups
+    raw = WindSpeedReading.objects.aggregate(count=Count('id'), total=Sum('speed_knots'))
+    stats = aggregate_readings(Q())
+    assert stats.count == raw['count'] == 630 and stats.total == pytest.approx(raw['total'])
+
+@pytest.mark.django_db
+def test_create_anemometers_numbers_after_the_largest_existing_name():
+    from .factories import create_anemometers
+    first = create_anemometers(3, seed=1)
+    AnemometerFactory(name='Seeded North')
+    first[0].delete()
+    assert [a.name for a in create_anemometers(2, seed=2)] == ['Seeded 3', 'Seeded 4']
+    assert [a.name for a in create_anemometers(1, seed=3, prefix='Other')] == ['Other 0']
+
+@pytest.mark.django_db
+def test_cached_jwt_authentication_skips_user_query(client, user, token, settings):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    settings.JWT_USER_LOOKUP = 'cached'
+    anemometer = AnemometerFactory()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    def user_queries():
+        with CaptureQueriesContext(connection) as context:
+            response = client.post('/api/readings/', {'anemometer': anemometer.id, 'speed_knots': 5.0})
+        return response.status_code, sum('auth_user' in query['sql'] for query in context.captured_queries)
+
+    assert user_queries() == (201, 1)
+    assert user_queries() == (201, 0)
+    user.is_active = False
+    user.save()  # Evicts the cached user.
+    assert user_queries() == (401, 1)
+
+    settings.JWT_USER_LOOKUP = 'claims'
+    assert user_queries() == (201, 0)  # Trusted until the token expires.
+    settings.JWT_USER_LOOKUP = 'database'
+    assert user_queries() == (401, 1)
+
+def test_user_cache_is_bounded_and_expires(settings, monkeypatch):
+    from .authentication import TTLCache
+    settings.JWT_USER_CACHE_SIZE = 2
+    settings.JWT_USER_CACHE_TTL = 10
+    now = [100.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    users = TTLCache('JWT_USER_CACHE_SIZE', 'JWT_USER_CACHE_TTL')
+    users.set(1, 'a')
+    users.set(2, 'b')
+    assert users.get(1) == 'a'  # Now the most recently used.
+    users.set(3, 'c')
+    assert (users.get(1), users.get(2), users.get(3)) == ('a', None, 'c')
+    now[0] += 10
+    assert users.get(1) is None and len(users) == 1
+
+@pytest.mark.django_db
+def test_device_key_posts_readings_for_its_anemometer_only(client):
+    from io import StringIO
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from .models import DeviceCredential
+    anemometer, other = AnemometerFactory(), AnemometerFactory()
+    out = StringIO()
+    call_command('create_device_key', anemometer.id, name='gateway-1', stdout=out, stderr=StringIO())
+    key = out.getvalue().strip()
+    credential = DeviceCredential.objects.get()
+    assert credential.key_hash == DeviceCredential.hash_key(key) and key.startswith(credential.prefix)
+
+    client.credentials(HTTP_AUTHORIZATION=f'Device {key}')
+    assert client.post('/api/readings/', {'speed_knots': 7.5}).status_code == 201
+    with CaptureQueriesContext(connection) as context:
+        response = client.post('/api/readings/', {'anemometer': anemometer.id, 'speed_knots': 8.0}, format='json')
+    assert response.status_code == 201 and response.data['anemometer'] == anemometer.id
+    # Neither the credential nor the anemometer is looked up again.
+    assert not [q for q in context.captured_queries if 'api_devicecredential' in q['sql'] or 'FROM "api_anemometer"' in q['sql']]
+    bulk = client.post('/api/readings/bulk/', [{'speed_knots': 1.0}, {'anemometer': anemometer.id, 'speed_knots': 2.0}], format='json')
+    assert bulk.status_code == 201 and bulk.data['created'] == 2
+    assert WindSpeedReading.objects.filter(anemometer=anemometer).count() == 4
+
+    assert client.post('/api/readings/', {'anemometer': other.id, 'speed_knots': 1.0}).status_code == 403
+    bulk = client.post('/api/readings/bulk/', [{'speed_knots': 3.0}, {'anemometer': other.id, 'speed_knots': 4.0}], format='json')
+    assert bulk.status_code == 207 and bulk.data['created'] == 1
+    assert [(error['index'], list(error['errors'])) for error in bulk.data['errors']] == [(1, ['anemometer'])]
+    assert not WindSpeedReading.objects.filter(anemometer=other).exists()
+    assert client.get('/api/readings/').status_code == 403
+    assert client.get('/api/anemometers/').status_code == 401
+    credential.is_active = False
+    credential.save()  # Evicts the cached credential.
+    assert client.post('/api/readings/', {'speed_knots': 7.5}).status_code == 401
+    client.credentials(HTTP_AUTHORIZATION='Device not-a-key')
+    assert client.post('/api/readings/', {'speed_knots': 7.5}).status_code == 401
+
+@pytest.mark.django_db(transaction=True)
+def test_device_key_of_a_deleted_anemometer_is_rejected(client):
+    from .models import DeviceCredential
+    credential, key = DeviceCredential.issue(AnemometerFactory())
+    client.credentials(HTTP_AUTHORIZATION=f'Device {key}')
+    assert client.post('/api/readings/', {'speed_knots': 7.5}).status_code == 201
+    credential.anemometer.delete()
+    # Still cached, as in a worker that did not see the deletion.
+    credential_cache.set(credential.key_hash, credential)
+
+    assert client.post('/api/readings/', {'speed_knots': 7.5}).status_code == 401
+    assert credential_cache.get(credential.key_hash) is None
+    assert client.post('/api/readings/', {'speed_knots': 7.5}).status_code == 401
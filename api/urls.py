@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from .async_views import AsyncWindSpeedReadingCreateView, AsyncWindSpeedStatsView
 from .views import AnemometerViewSet, WindSpeedReadingViewSet, WindSpeedStatsView
 
 
@@ -11,6 +12,8 @@ router.register(r'readings', WindSpeedReadingViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('stats/', WindSpeedStatsView.as_view(), name='stats'),
+    path('async/stats/', AsyncWindSpeedStatsView.as_view(), name='async-stats'),
+    path('async/readings/', AsyncWindSpeedReadingCreateView.as_view(), name='async-reading-create'),
     
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
@@ -0,0 +1,13 @@
+"""
+Small helpers shared by the API modules.
+"""
+from datetime import timezone as dt_timezone
+
+from django.utils import timezone
+
+
+def as_utc(moment):
+    """`moment` as an aware UTC datetime; naive ones are taken in the current time zone."""
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment.astimezone(dt_timezone.utc)
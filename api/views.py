@@ -1,19 +1,47 @@
 import logging
-from rest_framework import viewsets, filters
+from functools import partial
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.response import Response
-from geopy.distance import geodesic
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Q
+from django.http import StreamingHttpResponse
 
-from .models import Anemometer, WindSpeedReading
+from .buffer import reading_buffer
+from .cache import cached_response
+from .db_router import ReplicaReadMixin
+from .devices import DeviceKeyAuthentication, DeviceScope, scoped_reading, scoped_row, stale_credential
+from .models import Anemometer, DeviceCredential, WindSpeedReading
 from .serializers import (
     AnemometerSerializer,
+    BulkReadingsResultSerializer,
+    ReadingBufferMetricsSerializer,
+    ReadingExportQuerySerializer,
+    ReadingSeriesQuerySerializer,
+    ReadingSeriesSerializer,
     WindSpeedReadingSerializer,
     WindSpeedStatsSerializer,
+    fast_reading_serializer,
 )
 from .filters import AnemometerFilter
+from .geo import StationArray
+from .pagination import AnemometerKeysetPagination, ReadingKeysetPagination, SelectablePaginationMixin
+from .export import EXPORT_FORMATS, export_queryset, stream_readings
+from .ingest import ReadingRowSerializer, copy_readings, insert_readings, validate_readings
+from .parsers import NDJSONParser
+from .rollups import aggregate_readings
+from .search import NameSearchFilter
+from .series import downsample, reading_series
+from .spatial import anemometer_index
 
 logger = logging.getLogger("api")
 
@@ -22,13 +50,58 @@ logger = logging.getLogger("api")
 
 
 @extend_schema(tags=['Anemometers'])
-class AnemometerViewSet(viewsets.ModelViewSet):
-    queryset = Anemometer.objects.prefetch_related('readings')
+class AnemometerViewSet(ReplicaReadMixin, SelectablePaginationMixin, viewsets.ModelViewSet):
+    queryset = Anemometer.objects.all()
+    keyset_pagination_class = AnemometerKeysetPagination
     serializer_class = AnemometerSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, NameSearchFilter]
     filterset_class = AnemometerFilter
-    search_fields = ['name']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = AnemometerSerializer.setup_eager_loading(queryset)
+        return queryset
+
+    @cached_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cached_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @extend_schema(
+        parameters=[ReadingSeriesQuerySerializer],
+        responses={200: ReadingSeriesSerializer},
+    )
+    @action(detail=True, methods=['get'], url_path='series')
+    @cached_response
+    def series(self, request, pk=None):
+        """Min/max/mean/count of the anemometer's readings per time bucket."""
+        anemometer = self.get_object()
+        serializer = ReadingSeriesQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        bucket = serializer.validated_data['bucket']
+        start, end = serializer.validated_data['start'], serializer.validated_data['end']
+
+        points = reading_series(anemometer.pk, bucket, start, end)
+        max_points = serializer.validated_data.get('max_points')
+        total = len(points)
+        if max_points is not None:
+            points = downsample(points, max_points)
+        return Response(ReadingSeriesSerializer({
+            'anemometer': anemometer.pk,
+            'bucket': bucket,
+            'start': start,
+            'end': end,
+            'downsampled': len(points) < total,
+            'points': [
+                {'start': moment, 'count': stats.count, 'min': stats.minimum, 'max': stats.maximum, 'mean': stats.mean}
+                for moment, stats in points
+            ],
+        }).data)
 
     def create(self, request, *args, **kwargs):
         logger.info("Creating a new anemometer.")
@@ -50,22 +123,130 @@ class AnemometerViewSet(viewsets.ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
 @extend_schema(tags=['Wind Speed Readings'])
-class WindSpeedReadingViewSet(viewsets.ModelViewSet):
+class WindSpeedReadingViewSet(ReplicaReadMixin, SelectablePaginationMixin, viewsets.ModelViewSet):
     queryset = WindSpeedReading.objects.all()
+    keyset_pagination_class = ReadingKeysetPagination
     serializer_class = WindSpeedReadingSerializer
-    permission_classes = [IsAuthenticated]
+    authentication_classes = [*api_settings.DEFAULT_AUTHENTICATION_CLASSES, DeviceKeyAuthentication]
+    permission_classes = [IsAuthenticated, DeviceScope]
+    device_actions = ('create', 'bulk')
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['anemometer']
 
+    def list(self, request, *args, **kwargs):
+        if not settings.FAST_SERIALIZERS_ENABLED:
+            return super().list(request, *args, **kwargs)
+        # Same output as the ModelSerializer, built from values() rows.
+        queryset = self.filter_queryset(self.get_queryset()).values(*fast_reading_serializer.attnames)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast_reading_serializer.serialize(page))
+        return Response(fast_reading_serializer.serialize(queryset))
+
     def create(self, request, *args, **kwargs):
         logger.info("Creating a new wind speed reading.")
+        if isinstance(request.auth, DeviceCredential):
+            # The key's anemometer exists: validate without looking it up.
+            serializer = ReadingRowSerializer(data=scoped_reading(request.auth, request.data))
+            serializer.is_valid(raise_exception=True)
+            data = dict(serializer.validated_data)
+            reading = WindSpeedReading(anemometer_id=data.pop('anemometer'), **data)
+        elif not settings.READINGS_BUFFER_ENABLED:
+            return super().create(request, *args, **kwargs)
+        else:
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            reading = WindSpeedReading(**serializer.validated_data)
 
-        response = super().create(request, *args, **kwargs)
+        try:
+            if not settings.READINGS_BUFFER_ENABLED:
+                reading.save()
+                return Response(self.get_serializer(reading).data, status=status.HTTP_201_CREATED)
+            stored = reading_buffer.submit(reading)
+        except IntegrityError as exc:
+            if isinstance(request.auth, DeviceCredential):
+                raise stale_credential(request.auth) from exc
+            raise
+        # Queued readings have no id yet.
+        return Response(
+            self.get_serializer(reading).data,
+            status=status.HTTP_201_CREATED if stored else status.HTTP_202_ACCEPTED,
+        )
+
+    @extend_schema(responses={200: ReadingBufferMetricsSerializer})
+    @action(detail=False, methods=['get'], url_path='buffer')
+    def buffer(self, request):
+        """Queue depth and flush latency of this worker's write-behind buffer."""
+        return Response(ReadingBufferMetricsSerializer(reading_buffer.metrics()).data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='mode', required=False, type=str, enum=['insert', 'copy'],
+                description="'copy' streams rows with PostgreSQL COPY (batched executemany elsewhere).",
+            ),
+        ],
+        request=WindSpeedReadingSerializer(many=True),
+        responses={201: BulkReadingsResultSerializer, 207: BulkReadingsResultSerializer, 400: BulkReadingsResultSerializer},
+    )
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """Create many readings from a JSON array or NDJSON body, reporting per-row errors."""
+        rows = request.data
+        mode = request.query_params.get('mode', 'insert')
+        if mode not in ('insert', 'copy'):
+            raise ValidationError({'mode': [f'"{mode}" is not a valid choice.']})
+        if not isinstance(rows, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of readings.']})
+        max_rows = settings.READINGS_BULK_MAX_ROWS
+        if len(rows) > max_rows:
+            raise ValidationError({'non_field_errors': [f'Ensure this request has no more than {max_rows} readings.']})
+        scope = partial(scoped_row, request.auth) if isinstance(request.auth, DeviceCredential) else None
+
+        logger.info("Creating %d wind speed readings in bulk.", len(rows))
+        readings, errors = validate_readings(rows, scope)
+        created = copy_readings(readings) if mode == 'copy' else insert_readings(readings)
+
+        if not errors:
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({'created': created, 'errors': errors}, status=response_status)
+
+    @extend_schema(
+        parameters=[ReadingExportQuerySerializer],
+        responses={(200, 'text/csv'): OpenApiTypes.STR, (200, 'application/x-ndjson'): OpenApiTypes.STR},
+    )
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """Stream readings as CSV or NDJSON, optionally gzipped, in constant memory."""
+        serializer = ReadingExportQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        queryset = export_queryset(params.get('anemometer'), params.get('start'), params.get('end'))
+        # Streamed after the view returns: bind the database routed to now.
+        queryset = queryset.using(queryset.db)
 
+        logger.info("Exporting wind speed readings as %s.", params['output'])
+        content_type, extension = EXPORT_FORMATS[params['output']]
+        filename = f'readings.{extension}'
+        if params['gzip']:
+            content_type, filename = 'application/gzip', f'{filename}.gz'
+        response = StreamingHttpResponse(
+            stream_readings(queryset, params['output'], settings.READINGS_EXPORT_CHUNK_SIZE, compress=params['gzip']),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
 
+    def perform_content_negotiation(self, request, force=False):
+        # Exports are not rendered: let `Accept: text/csv` through, errors fall back to JSON.
+        return super().perform_content_negotiation(request, force=force or self.action == 'export')
+
 @extend_schema(tags=['Wind Speed Stats'], responses={200: WindSpeedReadingSerializer})
-class WindSpeedStatsView(APIView):
+class WindSpeedStatsView(ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     @extend_schema(
@@ -73,10 +254,13 @@ class WindSpeedStatsView(APIView):
         parameters=[
             OpenApiParameter(name='latitude', description='Latitude of the central point', required=True, type=float),
             OpenApiParameter(name='longitude', description='Longitude of the central point', required=True, type=float),
-            OpenApiParameter(name='radius', description='Search radius in nautical miles', required=True, type=float)
+            OpenApiParameter(name='radius', description='Search radius in nautical miles', required=True, type=float),
+            OpenApiParameter(name='start', description='Only include readings recorded at or after this time', required=False, type=OpenApiTypes.DATETIME),
+            OpenApiParameter(name='end', description='Only include readings recorded before this time', required=False, type=OpenApiTypes.DATETIME),
         ],
         responses={200: dict},
     )
+    @cached_response
     def get(self, request):
         logger.info("Processing wind speed stats request.")
         serializer = WindSpeedStatsSerializer(data=request.query_params)
@@ -85,14 +269,36 @@ class WindSpeedStatsView(APIView):
         longitude = serializer.validated_data['longitude']
         radius = serializer.validated_data['radius']
         
-        readings = WindSpeedReading.objects.all()
-        filtered_readings = [r for r in readings if geodesic((latitude, longitude), (r.anemometer.latitude, r.anemometer.longitude)).nautical <= radius]
-        speeds = [r.speed_knots for r in filtered_readings]
-        
+        # Stations near the radius are re-measured on the WGS-84 ellipsoid, so the station
+        # set matches geopy's geodesic; the SQL mean may only differ from a Python sum by
+        # float rounding (~1e-12).
+        if settings.SPATIAL_INDEX_ENABLED:
+            inside, outside = anemometer_index.partition(latitude, longitude, radius)
+            scope = Q(anemometer_id__in=inside) if outside is None else ~Q(anemometer_id__in=outside)
+        else:
+            scope = self._bounding_box_scope(latitude, longitude, radius)
+        # Time bounds only scan the readings partitions of their range for the sub-hour edges.
+        stats = aggregate_readings(scope, serializer.validated_data.get('start'), serializer.validated_data.get('end'))
+
         response_data = {
-            'min': min(speeds, default=0),
-            'max': max(speeds, default=0),
-            'mean': sum(speeds) / len(speeds) if speeds else 0
+            'min': stats.minimum if stats.minimum is not None else 0,
+            'max': stats.maximum if stats.maximum is not None else 0,
+            'mean': stats.mean,
         }
-        logger.debug(f"Wind speed stats calculated: {response_data}")
+        logger.debug("Wind speed stats calculated: %s", response_data)
         return Response(response_data)
+
+    @staticmethod
+    def _bounding_box_scope(latitude, longitude, radius):
+        """Database-only station lookup, used when the in-process spatial index is disabled."""
+        candidates = Anemometer.objects.within_bounding_box(latitude, longitude, radius)
+        stations = StationArray.from_rows(candidates.values_list('id', 'latitude', 'longitude'))
+        mask = stations.within_radius(latitude, longitude, radius)
+        inside = stations.ids[mask].tolist()
+        outside = stations.ids[~mask].tolist()
+
+        # Keep the IN list short: for wide radii most candidates match, so filter on the
+        # bounding box subquery and exclude the few corners that fall outside the circle.
+        if len(outside) < len(inside):
+            return Q(anemometer_id__in=candidates.values('id')) & ~Q(anemometer_id__in=outside)
+        return Q(anemometer_id__in=inside)
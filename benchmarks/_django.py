@@ -0,0 +1,37 @@
+"""
+Django bootstrap shared by the benchmarks.
+
+`test_database()` configures Django (dev settings unless DJANGO_SETTINGS_MODULE
+is set) and yields inside a throwaway, fully migrated test database, exactly
+like the test runner does, so benchmarks never touch real data.
+"""
+import logging
+import os
+from contextlib import contextmanager
+
+import django
+
+
+def setup():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'windforlife.settings.dev')
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret-key')
+    django.setup()
+
+
+@contextmanager
+def test_database(quiet_logging=True):
+    setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    if quiet_logging:
+        logging.disable(logging.INFO)
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        logging.disable(logging.NOTSET)
@@ -0,0 +1,72 @@
+"""
+Queries and latency per reading POST under each JWT user lookup mode and with
+a device API key.
+
+Run from the project root:
+
+    python -m benchmarks.bench_auth --requests 2000
+
+Posts readings to `/api/readings/` with a real access token through the test
+client, with `JWT_USER_LOOKUP` set to 'database' (simplejwt's lookup on every
+request), 'cached' (in-process LRU) and 'claims' (no lookup), then with
+`Authorization: Device <key>`, which also skips the anemometer lookup.
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks._django import test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    with test_database() as connection:
+        from django.conf import settings
+        from rest_framework.test import APIClient
+
+        from api.authentication import user_cache
+        from api.factories import AnemometerFactory, UserFactory
+        from api.models import DeviceCredential
+
+        user = UserFactory(password='benchmark-password')
+        user.save()
+        anemometer = AnemometerFactory()
+        client = APIClient()
+        token = client.post('/api/token/', {'username': user.username, 'password': 'benchmark-password'}).data['access']
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        body = {'anemometer': anemometer.pk, 'speed_knots': 12.5}
+        _, device_key = DeviceCredential.issue(anemometer)
+
+        for lookup in ('database', 'cached', 'claims', 'device'):
+            if lookup == 'device':
+                client.credentials(HTTP_AUTHORIZATION=f'Device {device_key}')
+            else:
+                settings.JWT_USER_LOOKUP = lookup
+            user_cache.clear()
+            client.post('/api/readings/', body, format='json')  # Warm up (and fill the cache).
+            latencies = []
+            queries = {'all': 0, 'user': 0}
+
+            def count(execute, sql, params, many, context):
+                queries['all'] += 1
+                queries['user'] += 'auth_user' in sql
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count):
+                for _ in range(args.requests):
+                    start = time.perf_counter()
+                    response = client.post('/api/readings/', body, format='json')
+                    latencies.append(time.perf_counter() - start)
+            assert response.status_code == 201, response.content
+            print(
+                f"{lookup:<9} {queries['all'] / args.requests:>5.2f} queries/request "
+                f"({queries['user'] / args.requests:.2f} user)  "
+                f"mean {statistics.fmean(latencies) * 1000:>6.3f} ms  p50 {statistics.median(latencies) * 1000:>6.3f} ms"
+            )
+
+
+if __name__ == '__main__':
+    main()
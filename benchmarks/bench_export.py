@@ -0,0 +1,68 @@
+"""
+Readings export: throughput and peak Python memory as the export grows.
+
+Run from the project root (SQLite with the dev settings, PostgreSQL with
+DJANGO_SETTINGS_MODULE=windforlife.settings.prod):
+
+    python -m benchmarks.bench_export --sizes 10000 100000 1000000
+
+Peak memory is traced with `tracemalloc` during a second pass over the
+stream; it should stay flat across sizes.
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from benchmarks._django import test_database
+
+
+def grow(anemometer, target, batch_size):
+    from api.models import WindSpeedReading
+
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    current = WindSpeedReading.objects.count()
+    for offset in range(current, target, batch_size):
+        WindSpeedReading.objects.bulk_create(
+            WindSpeedReading(anemometer=anemometer, speed_knots=(i % 600) / 10, recorded_at=start + timedelta(seconds=10 * i))
+            for i in range(offset, min(offset + batch_size, target))
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 500000])
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    with test_database() as connection:
+        from api.export import export_queryset, stream_readings
+        from api.models import Anemometer
+
+        anemometer = Anemometer.objects.create(name='Bench', latitude=0.0, longitude=0.0)
+        print(f"database: {connection.vendor}")
+        for size in args.sizes:
+            # Rollups are irrelevant to the export: insert raw rows only.
+            grow(anemometer, size, args.batch_size)
+            for data_format, compress in (('csv', False), ('ndjson', False), ('csv', True)):
+                def run():
+                    return sum(len(chunk) for chunk in stream_readings(export_queryset(), data_format, args.chunk_size, compress))
+
+                start = time.perf_counter()
+                written = run()
+                elapsed = time.perf_counter() - start
+                # Traced separately: tracemalloc slows allocations down several times.
+                tracemalloc.start()
+                run()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                label = f"{data_format}{'.gz' if compress else ''}"
+                print(
+                    f"{size:>9} rows {label:<8} {elapsed:>8.2f}s {size / elapsed:>10.0f} rows/s "
+                    f"{written / 2 ** 20:>9.1f} MiB out, peak {peak / 2 ** 20:>6.2f} MiB"
+                )
+
+
+if __name__ == '__main__':
+    main()
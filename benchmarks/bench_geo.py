@@ -0,0 +1,68 @@
+"""
+Micro-benchmark: per-row geopy `geodesic` loop vs the vectorized `api.geo` engine.
+
+Run from the project root:
+
+    python -m benchmarks.bench_geo
+    python -m benchmarks.bench_geo --sizes 1000 100000 1000000 --geopy-limit 100000
+
+The geopy loop is measured on at most `--geopy-limit` stations and extrapolated
+linearly beyond that, since it needs minutes per million rows.
+"""
+import argparse
+import time
+
+import numpy as np
+from geopy.distance import geodesic
+
+from api.geo import StationArray
+
+CENTER = (34.0522, -118.2437)
+RADIUS_NM = 120.0
+
+
+def make_stations(size, seed):
+    rng = np.random.default_rng(seed)
+    latitudes = CENTER[0] + rng.uniform(-5, 5, size)
+    longitudes = CENTER[1] + rng.uniform(-5, 5, size)
+    return StationArray(np.arange(size), latitudes, longitudes)
+
+
+def bench_geopy(stations, limit):
+    count = min(len(stations), limit)
+    points = list(zip(stations.latitudes[:count].tolist(), stations.longitudes[:count].tolist()))
+    start = time.perf_counter()
+    matches = sum(1 for point in points if geodesic(CENTER, point).nautical <= RADIUS_NM)
+    elapsed = time.perf_counter() - start
+    return elapsed * len(stations) / count, count < len(stations), matches
+
+
+def bench_vectorized(stations, refine):
+    start = time.perf_counter()
+    mask = stations.within_radius(CENTER[0], CENTER[1], RADIUS_NM, refine=refine)
+    return time.perf_counter() - start, int(mask.sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--geopy-limit', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'stations':>10} {'geopy loop':>14} {'haversine':>12} {'+vincenty':>12} {'speedup':>9}")
+    for size in args.sizes:
+        stations = make_stations(size, args.seed)
+        geopy_s, extrapolated, _ = bench_geopy(stations, args.geopy_limit)
+        haversine_s, _ = bench_vectorized(stations, refine=False)
+        refined_s, _ = bench_vectorized(stations, refine=True)
+        marker = '*' if extrapolated else ' '
+        print(
+            f"{size:>10} {geopy_s:>13.3f}s{marker} {haversine_s:>11.4f}s {refined_s:>11.4f}s "
+            f"{geopy_s / refined_s:>8.0f}x"
+        )
+    print("* extrapolated from --geopy-limit stations")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Ingest throughput: one POST /api/readings/ per row vs the bulk and COPY paths.
+
+Run from the project root (SQLite with the dev settings, PostgreSQL with
+DJANGO_SETTINGS_MODULE=windforlife.settings.prod):
+
+    python -m benchmarks.bench_ingest --rows 20000 --request-rows 2000
+
+The per-request path is measured on `--request-rows` rows (it is orders of
+magnitude slower); every path reports rows/sec.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks._django import test_database
+
+
+def make_rows(anemometer_ids, count, seed):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            'anemometer': rng.choice(anemometer_ids),
+            'speed_knots': round(rng.uniform(0, 60), 1),
+            'recorded_at': (start + timedelta(seconds=30 * i)).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+def timed(label, rows, run):
+    start = time.perf_counter()
+    run(rows)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {len(rows):>8} rows {elapsed:>9.3f}s {len(rows) / elapsed:>12.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--request-rows', type=int, default=2000)
+    parser.add_argument('--anemometers', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with test_database() as connection:
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+
+        from api.ingest import copy_readings, insert_readings, validate_readings
+        from api.models import Anemometer
+
+        anemometers = Anemometer.objects.bulk_create(
+            Anemometer(name=f'Bench {i}', latitude=0.0, longitude=0.0) for i in range(args.anemometers)
+        )
+        ids = [a.pk for a in anemometers]
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='bench'))
+
+        def per_request(rows):
+            for row in rows:
+                assert client.post('/api/readings/', row, format='json').status_code == 201
+
+        def bulk(rows):
+            readings, errors = validate_readings(rows)
+            insert_readings(readings)
+
+        def copy(rows):
+            readings, errors = validate_readings(rows)
+            copy_readings(readings)
+
+        print(f"database: {connection.vendor}")
+        timed("POST /api/readings/ per row", make_rows(ids, args.request_rows, args.seed), per_request)
+        timed("bulk_create (bulk endpoint)", make_rows(ids, args.rows, args.seed + 1), bulk)
+        label = "COPY FROM STDIN" if connection.vendor == 'postgresql' else "executemany (COPY fallback)"
+        timed(label, make_rows(ids, args.rows, args.seed + 2), copy)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Request latency under the development logging config and the production profile.
+
+Run from the project root:
+
+    python -m benchmarks.bench_logging --requests 2000
+
+Alternates `GET /api/stats/` and `POST /api/readings/` (both log on every
+request) through the test client, first with the synchronous file + console
+handlers at DEBUG of `windforlife/settings/base.py` (what production used to
+run), then with the background JSON handler at INFO of `prod.py`. Console
+output goes to /dev/null and the log file to a temporary directory. With
+`--debug`, `django.db.backends` logs every SQL statement at DEBUG, which the
+production profile filters out.
+"""
+import argparse
+import contextlib
+import copy
+import logging
+import logging.config
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks._django import test_database
+
+
+def prod_logging():
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret-key')
+    logging.disable(logging.INFO)  # django-environ logs every variable it reads.
+    try:
+        from windforlife.settings import prod
+    finally:
+        logging.disable(logging.NOTSET)
+    return copy.deepcopy(prod.LOGGING)
+
+
+def measure(client, anemometer, count):
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        if i % 2:
+            client.post('/api/readings/', {'anemometer': anemometer.pk, 'speed_knots': 12.5}, format='json')
+        else:
+            client.get('/api/stats/', {'latitude': 0.0, 'longitude': 0.0, 'radius': 100})
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--debug', action='store_true', help='run with DEBUG=True, which logs every SQL statement')
+    args = parser.parse_args()
+
+    with test_database(quiet_logging=False), tempfile.TemporaryDirectory() as directory:
+        from django.conf import settings
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+
+        from api.models import Anemometer
+
+        settings.RESPONSE_CACHE_ENABLED = False
+        settings.DEBUG = args.debug
+        anemometer = Anemometer.objects.create(name='Bench', latitude=0.0, longitude=0.0)
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user('bench'))
+
+        development = copy.deepcopy(settings.LOGGING)
+        development['handlers']['file']['filename'] = os.path.join(directory, 'debug.log')
+
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            production = prod_logging()
+            production['handlers']['background']['filename'] = os.path.join(directory, 'api.log')
+            results = {}
+            for label, config in (('development (sync, DEBUG)', development), ('production (background JSON, INFO)', production)):
+                logging.config.dictConfig(config)
+                measure(client, anemometer, 50)  # Warm up.
+                results[label] = measure(client, anemometer, args.requests)
+                logging.shutdown()
+        for label, latencies in results.items():
+            print(
+                f"{label:<36} mean {statistics.fmean(latencies) * 1000:>7.3f} ms  "
+                f"p50 {statistics.median(latencies) * 1000:>7.3f} ms  "
+                f"p99 {statistics.quantiles(latencies, n=100)[98] * 1000:>7.3f} ms"
+            )
+        for name in sorted(os.listdir(directory)):
+            print(f"{name}: {os.path.getsize(os.path.join(directory, name)) / 1024:.0f} KiB written")
+
+
+if __name__ == '__main__':
+    main()
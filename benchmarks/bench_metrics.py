@@ -0,0 +1,60 @@
+"""
+Overhead of the performance instrumentation: per request and per query.
+
+Run from the project root:
+
+    python -m benchmarks.bench_metrics --requests 20000 --queries 20000
+
+Times `PerformanceMiddleware` (with the Server-Timing header) around a view
+returning a fixed response against the bare view, and a cheap query with and without the `execute_wrapper` timer.
+"""
+import argparse
+import time
+
+from benchmarks._django import test_database
+
+
+def per_call(run, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        run()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=20000)
+    args = parser.parse_args()
+
+    with test_database() as connection:
+        from django.conf import settings
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from django.urls import resolve
+
+        from api.middleware import PerformanceMiddleware, QueryTimer
+        from api.models import Anemometer
+
+        request = RequestFactory().get('/api/stats/')
+        request.resolver_match = resolve('/api/stats/')
+        body = b'{"min":0,"max":0,"mean":0}'
+
+        def view(request):
+            return HttpResponse(body, content_type='application/json')
+
+        settings.SERVER_TIMING_ENABLED = True
+        bare = per_call(lambda: view(request), args.requests)
+        middleware = PerformanceMiddleware(view)
+        instrumented = per_call(lambda: middleware(request), args.requests)
+        print(f"request: bare {bare:>7.2f} µs, instrumented {instrumented:>7.2f} µs, overhead {instrumented - bare:>6.2f} µs")
+
+        query = Anemometer.objects.filter(pk=1)
+        bare = per_call(query.exists, args.queries)
+        with connection.execute_wrapper(QueryTimer()):
+            timed = per_call(query.exists, args.queries)
+        print(f"query:   bare {bare:>7.2f} µs, instrumented {timed:>7.2f} µs, overhead {timed - bare:>6.2f} µs")
+
+
+if __name__ == '__main__':
+    main()
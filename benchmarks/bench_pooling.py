@@ -0,0 +1,112 @@
+"""
+Reading creation throughput with and without persistent or pooled connections.
+
+Meaningful on PostgreSQL, where opening a connection costs a TCP (and TLS)
+handshake and authentication; point the prod settings at a scratch server:
+
+    DJANGO_SETTINGS_MODULE=windforlife.settings.prod python -m benchmarks.bench_pooling --requests 2000
+
+`POST /api/readings/` requests go through the full WSGI handler, whose
+request_started/request_finished signals open and close connections like in a
+gunicorn worker, without the HTTP overhead. Modes:
+
+- `new`: a connection per request (`CONN_MAX_AGE=0`, Django's default)
+- `persistent`: `CONN_MAX_AGE=600` with `CONN_HEALTH_CHECKS`
+- `pool`: psycopg 3 pool (`OPTIONS['pool']`, Django 5.1+ with psycopg 3 only)
+
+SQLite keeps the in-memory test database open whatever the settings: all
+modes measure the same there.
+"""
+import argparse
+import io
+import json
+import time
+
+from benchmarks._django import test_database
+
+MODES = ('new', 'persistent', 'pool')
+
+
+def configure(connection, mode):
+    """Apply `mode` to the connection settings, starting from a closed connection."""
+    if hasattr(connection, 'close_pool'):
+        connection.close_pool()
+    connection.close()
+    options = connection.settings_dict.setdefault('OPTIONS', {})
+    options.pop('pool', None)
+    connection.settings_dict['CONN_MAX_AGE'] = 600 if mode == 'persistent' else 0
+    connection.settings_dict['CONN_HEALTH_CHECKS'] = mode == 'persistent'
+    if mode == 'pool':
+        options['pool'] = {'min_size': 1, 'max_size': 4}
+
+
+def pool_unavailable(connection):
+    if connection.vendor != 'postgresql':
+        return 'PostgreSQL only'
+    if not hasattr(connection, 'close_pool'):
+        return 'needs Django 5.1+'
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    if not is_psycopg3:
+        return 'needs psycopg 3'
+    try:
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        return 'needs psycopg_pool'
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    args = parser.parse_args()
+
+    with test_database() as connection:
+        from django.contrib.auth.models import User
+        from django.core.handlers.wsgi import WSGIHandler
+        from django.test import RequestFactory
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        from api.models import Anemometer
+
+        anemometer = Anemometer.objects.create(name='Bench', latitude=0.0, longitude=0.0)
+        user = User.objects.create_user('bench')
+        authorization = f'Bearer {RefreshToken.for_user(user).access_token}'
+        body = json.dumps({'anemometer': anemometer.pk, 'speed_knots': 12.5}).encode()
+        base_environ = RequestFactory()._base_environ()
+        handler = WSGIHandler()
+
+        def post():
+            environ = {
+                **base_environ,
+                'REQUEST_METHOD': 'POST',
+                'PATH_INFO': '/api/readings/',
+                'CONTENT_TYPE': 'application/json',
+                'CONTENT_LENGTH': str(len(body)),
+                'HTTP_AUTHORIZATION': authorization,
+                'wsgi.input': io.BytesIO(body),
+            }
+            statuses = []
+            response = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+            response.close()  # Sends request_finished, which closes expired connections.
+            assert statuses[0].startswith('201'), statuses
+
+        print(f"database: {connection.vendor}, {args.requests} requests per mode")
+        for mode in args.modes:
+            reason = pool_unavailable(connection) if mode == 'pool' else None
+            if reason:
+                print(f"  {mode:<11} skipped: {reason}")
+                continue
+            configure(connection, mode)
+            post()  # Warm up (and fill the pool).
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                post()
+            elapsed = time.perf_counter() - start
+            print(f"  {mode:<11} {args.requests / elapsed:>9.0f} req/s {elapsed / args.requests * 1000:>8.2f} ms/request")
+        # Close the pool before the test database is dropped.
+        configure(connection, 'new')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Name search latency as the number of anemometers grows: `icontains` scan of
+each word (DRF's `SearchFilter`) vs the indexed search modes.
+
+Run from the project root (SQLite with the dev settings uses the in-process
+trigram index, PostgreSQL with DJANGO_SETTINGS_MODULE=windforlife.settings.prod
+the pg_trgm GIN index):
+
+    python -m benchmarks.bench_search --sizes 10000 100000 500000
+
+Each query fetches the first page (10 rows), or counts the matches like the
+paginator; the best of `--repeat` runs is reported. The in-process index is built before timing.
+"""
+import argparse
+import random
+import time
+
+from benchmarks._django import test_database
+
+WORDS = [
+    'harbour', 'north', 'ridge', 'valley', 'summit', 'coast', 'bay', 'point', 'cape', 'island',
+    'mesa', 'delta', 'field', 'tower', 'pier', 'lighthouse', 'station', 'beacon', 'dune', 'reef',
+]
+
+
+def grow(target, batch_size, rng):
+    from api.models import Anemometer
+
+    current = Anemometer.objects.count()
+    for offset in range(current, target, batch_size):
+        Anemometer.objects.bulk_create(
+            Anemometer(
+                name=f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}',
+                latitude=0.0,
+                longitude=0.0,
+            )
+            for i in range(offset, min(offset + batch_size, target))
+        )
+
+
+def timed(label, run, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = run()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<36} {len(rows):>3} rows {best * 1000:>10.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 300000])
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with test_database() as connection:
+        from api.models import Anemometer
+        from api.search import SEARCH_FUZZY, SEARCH_PREFIX, SEARCH_SUBSTRING, name_index, search_names
+
+        rng = random.Random(args.seed)
+        anemometers = Anemometer.objects.order_by('name')
+        print(f"database: {connection.vendor}")
+        for size in args.sizes:
+            grow(size, args.batch_size, rng)
+            name_index.invalidate()
+            search_names(anemometers, 'warm up')
+            print(f"{size} anemometers")
+            # A frequent term fills the page early even when scanning; a rare one has to scan the
+            # table; a broad one matches about a tenth of the names, all of them counted.
+            for term in ('lighthouse 12', 'dune 9999', 'north'):
+                scan = anemometers
+                for word in term.split():
+                    scan = scan.filter(name__icontains=word)
+                timed(f"icontains scan '{term}'", lambda: list(scan[:10]), args.repeat)
+                timed(f"substring '{term}'", lambda: list(search_names(anemometers, term, SEARCH_SUBSTRING)[:10]), args.repeat)
+            timed("substring 'north' count", lambda: [search_names(anemometers, 'north', SEARCH_SUBSTRING).count()], args.repeat)
+            timed("prefix 'Reef Dune 4'", lambda: list(search_names(anemometers, 'Reef Dune 4', SEARCH_PREFIX)[:10]), args.repeat)
+            timed("fuzzy 'lighthose beakon 1234'", lambda: list(search_names(anemometers, 'lighthose beakon 1234', SEARCH_FUZZY)[:10]), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Reading serialization throughput: ModelSerializer vs the fast read path.
+
+Run from the project root:
+
+    python -m benchmarks.bench_serializers --readings 20000
+
+Reports objects/sec for serializing (DRF fields vs precomputed converters,
+from instances and from `values()` rows) and for rendering (JSONRenderer vs
+FastJSONRenderer, which uses orjson when installed), and checks that both
+paths produce the same bytes.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks._django import test_database
+
+
+def timed(label, count, run, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<44} {count / best:>12.0f} objects/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readings', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with test_database():
+        from rest_framework.renderers import JSONRenderer
+
+        from api.models import Anemometer, WindSpeedReading
+        from api.renderers import FastJSONRenderer, orjson
+        from api.serializers import WindSpeedReadingSerializer, fast_reading_serializer
+
+        anemometer = Anemometer.objects.create(name='Bench', latitude=0.0, longitude=0.0)
+        start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        WindSpeedReading.objects.bulk_create(
+            WindSpeedReading(anemometer=anemometer, speed_knots=(i % 600) / 10, recorded_at=start + timedelta(seconds=i))
+            for i in range(args.readings)
+        )
+        instances = list(WindSpeedReading.objects.all())
+        rows = list(WindSpeedReading.objects.values(*fast_reading_serializer.attnames))
+        count = len(instances)
+
+        print(f"orjson: {'installed' if orjson else 'not installed'}")
+        drf = timed("ModelSerializer(many=True).data", count, lambda: WindSpeedReadingSerializer(instances, many=True).data, args.repeat)
+        timed("fast serializer from instances", count, lambda: fast_reading_serializer.serialize(instances), args.repeat)
+        fast = timed("fast serializer from values() rows", count, lambda: fast_reading_serializer.serialize(rows), args.repeat)
+        expected = timed("JSONRenderer", count, lambda: JSONRenderer().render(drf), args.repeat)
+        rendered = timed("FastJSONRenderer", count, lambda: FastJSONRenderer().render(fast), args.repeat)
+        timed(
+            "end to end (serialize + render), DRF", count,
+            lambda: JSONRenderer().render(WindSpeedReadingSerializer(instances, many=True).data), args.repeat,
+        )
+        timed(
+            "end to end (serialize + render), fast", count,
+            lambda: FastJSONRenderer().render(fast_reading_serializer.serialize(rows)), args.repeat,
+        )
+        print(f"byte-identical: {rendered == expected}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Tag filtering: substring scan of the serialized JSON vs the indexed backends.
+
+Run from the project root (SQLite with the dev settings uses the normalized
+tag table, PostgreSQL with DJANGO_SETTINGS_MODULE=windforlife.settings.prod
+the GIN index):
+
+    python -m benchmarks.bench_tags --anemometers 1000000
+
+Each filter is counted `--repeat` times; the best time is reported.
+"""
+import argparse
+import random
+import time
+
+from benchmarks._django import test_database
+
+VOCABULARY = [
+    'coastal', 'inland', 'offshore', 'mountain', 'desert', 'urban', 'forest', 'valley',
+    'low-wind', 'high-wind', 'gusty', 'calm', 'hot-weather', 'cold-weather', 'humid', 'dry',
+    'north', 'south', 'east', 'west', 'test', 'contest', 'prototype', 'retired',
+]
+
+
+def seed(count, batch_size, rng):
+    from api.models import Anemometer
+    from api.tags import sync_tags
+
+    for offset in range(0, count, batch_size):
+        batch = Anemometer.objects.bulk_create(
+            Anemometer(
+                name=f'Bench {i}',
+                latitude=rng.uniform(-90, 90),
+                longitude=rng.uniform(-180, 180),
+                tags=rng.sample(VOCABULARY, rng.randint(1, 4)),
+            )
+            for i in range(offset, min(offset + batch_size, count))
+        )
+        # bulk_create skips the post_save signal keeping the tag table in sync.
+        sync_tags(batch)
+
+
+def timed(label, queryset, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        matched = queryset.count()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<40} {matched:>9} rows {best * 1000:>10.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--anemometers', type=int, default=200000)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with test_database() as connection:
+        from django.db.models import Q
+
+        from api.models import Anemometer
+        from api.tags import MATCH_ALL, MATCH_ANY, filter_by_tags
+
+        start = time.perf_counter()
+        seed(args.anemometers, args.batch_size, random.Random(args.seed))
+        print(f"database: {connection.vendor}, seeded {args.anemometers} anemometers in {time.perf_counter() - start:.1f}s")
+
+        anemometers = Anemometer.objects.order_by()
+        for tags in (['test'], ['retired', 'prototype']):
+            legacy = Q()
+            for tag in tags:
+                legacy |= Q(tags__icontains=tag)
+            label = ','.join(tags)
+            timed(f"icontains scan ({label})", anemometers.filter(legacy), args.repeat)
+            timed(f"indexed any ({label})", filter_by_tags(anemometers, tags, MATCH_ANY), args.repeat)
+            timed(f"indexed all ({label})", filter_by_tags(anemometers, tags, MATCH_ALL), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
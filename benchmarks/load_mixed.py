@@ -0,0 +1,145 @@
+"""
+Load test of a running server with mixed slow-stats and ingest traffic.
+
+Unlike the other benchmarks this one drives a live deployment over HTTP, so
+that worker classes can be compared under the same load: `--concurrency`
+clients loop for `--duration` seconds, each request being a stats query over a
+wide radius and time range with probability `--stats-ratio`, and a reading
+posted to a random anemometer otherwise. With `--async`, the same requests go
+to the `/api/async/` endpoints.
+
+    gunicorn windforlife.wsgi.prod:application --workers 4
+    python -m benchmarks.load_mixed --username admin --password secret
+
+    gunicorn windforlife.asgi:application -k uvicorn_worker.UvicornWorker --workers 4
+    python -m benchmarks.load_mixed --username admin --password secret --async
+
+Requests per second and latency percentiles are reported per kind of request.
+Readings are written to the target database: point it at a scratch one.
+
+No results are recorded yet: the sync-vs-uvicorn comparison needs PostgreSQL
+and has not been run.
+"""
+import argparse
+import json
+import random
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+
+def request(url, token=None, payload=None, timeout=60):
+    headers = {'Accept': 'application/json'}
+    data = None
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    if payload is not None:
+        headers['Content-Type'] = 'application/json'
+        data = json.dumps(payload).encode()
+    with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers), timeout=timeout) as response:
+        return response.status, response.read()
+
+
+def obtain_token(base_url, username, password):
+    _, body = request(f'{base_url}/api/token/', payload={'username': username, 'password': password})
+    return json.loads(body)['access']
+
+
+def anemometer_ids(base_url, token, limit):
+    _, body = request(f'{base_url}/api/anemometers/?pagination=cursor&page_size={limit}', token)
+    return [row['id'] for row in json.loads(body)['results']]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+class Client:
+    def __init__(self, args, token, anemometers, deadline, seed):
+        prefix = '/api/async' if args.use_async else '/api'
+        self.stats_url = f'{args.url}{prefix}/stats/'
+        self.readings_url = f'{args.url}{prefix}/readings/'
+        self.args, self.token, self.anemometers, self.deadline = args, token, anemometers, deadline
+        self.rng = random.Random(seed)
+        self.latencies = {'stats': [], 'ingest': []}
+        self.errors = {'stats': 0, 'ingest': 0}
+
+    def stats(self):
+        end = datetime.now(timezone.utc) - timedelta(minutes=self.rng.randrange(60))
+        query = urllib.parse.urlencode({
+            'latitude': self.rng.uniform(-60, 60),
+            'longitude': self.rng.uniform(-180, 180),
+            'radius': self.args.radius,
+            # Minute-aligned edges read raw readings, not only rollups: the slow kind of query.
+            'start': (end - timedelta(days=self.args.days)).isoformat(),
+            'end': end.isoformat(),
+        })
+        return request(f'{self.stats_url}?{query}', self.token)
+
+    def ingest(self):
+        return request(self.readings_url, self.token, {
+            'anemometer': self.rng.choice(self.anemometers),
+            'speed_knots': round(self.rng.uniform(0, 60), 1),
+        })
+
+    def run(self):
+        while time.monotonic() < self.deadline:
+            kind = 'stats' if self.rng.random() < self.args.stats_ratio else 'ingest'
+            start = time.perf_counter()
+            try:
+                getattr(self, kind)()
+            except (urllib.error.URLError, OSError):
+                self.errors[kind] += 1
+                continue
+            self.latencies[kind].append(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--username')
+    parser.add_argument('--password')
+    parser.add_argument('--token', help='JWT access token, instead of --username/--password.')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='Target the /api/async/ endpoints.')
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--stats-ratio', type=float, default=0.2)
+    parser.add_argument('--radius', type=float, default=3000.0, help='Stats radius in nautical miles.')
+    parser.add_argument('--days', type=float, default=30.0, help='Stats time range in days.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    args.url = args.url.rstrip('/')
+
+    token = args.token or obtain_token(args.url, args.username, args.password)
+    anemometers = anemometer_ids(args.url, token, 100)
+    if not anemometers:
+        parser.error('the target has no anemometers to post readings to')
+
+    deadline = time.monotonic() + args.duration
+    clients = [Client(args, token, anemometers, deadline, args.seed + i) for i in range(args.concurrency)]
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for future in [executor.submit(client.run) for client in clients]:
+            future.result()
+    elapsed = time.monotonic() - started
+
+    print(f"{args.url} ({'async' if args.use_async else 'sync'} endpoints), {args.concurrency} clients, {elapsed:.1f}s")
+    total = 0
+    for kind in ('stats', 'ingest'):
+        latencies = [latency for client in clients for latency in client.latencies[kind]]
+        errors = sum(client.errors[kind] for client in clients)
+        total += len(latencies)
+        print(
+            f"  {kind:<7} {len(latencies):>7} ok {errors:>5} errors {len(latencies) / elapsed:>9.1f} req/s"
+            f"  p50 {percentile(latencies, 0.5) * 1000:>8.1f} ms  p95 {percentile(latencies, 0.95) * 1000:>8.1f} ms"
+            f"  p99 {percentile(latencies, 0.99) * 1000:>8.1f} ms"
+        )
+    print(f"  total   {total:>7} ok {total / elapsed:>26.1f} req/s")
+
+
+if __name__ == '__main__':
+    main()
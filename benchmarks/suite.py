@@ -0,0 +1,161 @@
+"""
+Latency and queries per request of the main API endpoints as the tables grow,
+checked against a stored baseline.
+
+Run from the project root (SQLite with the dev settings, PostgreSQL with
+DJANGO_SETTINGS_MODULE=windforlife.settings.prod):
+
+    python -m benchmarks.suite --sizes 1000 10000 100000
+    python -m benchmarks.suite --sizes 1000 10000 100000 --save-baseline
+
+For each size, the readings table is grown to about that many rows across
+`--anemometers` stations with the bulk seeding API of `api.factories` (synthetic
+time series every 10 minutes up to now, rollups included). Each endpoint is
+then called `--requests` times through the test client with the response
+cache off.
+
+The run fails (exit status 1) when an endpoint makes more queries than in the
+baseline, or when its median latency is above the baseline by more than
+`--tolerance` (a fraction) and `--min-delta-ms`; the tail percentiles of a few
+dozen requests are reported but too noisy to gate on. Latencies depend on the
+machine: save the baseline on the machine that runs the comparison.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from benchmarks._django import test_database
+
+BASELINE = Path(__file__).with_name('baseline.json')
+PASSWORD = 'benchmark-password'
+
+
+def grow_readings(anemometers, target, seed):
+    from api.factories import seed_readings
+    from api.models import WindSpeedReading
+
+    missing = target - WindSpeedReading.objects.count()
+    if missing > 0:
+        per_anemometer = -(-missing // len(anemometers))
+        seed_readings([anemometer.pk for anemometer in anemometers], per_anemometer, seed=seed, defer_indexes=True)
+
+
+def endpoints(anemometers, user, refresh):
+    """(name, method, path, data, authenticated) of every measured request."""
+    return [
+        ('anemometers-list', 'get', '/api/anemometers/', None, True),
+        ('anemometers-detail', 'get', f'/api/anemometers/{anemometers[0].pk}/', None, True),
+        ('readings-list', 'get', '/api/readings/', None, True),
+        ('readings-by-anemometer', 'get', '/api/readings/', {'anemometer': anemometers[0].pk}, True),
+        ('stats', 'get', '/api/stats/', {'latitude': 45.5, 'longitude': -3.5, 'radius': 60}, True),
+        ('token-obtain', 'post', '/api/token/', {'username': user.username, 'password': PASSWORD}, False),
+        ('token-refresh', 'post', '/api/token/refresh/', {'refresh': refresh}, False),
+    ]
+
+
+def measure(client, connection, method, path, data, requests):
+    from django.test.utils import CaptureQueriesContext
+
+    call = getattr(client, method)
+    call(path, data)  # Warm up.
+    latencies, queries = [], []
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = call(path, data)
+            latencies.append(time.perf_counter() - start)
+        assert response.status_code < 400, (path, response.status_code, response.content[:200])
+        queries.append(len(context))
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p95_ms': round(cuts[94] * 1000, 3),
+        'p99_ms': round(cuts[98] * 1000, 3),
+        'queries': max(queries),
+    }
+
+
+def regressions(results, baseline, tolerance, min_delta_ms):
+    """Messages describing the results that are worse than the baseline."""
+    found = []
+    for size, measured in results.items():
+        for name, current in measured.items():
+            previous = baseline.get(size, {}).get(name)
+            if previous is None:
+                continue
+            if current['queries'] > previous['queries']:
+                found.append(f"{name} at {size} rows: {current['queries']} queries, baseline {previous['queries']}")
+            limit = max(previous['p50_ms'] * (1 + tolerance), previous['p50_ms'] + min_delta_ms)
+            if current['p50_ms'] > limit:
+                found.append(f"{name} at {size} rows: p50 {current['p50_ms']:.2f} ms, baseline {previous['p50_ms']:.2f} ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='readings, 10^3 to 10^7')
+    parser.add_argument('--anemometers', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed median slowdown, as a fraction')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0, help='median slowdowns below this are noise')
+    args = parser.parse_args()
+
+    with test_database() as connection:
+        from django.conf import settings
+        from rest_framework.test import APIClient
+
+        from api.factories import UserFactory, create_anemometers
+
+        settings.RESPONSE_CACHE_ENABLED = False
+        user = UserFactory(password=PASSWORD)
+        user.save()  # The factory skips the save after set_password.
+        start = time.perf_counter()
+        anemometers = create_anemometers(args.anemometers, seed=args.seed)
+        print(f"database: {connection.vendor}, {args.anemometers} anemometers in {time.perf_counter() - start:.1f}s")
+
+        authenticated = APIClient()
+        authenticated.force_authenticate(user=user)
+        anonymous = APIClient()
+        refresh = anonymous.post('/api/token/', {'username': user.username, 'password': PASSWORD}).data['refresh']
+
+        results = {}
+        for size in sorted(args.sizes):
+            start = time.perf_counter()
+            grow_readings(anemometers, size, args.seed + size)
+            print(f"\n{size} readings (seeded in {time.perf_counter() - start:.1f}s)")
+            measured = results[str(size)] = {}
+            for name, method, path, data, needs_user in endpoints(anemometers, user, refresh):
+                client = authenticated if needs_user else anonymous
+                measured[name] = result = measure(client, connection, method, path, data, args.requests)
+                print(
+                    f"  {name:<24} p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+                    f"p99 {result['p99_ms']:>8.2f} ms  {result['queries']:>3} queries"
+                )
+
+    if args.save_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        baseline.setdefault(connection.vendor, {}).update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+        print(f"\nbaseline saved to {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print(f"\nno baseline at {args.baseline}: run with --save-baseline first")
+        return
+    baseline = json.loads(args.baseline.read_text()).get(connection.vendor, {})
+    found = regressions(results, baseline, args.tolerance, args.min_delta_ms)
+    if found:
+        print("\nregressions against the baseline:")
+        for message in found:
+            print(f"  {message}")
+        sys.exit(1)
+    print("\nno regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,7 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "windforlife.settings")
+# The production settings with persistent connections turned off (see the module).
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "windforlife.settings.asgi")
 
 application = get_asgi_application()
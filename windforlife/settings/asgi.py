@@ -0,0 +1,6 @@
+from windforlife.settings.prod import *
+
+# Persistent connections are not reused between ASGI requests, whose sync code runs in
+# other threads, and pile up instead: always close them (DB_POOL=True pools them).
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = 0
@@ -47,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so that its timings include the other middleware.
+    "api.middleware.PerformanceMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -98,9 +100,14 @@ AUTH_PASSWORD_VALIDATORS = [
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.PageNumberPagination',
+    # Renders with orjson when installed and byte-identical, JSONRenderer otherwise.
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
 
@@ -144,6 +151,119 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 ADMINS = [('John DOE', 'j.doe@windforlife.com'),]
 
 
+# Read replicas serving the safe requests of the API views (see api/db_router.py), as
+# DATABASE_REPLICAS=replica1=3;replica2=1 (alias=weight, aliases defined in DATABASES),
+# picked in turn ('round_robin') or at random by weight ('weighted'). A client's reads
+# stay on the primary for READ_YOUR_WRITES_SECONDS after each of its writes.
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+DATABASE_REPLICAS = env.dict('DATABASE_REPLICAS', cast={'value': int}, default={})
+DATABASE_REPLICA_SELECTION = env.str('DATABASE_REPLICA_SELECTION', 'round_robin')
+READ_YOUR_WRITES_SECONDS = env.int('READ_YOUR_WRITES_SECONDS', 10)
+
+# In-process spatial index over anemometer locations, used by the stats endpoint.
+# Every worker keeps its own copy and rebuilds it when the shared version counter
+# in the database changes.
+SPATIAL_INDEX_ENABLED = env.bool('SPATIAL_INDEX_ENABLED', True)
+SPATIAL_INDEX_CELL_DEGREES = env.float('SPATIAL_INDEX_CELL_DEGREES', 1.0)
+
+# Daily/weekly means and stats are read from the hourly/daily rollup buckets, filled
+# from the existing readings by migration 0004 and kept up to date on every write.
+READING_ROLLUPS_ENABLED = env.bool('READING_ROLLUPS_ENABLED', True)
+
+# Opt-in monthly range partitioning of the readings table on PostgreSQL, applied with
+# `manage.py partition_readings convert` (migrations do not read this setting): when on,
+# `migrate` warns (api.W002) until the table is converted. Keep partitions ahead with
+# `manage.py partition_readings maintain --ahead 3 --retain 24`.
+READINGS_PARTITIONED = env.bool('READINGS_PARTITIONED', False)
+
+# POST /api/readings/bulk/ limits.
+READINGS_BULK_MAX_ROWS = env.int('READINGS_BULK_MAX_ROWS', 10000)
+READINGS_BULK_BATCH_SIZE = env.int('READINGS_BULK_BATCH_SIZE', 1000)
+
+# Write-behind buffer for POST /api/readings/ (see api/buffer.py): readings are
+# inserted in bulk every FLUSH_INTERVAL_MS or MAX_ROWS readings. DURABILITY is
+# 'flush' (answer 201 once stored) or 'enqueue' (answer 202 once queued, lost if
+# the worker dies before flushing). Needs threaded or ASGI workers to coalesce.
+READINGS_BUFFER_ENABLED = env.bool('READINGS_BUFFER_ENABLED', False)
+READINGS_BUFFER_FLUSH_INTERVAL_MS = env.int('READINGS_BUFFER_FLUSH_INTERVAL_MS', 50)
+READINGS_BUFFER_MAX_ROWS = env.int('READINGS_BUFFER_MAX_ROWS', 500)
+READINGS_BUFFER_MAX_PENDING = env.int('READINGS_BUFFER_MAX_PENDING', 10000)
+READINGS_BUFFER_DURABILITY = env.str('READINGS_BUFFER_DURABILITY', 'flush')
+
+# statement_timeout of the buffer's flushes on PostgreSQL. Requests waiting for a
+# flush give up after FLUSH_INTERVAL_MS plus twice this, answering 503.
+READINGS_BUFFER_STATEMENT_TIMEOUT_MS = env.int('READINGS_BUFFER_STATEMENT_TIMEOUT_MS', 10000)
+
+# Rows fetched per server-side cursor round trip (and written per chunk) by
+# GET /api/readings/export/.
+READINGS_EXPORT_CHUNK_SIZE = env.int('READINGS_EXPORT_CHUNK_SIZE', 2000)
+
+# GET /api/anemometers/{id}/series/ rejects time ranges holding more buckets than this.
+SERIES_MAX_BUCKETS = env.int('SERIES_MAX_BUCKETS', 20000)
+
+# On databases without pg_trgm, where anemometer name search runs on an in-process
+# trigram index, this many matches are ranked by similarity; the others follow by name.
+NAME_SEARCH_RANKED_RESULTS = env.int('NAME_SEARCH_RANKED_RESULTS', 500)
+
+# Reading lists and the latest readings of anemometers are serialized from values()
+# rows with precomputed converters instead of ModelSerializer fields (same output).
+FAST_SERIALIZERS_ENABLED = env.bool('FAST_SERIALIZERS_ENABLED', True)
+
+# Caches, e.g. CACHE_URL=redis://localhost:6379/1 in production. The default local
+# memory cache is per process: invalidations are only shared between workers through
+# a shared backend. Locally, CACHE_URL=filecache:///tmp/windforlife-cache stands in
+# for one.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Cached responses of the anemometer and stats endpoints, invalidated on any change
+# to anemometers, at most RESPONSE_CACHE_READINGS_DELAY seconds after readings change,
+# and expiring after RESPONSE_CACHE_TIMEOUT seconds. Every worker must see the
+# invalidations, so it is off unless CACHE_URL is a shared backend.
+RESPONSE_CACHE_ENABLED = env.bool(
+    'RESPONSE_CACHE_ENABLED', CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHE_BACKENDS,
+)
+RESPONSE_CACHE_ALIAS = env.str('RESPONSE_CACHE_ALIAS', 'default')
+RESPONSE_CACHE_TIMEOUT = env.int('RESPONSE_CACHE_TIMEOUT', 60)
+RESPONSE_CACHE_READINGS_DELAY = env.float('RESPONSE_CACHE_READINGS_DELAY', 10.0)
+
+# How JWT authentication resolves the token's user (see api/authentication.py):
+# 'database' (one query per request), 'cached' (in-process LRU of JWT_USER_CACHE_SIZE
+# users, refreshed after JWT_USER_CACHE_TTL seconds: other workers keep accepting a
+# deactivated user until then) or 'claims' (no query, a TokenUser built from the token).
+JWT_USER_LOOKUP = env.str('JWT_USER_LOOKUP', 'database')
+JWT_USER_CACHE_SIZE = env.int('JWT_USER_CACHE_SIZE', 10000)
+JWT_USER_CACHE_TTL = env.float('JWT_USER_CACHE_TTL', 30.0)
+
+# Device API keys (see api/devices.py) are looked up once per DEVICE_KEY_CACHE_TTL
+# seconds and process: a revoked key keeps working in other workers until then.
+DEVICE_KEY_CACHE_SIZE = env.int('DEVICE_KEY_CACHE_SIZE', 10000)
+DEVICE_KEY_CACHE_TTL = env.float('DEVICE_KEY_CACHE_TTL', 60.0)
+
+# Per-request wall time, query count/time and response size, exported at /metrics
+# (Prometheus) and, when enabled, in the Server-Timing response header.
+PERFORMANCE_METRICS_ENABLED = env.bool('PERFORMANCE_METRICS_ENABLED', True)
+SERVER_TIMING_ENABLED = env.bool('SERVER_TIMING_ENABLED', False)
+
+# /metrics answers 404 unless enabled, and 403 to clients that neither connect from
+# METRICS_ALLOWED_IPS (addresses or networks, as seen in REMOTE_ADDR) nor send
+# `Authorization: Bearer <METRICS_TOKEN>`.
+METRICS_ENDPOINT_ENABLED = env.bool('METRICS_ENDPOINT_ENABLED', False)
+METRICS_ALLOWED_IPS = env.list('METRICS_ALLOWED_IPS', default=['127.0.0.1', '::1'])
+METRICS_TOKEN = env.str('METRICS_TOKEN', '')
+
+
+# Development logging: everything to debug.log and the console, synchronously. SQL
+# statements are logged by django.db.backends when DEBUG is on. The production
+# profile in prod.py replaces it.
+LOG_LEVEL = env.str('LOG_LEVEL', 'DEBUG')
+DJANGO_LOG_LEVEL = env.str('DJANGO_LOG_LEVEL', 'DEBUG')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -173,17 +293,17 @@ LOGGING = {
     'loggers': {
         'django': {
             'handlers': ['file', 'console'],
-            'level': 'DEBUG',
+            'level': DJANGO_LOG_LEVEL,
             'propagate': False,
         },
         'api': {
             'handlers': ['file', 'console'],
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
             'propagate': False,
         },
         'root': {
             'handlers': ['console', 'file'],
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
         },
     },
 }
@@ -14,6 +14,9 @@ ALLOWED_HOSTS = [
     "127.0.0.1",
 ]
 
+# Timings and query counts in the Server-Timing header of every response while debugging.
+SERVER_TIMING_ENABLED = env.bool("SERVER_TIMING_ENABLED", DEBUG)
+
 
 INSTALLED_APPS += ["debug_toolbar"]
 MIDDLEWARE += ["debug_toolbar.middleware.DebugToolbarMiddleware"]
@@ -28,5 +31,12 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": "db.sqlite3", 
-    }
+    },
+    # Stand-in read replica: a second connection to the same file (the same test database
+    # in tests). Route reads to it with DATABASE_REPLICAS=replica=1.
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": "db.sqlite3",
+        "TEST": {"MIRROR": "default"},
+    },
 }
\ No newline at end of file
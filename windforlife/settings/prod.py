@@ -18,5 +18,91 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        # Keep connections open between requests instead of paying TCP/TLS/auth on each,
+        # checking them before reuse so a restarted database does not fail the next request.
+        'CONN_MAX_AGE': env.int('DB_CONN_MAX_AGE', 60),
+        'CONN_HEALTH_CHECKS': env.bool('DB_CONN_HEALTH_CHECKS', True),
     }
 }
+
+# psycopg 3 connection pool (Django 5.1+, `pip install "psycopg[binary,pool]"`), shared by
+# the threads of a worker; use it with threaded or ASGI workers. Replaces persistent
+# connections, which Django does not allow together with a pool.
+if env.bool('DB_POOL', False):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': env.int('DB_POOL_MIN_SIZE', 2),
+            'max_size': env.int('DB_POOL_MAX_SIZE', 10),
+            'timeout': env.float('DB_POOL_TIMEOUT', 10.0),
+        },
+    }
+
+# Read replicas, DB_REPLICA_HOSTS=host1,host2:5433: aliases replica1, replica2... with the
+# primary's credentials, all used (weight 1) unless DATABASE_REPLICAS says otherwise.
+replica_hosts_env = os.getenv("DB_REPLICA_HOSTS")
+for number, replica_host in enumerate([host.strip() for host in replica_hosts_env.split(",") if host.strip()] if replica_hosts_env else [], start=1):
+    host, _, port = replica_host.partition(':')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = DATABASE_REPLICAS or {alias: 1 for alias in DATABASES if alias != 'default'}
+
+# Logging: JSON lines on stdout (and LOG_FILE if set), written by a background thread
+# so requests never wait on I/O. Per-request INFO logs of the API and 4xx warnings of
+# django.request are sampled at LOG_SAMPLE_RATE; warnings and errors of the API and
+# 5xx errors are always kept.
+LOG_LEVEL = env.str('LOG_LEVEL', 'INFO')
+DJANGO_LOG_LEVEL = env.str('DJANGO_LOG_LEVEL', 'INFO')
+LOG_SAMPLE_RATE = env.float('LOG_SAMPLE_RATE', 1.0)
+LOG_FILE = env.str('LOG_FILE', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'api.log.JSONFormatter'},
+    },
+    'filters': {
+        'sample_info': {'()': 'api.log.SamplingFilter', 'rate': LOG_SAMPLE_RATE, 'max_level': 'INFO'},
+        'sample_warnings': {'()': 'api.log.SamplingFilter', 'rate': LOG_SAMPLE_RATE, 'max_level': 'WARNING'},
+    },
+    'handlers': {
+        'background': {
+            '()': 'api.log.BackgroundHandler',
+            'filename': LOG_FILE,
+            'formatter': 'json',
+        },
+    },
+    'loggers': {
+        'django': {
+            'handlers': ['background'],
+            'level': DJANGO_LOG_LEVEL,
+            'propagate': False,
+        },
+        'django.request': {
+            'handlers': ['background'],
+            'level': DJANGO_LOG_LEVEL,
+            'filters': ['sample_warnings'],
+            'propagate': False,
+        },
+        'django.db.backends': {
+            'handlers': ['background'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'api': {
+            'handlers': ['background'],
+            'level': LOG_LEVEL,
+            'filters': ['sample_info'],
+            'propagate': False,
+        },
+        'root': {
+            'handlers': ['background'],
+            'level': 'WARNING',
+        },
+    },
+}